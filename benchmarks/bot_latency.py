@@ -0,0 +1,168 @@
+"""
+Reply latency of the bot under concurrent users.
+
+Stub Telegram updates are put into `application.update_queue` of the
+running `Application`, so they go through the update processor and the
+handlers as in production; the Bot API transport is stubbed and records
+when each reply is sent. The Google Sheets backend is `FakeClient` with a
+per-request latency (storage cache disabled), the database is a local
+SQLite file. While `heavy` users run the /split dialog concurrently, light
+users send /help; the p50/p99 reply latency of /help is reported for
+concurrent update processing and for updates processed one at a time
+(the python-telegram-bot default, previous behaviour).
+
+    python -m benchmarks.bot_latency
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from football_rating.data_storage import GSheetStorage
+from football_rating.fake_gsheets import FakeClient
+from football_rating.storage_cache import StorageCache
+from football_rating_bot.football_rating_bot import FootballRatingBot
+from telegram import Update
+from telegram.ext import Application
+from telegram.request import BaseRequest
+
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+PLAYERS = [f'Игрок {a}{b}' for a in 'абвгд' for b in 'еклмнопр']
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+
+
+class StubRequest(BaseRequest):
+    """Bot API transport: answers every method locally and records the replies."""
+
+    def __init__(self):
+        self.replies: Dict[int, asyncio.Queue] = defaultdict(asyncio.Queue)
+        self._ids = itertools.count(1)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url: str, method: str, request_data=None, **kwargs) -> Tuple[int, bytes]:
+        endpoint = url.rsplit('/', 1)[-1]
+        params = request_data.json_parameters if request_data else {}
+        if endpoint == 'getMe':
+            result = BOT_USER
+        elif endpoint == 'sendMessage':
+            chat_id = int(params['chat_id'])
+            self.replies[chat_id].put_nowait(time.perf_counter())
+            result = {
+                'message_id': next(self._ids), 'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'}, 'from': BOT_USER, 'text': params.get('text', ''),
+            }
+        else:
+            result = True
+        return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+
+def stub_update(bot, update_id: int, user_id: int, text: str) -> Update:
+    message = {
+        'message_id': update_id, 'date': int(time.time()), 'text': text,
+        'chat': {'id': user_id, 'type': 'private'},
+        'from': {'id': user_id, 'is_bot': False, 'first_name': 'User', 'username': f'user{user_id}'},
+    }
+    if text.startswith('/'):
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+    return Update.de_json({'update_id': update_id, 'message': message}, bot)
+
+
+def make_bot(latency: float) -> FootballRatingBot:
+    os.environ.setdefault('BOT_TOKEN', '123456:benchmark')
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    bot = FootballRatingBot(f'sqlite:///{db_path}')
+    client = FakeClient()
+    storage = GSheetStorage(file_name='football-rating_bench', gc=client)
+    rng = np.random.default_rng(0)
+    storage.data.df = pd.DataFrame({
+        'Name': PLAYERS,
+        'Rating': rng.integers(900, 1700, len(PLAYERS)),
+        'Matches': rng.integers(0, 300, len(PLAYERS)),
+    }).set_index('Name')
+    storage.write()
+    client.latency = latency
+    bot.storages = StorageCache(client=client, ttl=0)
+    bot.url = storage.url
+    return bot
+
+
+async def run(bot: FootballRatingBot, heavy: int, light: int, concurrent: bool) -> np.ndarray:
+    request = StubRequest()
+    if concurrent:
+        bot.application = bot._build_application(request)
+    else:
+        bot.application = Application.builder().token(bot.token).request(request) \
+            .get_updates_request(request).build()
+    bot._add_handlers()
+    roster = '\n'.join(f'{i + 1}. {name}' for i, name in enumerate(PLAYERS[:12]))
+    for user_id in range(1, heavy + light + 1):
+        bot.db.update_user(user_id, f'user{user_id}', bot.url)
+    update_ids = itertools.count(1)
+
+    async def send(user_id: int, text: str) -> float:
+        """Put the update into the queue and wait for the reply; latency from arrival."""
+        arrival = time.perf_counter()
+        await bot.application.update_queue.put(stub_update(bot.application.bot, next(update_ids), user_id, text))
+        return await request.replies[user_id].get() - arrival
+
+    async def light_user(user_id: int) -> List[float]:
+        latencies = []
+        start = time.perf_counter()
+        for k in range(10):
+            await asyncio.sleep(max(0., start + 0.02 * k - time.perf_counter()))
+            latencies.append(await send(user_id, '/help'))
+        return latencies
+
+    done = asyncio.Event()
+
+    async def heavy_user(user_id: int):
+        # диалог /split раз за разом, пока идут замеры
+        await asyncio.sleep(0.005 * user_id)
+        while not done.is_set():
+            for text in ('/split', '2', roster):
+                await send(user_id, text)
+
+    async with bot.application:
+        await bot.application.start()
+        heavy_tasks = [asyncio.create_task(heavy_user(user_id)) for user_id in range(1, heavy + 1)]
+        results = await asyncio.gather(*[
+            light_user(user_id) for user_id in range(heavy + 1, heavy + light + 1)
+        ])
+        done.set()
+        await asyncio.gather(*heavy_tasks)
+        await bot.application.stop()
+    return np.array([latency for result in results for latency in result])
+
+
+def main(latency: float, light: int):
+    bot = make_bot(latency)
+    print(f'{"heavy":>6} {"updates":>10} {"p50 ms":>8} {"p99 ms":>8}')
+    try:
+        for heavy in (1, 4, 16):
+            for concurrent in (True, False):
+                latencies = asyncio.run(run(bot, heavy, light, concurrent)) * 1000
+                mode = 'concurrent' if concurrent else 'serial'
+                print(f'{heavy:>6} {mode:>10} {np.percentile(latencies, 50):>8.1f} '
+                      f'{np.percentile(latencies, 99):>8.1f}')
+    finally:
+        bot.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--latency', type=float, default=0.05, help='fake Sheets request latency, s')
+    parser.add_argument('--light', type=int, default=8, help='number of /help users')
+    main(**vars(parser.parse_args()))
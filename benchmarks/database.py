@@ -0,0 +1,57 @@
+"""
+Lookup cost of `FootballDatabase` on a local SQLite file.
+
+One bot interaction resolves the user, their active url and admin rights.
+Compared are the separate `get_user` + `is_admin` lookups and the combined
+`get_user_with_admin` query, with and without the record cache.
+
+    python -m benchmarks.database --users 1000 --lookups 5000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from football_rating_bot.football_database import FootballDatabase
+
+
+def fill(db: FootballDatabase, users: int):
+    for id in range(users):
+        url = f'https://docs.google.com/spreadsheets/d/sheet{id % 50}'
+        db.update_user(id, f'user{id}', url)
+        if id % 50 == 0:
+            db.update_admin(id, url, True)
+
+
+def separate(db: FootballDatabase, id: int):
+    user = db.get_user(id)
+    db.is_admin(user.id, user.url)
+
+
+def combined(db: FootballDatabase, id: int):
+    db.get_user_with_admin(id)
+
+
+def main(users: int, lookups: int):
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    fill(FootballDatabase(f'sqlite:///{db_path}', cache=False), users)
+    # обращения распределены неравномерно - активные пользователи чаще
+    ids = np.random.default_rng(0).zipf(1.5, lookups) % users
+    print(f'{"lookup":>10} {"cache":>6} {"us/interaction":>15}')
+    for cache in (False, True):
+        for fn in (separate, combined):
+            db = FootballDatabase(f'sqlite:///{db_path}', cache=cache)
+            start = time.perf_counter()
+            for id in ids:
+                fn(db, int(id))
+            elapsed = (time.perf_counter() - start) / lookups * 1e6
+            print(f'{fn.__name__:>10} {str(cache):>6} {elapsed:15.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--lookups', type=int, default=5000)
+    main(**vars(parser.parse_args()))
@@ -0,0 +1,80 @@
+"""
+Lookup latency of the bot database before and after the index migration.
+
+A local SQLite file with the old schema (no secondary indexes) is seeded
+with `users` users and admins, lookups are timed, then `migrate` is applied
+and the same lookups are timed again.
+
+    python -m benchmarks.database_indexes --users 20000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from sqlalchemy import create_engine, text
+
+from football_rating_bot.migrations import migrate
+
+OLD_SCHEMA = [
+    'CREATE TABLE owners (id INTEGER NOT NULL, url VARCHAR, PRIMARY KEY (id))',
+    'CREATE TABLE users (id INTEGER NOT NULL, name VARCHAR, url VARCHAR, PRIMARY KEY (id))',
+    'CREATE TABLE admins (id INTEGER NOT NULL, url VARCHAR NOT NULL, PRIMARY KEY (id, url))',
+]
+
+QUERIES = {
+    'user by name': 'SELECT id, name, url FROM users WHERE name = :name',
+    'is admin (users)': 'SELECT id FROM users WHERE id = :id AND url = :url',
+    'is admin (admins)': 'SELECT id FROM admins WHERE id = :id AND url = :url',
+    'admins of url': 'SELECT id FROM admins WHERE url = :url',
+}
+
+
+def seed(engine, users: int):
+    url = lambda id: f'https://docs.google.com/spreadsheets/d/sheet{id % 500}'
+    with engine.begin() as connection:
+        for statement in OLD_SCHEMA:
+            connection.execute(text(statement))
+        connection.execute(
+            text('INSERT INTO users (id, name, url) VALUES (:id, :name, :url)'),
+            [{'id': id, 'name': f'user{id}', 'url': url(id)} for id in range(users)]
+        )
+        connection.execute(
+            text('INSERT INTO admins (id, url) VALUES (:id, :url)'),
+            [{'id': id, 'url': url(id)} for id in range(0, users, 10)]
+        )
+
+
+def measure(engine, ids: np.ndarray):
+    results = {}
+    with engine.connect() as connection:
+        for name, query in QUERIES.items():
+            start = time.perf_counter()
+            for id in ids:
+                id = int(id)
+                params = {'id': id, 'name': f'user{id}', 'url': f'https://docs.google.com/spreadsheets/d/sheet{id % 500}'}
+                connection.execute(text(query), params).fetchall()
+            results[name] = (time.perf_counter() - start) / len(ids) * 1e6
+    return results
+
+
+def main(users: int, lookups: int):
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    engine = create_engine(f'sqlite:///{db_path}')
+    seed(engine, users)
+    ids = np.random.default_rng(0).integers(0, users, lookups)
+    before = measure(engine, ids)
+    migrate(engine)
+    after = measure(engine, ids)
+    print(f'{"lookup":>18} {"before us":>10} {"after us":>9}')
+    for name in QUERIES:
+        print(f'{name:>18} {before[name]:10.1f} {after[name]:9.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    main(**vars(parser.parse_args()))
@@ -0,0 +1,61 @@
+"""
+Elo update of match days: batched `MatchDay.update_elo` against the match
+by match `Match.update_elo` loop (results are checked to be identical).
+
+    python -m benchmarks.elo_update --days 500 --teams 3 --matches 8
+"""
+import argparse
+import copy
+import time
+
+import numpy as np
+
+from football_rating.matchday import Match, MatchDay, Player, Team
+
+
+def make_days(days: int, teams: int, matches: int, size: int = 5):
+    rng = np.random.default_rng(0)
+    result = []
+    for _ in range(days):
+        day_teams = [
+            Team(f'Команда {t}', [
+                Player(f'{t}-{i}', int(rng.integers(900, 1700)), int(rng.integers(0, 400)))
+                for i in range(size)
+            ])
+            for t in range(teams)
+        ]
+        day_matches = []
+        for _ in range(matches):
+            a, b = rng.choice(teams, 2, replace=False)
+            day_matches.append(Match(day_teams[a], day_teams[b], int(rng.integers(0, 5)), int(rng.integers(0, 5))))
+        result.append(MatchDay(day_matches, day_teams))
+    return result
+
+
+def update_sequential(match_day: MatchDay):
+    for match in match_day.matches:
+        match.update_elo()
+
+
+def main(days: int, teams: int, matches: int):
+    match_days = make_days(days, teams, matches)
+    timings = {}
+    ratings = {}
+    for name, fn in (('sequential', update_sequential), ('batched', MatchDay.update_elo)):
+        run_days = copy.deepcopy(match_days)
+        start = time.perf_counter()
+        for match_day in run_days:
+            fn(match_day)
+        timings[name] = time.perf_counter() - start
+        ratings[name] = [player.elo for day in run_days for team in day.teams for player in team.players]
+    assert ratings['sequential'] == ratings['batched']
+    for name, elapsed in timings.items():
+        print(f'{name:>10}: {elapsed * 1000:8.1f} ms ({elapsed / days * 1e6:.0f} us/day)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--days', type=int, default=500)
+    parser.add_argument('--teams', type=int, default=3)
+    parser.add_argument('--matches', type=int, default=8)
+    main(**vars(parser.parse_args()))
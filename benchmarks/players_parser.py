@@ -0,0 +1,41 @@
+"""
+Parse time of a sign-up roster with `lines` synthetic player lines.
+
+    python -m benchmarks.players_parser --lines 10000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from football_rating.text_parser import PlayersText
+
+NAMES = ['Вася', 'Коля М', 'Вова К', 'Саша', 'Дима П.', 'Лёша', 'Ivan S', 'Гена']
+TAILS = ['', '', '', ' аб', ' б/а +1', ' вместо Пети', ' (вратарь)', ' 👍', ' в раме', ' без абика']
+
+
+def make_text(lines: int) -> str:
+    rng = np.random.default_rng(0)
+    rows = ['Футбол в субботу 10:00', '']
+    for i in range(lines):
+        star = '*' if rng.random() < 0.05 else ''
+        rows.append(f'{star}{i + 1}. {rng.choice(NAMES)}{rng.choice(TAILS)}')
+    return '\n'.join(rows)
+
+
+def main(lines: int, repeat: int):
+    text = make_text(lines)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parser = PlayersText(text=text)
+        times.append(time.perf_counter() - start)
+    assert len(parser.players) == lines
+    print(f'{lines} lines: {min(times) * 1000:.1f} ms ({min(times) / lines * 1e6:.2f} us/line)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lines', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    main(**vars(parser.parse_args()))
@@ -0,0 +1,255 @@
+"""
+Benchmark runner for the matchmaking and rating hot paths.
+
+Every case builds its inputs from a fixed seed (synthetic rosters of
+10-200 players in 2-16 teams), times the call `repeat` times and reports
+the best and the median time. Results are written to JSON together with
+the commit and library versions, so runs of different commits can be
+compared:
+
+    python -m benchmarks.run -o before.json
+    python -m benchmarks.run -o after.json --compare before.json
+    python -m benchmarks.run -k optimize --quick
+"""
+import argparse
+import copy
+import datetime
+import itertools
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import time
+
+import numpy as np
+import pandas as pd
+
+from football_rating.matchday import Match, MatchDay, Player, Team
+from football_rating.matchmaking import MatchMaking
+from football_rating.players_data import PlayersStorageData
+from football_rating.team_scoring import TeamMeans
+from football_rating.text_parser import MatchDayParser, PlayersText
+
+from typing import Callable, Dict, List, Tuple
+
+SEED = 12345
+ROSTERS = [(10, 2), (20, 4), (48, 8), (100, 10), (192, 16), (200, 8)]
+QUICK_ROSTERS = [(10, 2), (48, 8)]
+TEAM_COLORS = ['Синие', 'Красные', 'Желтые', 'Зеленые', 'Белые', 'Черные']
+
+# name -> (params, setup, quick params), setup(rng, *params) returns the timed
+# callable or (prepare, callable), prepare is called untimed before each repeat
+BENCHMARKS: Dict[str, Tuple[List[Tuple], Callable, List[Tuple]]] = {}
+
+
+def benchmark(name: str, params: List[Tuple], quick: List[Tuple] | None = None):
+    def decorator(setup: Callable):
+        BENCHMARKS[name] = (params, setup, quick or params[:1])
+        return setup
+    return decorator
+
+
+def player_names(count: int) -> List[str]:
+    # только буквы - имена должны проходить разбор PlayersText
+    letters = 'абвгдежзиклмнопрстуфхцчшэюя'
+    length = 2
+    while len(letters) ** length < count:
+        length += 1
+    return ['Игрок ' + ''.join(chars) for chars in itertools.islice(itertools.product(letters, repeat=length), count)]
+
+
+def roster_df(rng: np.random.Generator, players: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        'player': player_names(players),
+        'skill': rng.integers(900, 1700, players),
+        'matches': rng.integers(0, 300, players),
+    })
+
+
+def make_match_day(rng: np.random.Generator, teams: int, matches: int, size: int = 5) -> MatchDay:
+    names = player_names(teams * size)
+    day_teams = [
+        Team(TEAM_COLORS[t % len(TEAM_COLORS)] + str(t), [
+            Player(name, int(rng.integers(900, 1700)), int(rng.integers(0, 300)))
+            for name in names[t * size:(t + 1) * size]
+        ])
+        for t in range(teams)
+    ]
+    day_matches = []
+    for _ in range(matches):
+        a, b = rng.choice(teams, 2, replace=False)
+        day_matches.append(Match(day_teams[a], day_teams[b], int(rng.integers(0, 5)), int(rng.integers(0, 5))))
+    return MatchDay(day_matches, day_teams)
+
+
+@benchmark('matchmaking_init', ROSTERS, QUICK_ROSTERS)
+def bench_matchmaking_init(rng, players, teams):
+    df = roster_df(rng, players)
+    return lambda: MatchMaking(df, teams, split=[])
+
+
+@benchmark('matchmaking_optimize', ROSTERS, QUICK_ROSTERS)
+def bench_matchmaking_optimize(rng, players, teams):
+    matchmaker = MatchMaking(roster_df(rng, players), teams, split=[])
+    state = {}
+
+    def prepare():
+        state['matchmaker'] = copy.deepcopy(matchmaker)
+
+    return prepare, lambda: state['matchmaker'].optimize()
+
+
+@benchmark('calc_team_means', ROSTERS, QUICK_ROSTERS)
+def bench_calc_team_means(rng, players, teams):
+    df = roster_df(rng, players)
+    df['team'] = rng.permutation(np.arange(players) % teams)
+    df['skill'] = df['skill'].astype(float)
+    return lambda: MatchMaking.calc_team_means(df)
+
+
+@benchmark('team_means_buffers', ROSTERS, QUICK_ROSTERS)
+def bench_team_means_buffers(rng, players, teams):
+    skills = rng.integers(900, 1700, players).astype(float)
+    labels = rng.permutation(np.arange(players) % teams)
+    team_means = TeamMeans(skills, teams)
+    return lambda: team_means(labels)
+
+
+@benchmark('team_expected_score', [(5,), (10,), (25,), (100,)])
+def bench_team_expected_score(rng, size):
+    team1, team2 = [
+        Team(str(t), [Player(str(i), int(rating)) for i, rating in enumerate(rng.integers(900, 1700, size))])
+        for t in range(2)
+    ]
+    return lambda: team1.expected_score(team2)
+
+
+@benchmark('matchday_update_players', [(2, 6), (3, 8), (6, 15), (16, 40)], [(3, 8)])
+def bench_matchday_update_players(rng, teams, matches):
+    match_day = make_match_day(rng, teams, matches)
+    players = [player for team in match_day.teams for player in team.players]
+    initial = [(player.elo, player.matches) for player in players]
+
+    def prepare():
+        for player, (elo, matches_count) in zip(players, initial):
+            player.elo, player.matches = elo, matches_count
+
+    return prepare, match_day.update_players
+
+
+@benchmark('players_text_parse', [(20,), (200,), (10000,)], [(200,)])
+def bench_players_text_parse(rng, lines):
+    tails = ['', '', ' аб', ' б/а +1', ' вместо Пети', ' (вратарь)', ' в раме']
+    rows = ['Футбол в субботу 10:00', '']
+    names = player_names(lines)
+    for i in range(lines):
+        star = '*' if rng.random() < 0.05 else ''
+        rows.append(f'{star}{i + 1}. {names[i]}{rng.choice(tails)}')
+    text = '\n'.join(rows)
+    return lambda: PlayersText(text=text)
+
+
+@benchmark('matchday_parser_parse', [(3, 8), (16, 40)], [(3, 8)])
+def bench_matchday_parser_parse(rng, teams, matches):
+    match_day = make_match_day(rng, teams, matches)
+    team_lines = [
+        f'{team.name}: ' + ', '.join(player.name for player in team.players) for team in match_day.teams
+    ]
+    result_lines = [
+        f'{match.team1.name[0]} {match.goals1}:{match.goals2} {match.team2.name[0]}' for match in match_day.matches
+    ]
+    text = '\n'.join(team_lines + [''] + result_lines)
+    return lambda: MatchDayParser(text=text)
+
+
+@benchmark('set_players_match_data', [(200, 15), (2000, 15), (20000, 40)], [(200, 15)])
+def bench_set_players_match_data(rng, stored, played):
+    names = player_names(stored)
+    data = PlayersStorageData()
+    data.df = pd.DataFrame({
+        'Name': names,
+        'Rating': rng.integers(900, 1700, stored),
+        'Matches': rng.integers(0, 300, stored),
+    }).set_index('Name')
+    update = {str(name): [int(rng.integers(900, 1700)), 1] for name in rng.choice(names, played, replace=False)}
+    return lambda: data.set_players_match_data(update)
+
+
+def measure(fn: Callable | Tuple[Callable, Callable], repeat: int, seed: int) -> List[float]:
+    prepare, fn = fn if isinstance(fn, tuple) else (None, fn)
+    times = []
+    for _ in range(repeat):
+        if prepare:
+            prepare()
+        # MatchMaking использует глобальный np.random - одинаковый старт в каждом повторе
+        np.random.seed(seed)
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(name_filter: str = '', repeat: int = 5, quick: bool = False, seed: int = SEED) -> Dict:
+    results = {}
+    for name, (params, setup, quick_params) in BENCHMARKS.items():
+        if name_filter not in name:
+            continue
+        for param in (quick_params if quick else params):
+            np.random.seed(seed)
+            fn = setup(np.random.default_rng(seed), *param)
+            times = measure(fn, repeat, seed)
+            key = f'{name}[{",".join(map(str, param))}]'
+            results[key] = {'min': min(times), 'median': statistics.median(times), 'repeat': repeat}
+            print(f'{key:>40} {min(times) * 1000:10.3f} ms {statistics.median(times) * 1000:10.3f} ms')
+    return {
+        'commit': git_commit(),
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'seed': seed,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'results': results,
+    }
+
+
+def compare(report: Dict, previous: Dict):
+    print(f'\nagainst {previous.get("commit")} ({previous.get("date")}), median ratio new / old:')
+    for key, result in report['results'].items():
+        old = previous['results'].get(key)
+        if old:
+            print(f'{key:>40} {result["median"] / old["median"]:8.2f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of the matchmaking and rating hot paths')
+    parser.add_argument('-k', '--filter', default='', help='run benchmarks containing this substring')
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    parser.add_argument('-o', '--output', help='write results to this JSON file')
+    parser.add_argument('--compare', help='JSON results of a previous run')
+    parser.add_argument('--quick', action='store_true', help='only the smallest cases')
+    parser.add_argument('--seed', type=int, default=SEED)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    print(f'{"benchmark":>40} {"min":>13} {"median":>13}')
+    report = run(args.filter, args.repeat, args.quick, args.seed)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            compare(report, json.load(file))
+
+
+if __name__ == '__main__':
+    main()
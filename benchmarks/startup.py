@@ -0,0 +1,85 @@
+"""
+Import time of the bot process with a budget check.
+
+The bot module is imported in a fresh interpreter with `-X importtime`
+`runs` times; the median cumulative import time and the slowest modules
+are reported. The run fails (exit status 1) when the median is over
+`--budget-ms` or when a module that must be loaded lazily (numpy, pandas,
+pygsheets, Google API discovery, the optimizer) is imported at startup.
+
+    python -m benchmarks.startup --runs 5 --budget-ms 1200
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+from typing import Dict, List, Tuple
+
+MODULE = 'football_rating_bot.football_rating_bot'
+# загружаются при первом запросе, которому они нужны
+DEFERRED = (
+    'numpy',
+    'pandas',
+    'pygsheets',
+    'googleapiclient.discovery',
+    'football_rating.data_storage',
+    'football_rating.matchmaking',
+)
+
+
+def import_once(module: str) -> Tuple[Dict[str, Tuple[int, int]], List[str]]:
+    """Module -> (self, cumulative) import time in us and loaded deferred modules."""
+    code = (
+        f'import sys, {module}\n'
+        f'print(",".join(m for m in {DEFERRED!r} if m in sys.modules))'
+    )
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    loaded = [name for name in process.stdout.strip().split(',') if name]
+    return times, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import time of the bot process')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=1200.)
+    parser.add_argument('--top', type=int, default=10, help='slowest modules to show')
+    parser.add_argument('--module', default=MODULE)
+    args = parser.parse_args()
+
+    totals = []
+    loaded = set()
+    for _ in range(args.runs):
+        times, deferred = import_once(args.module)
+        totals.append(times[args.module][1] / 1000)
+        loaded.update(deferred)
+
+    print(f'{args.module}: median {statistics.median(totals):.0f} ms, min {min(totals):.0f} ms ({args.runs} runs)')
+    print(f'\n{"module":>40} {"self ms":>9} {"cumul ms":>9}')
+    # пакеты верхнего уровня из последнего запуска - видно, что именно грузится при старте
+    top_level = {name: value for name, value in times.items() if '.' not in name or name == args.module}
+    for name, (self_us, cumulative_us) in sorted(top_level.items(), key=lambda x: -x[1][1])[:args.top]:
+        print(f'{name:>40} {self_us / 1000:9.1f} {cumulative_us / 1000:9.1f}')
+
+    failed = False
+    if loaded:
+        print(f'\nFAIL: imported at startup: {", ".join(sorted(loaded))}')
+        failed = True
+    if statistics.median(totals) > args.budget_ms:
+        print(f'\nFAIL: median import time is over the budget of {args.budget_ms:.0f} ms')
+        failed = True
+    if failed:
+        sys.exit(1)
+    print(f'\nOK: within {args.budget_ms:.0f} ms, deferred modules are not imported')
+
+
+if __name__ == '__main__':
+    main()
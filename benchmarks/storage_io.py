@@ -0,0 +1,60 @@
+"""
+Read / write time of the local storage backends.
+
+A table of `players` random players is written and read back `repeat`
+times by each file backend (no network access needed).
+
+    python -m benchmarks.storage_io --players 10000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from football_rating.data_storage import FILE_STORAGES
+
+
+def make_df(players: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'Name': [f'Игрок {i}' for i in range(players)],
+        'Rating': rng.integers(900, 1700, players),
+        'Matches': rng.integers(0, 200, players),
+    }).set_index('Name')
+
+
+def measure(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main(players: int, repeat: int):
+    df = make_df(players)
+    directory = tempfile.mkdtemp()
+    print(f'{"backend":>22} {"write ms":>9} {"read ms":>9} {"read+get ms":>12}')
+    for ext, storage_type in FILE_STORAGES.items():
+        storage = storage_type(filepath=os.path.join(directory, f'rating{ext}'))
+        storage.data.df = df
+        write_ms = measure(storage.write, repeat)
+        read_ms = measure(storage.read, repeat)
+
+        def read_get():
+            storage.read()
+            storage.data.get_players_match_data_dict(['Игрок 1', 'Игрок 2'])
+
+        get_ms = measure(read_get, repeat)
+        print(f'{storage_type.__name__:>22} {write_ms:9.1f} {read_ms:9.1f} {get_ms:12.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--players', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    main(**vars(parser.parse_args()))
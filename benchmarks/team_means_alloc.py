@@ -0,0 +1,74 @@
+"""
+Allocations per call of the team means: `MatchMaking.calc_team_means` on a
+DataFrame against `TeamMeans` with preallocated buffers.
+
+For every roster the call is made `calls` times under `tracemalloc`; the
+peak of transient allocations and the memory still held afterwards are
+reported per call, together with the time per call.
+
+    python -m benchmarks.team_means_alloc --calls 200
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from football_rating.matchmaking import MatchMaking
+from football_rating.team_scoring import TeamMeans
+
+from typing import Callable, Tuple
+
+ROSTERS = [(10, 2), (48, 8), (100, 10), (200, 8), (192, 16)]
+
+
+def allocations(fn: Callable, calls: int) -> Tuple[int, float]:
+    """Peak transient bytes of one call and retained bytes per call."""
+    fn()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    peak = 0
+    for _ in range(calls):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        fn()
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+    retained = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    return peak, retained / calls
+
+
+def per_call(fn: Callable, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Allocations of the team means calculation')
+    parser.add_argument('--calls', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f'{"roster":>8} {"variant":>10} {"peak B":>10} {"kept B":>8} {"us/call":>9}')
+    for players, teams in ROSTERS:
+        skills = rng.integers(900, 1700, players).astype(float)
+        labels = rng.permutation(np.arange(players) % teams)
+        df = pd.DataFrame({'skill': skills, 'team': labels})
+        team_means = TeamMeans(skills, teams)
+        assert np.allclose(team_means(labels), MatchMaking.calc_team_means(df).to_numpy(), atol=1e-12)
+
+        variants = {
+            'dataframe': lambda: MatchMaking.calc_team_means(df),
+            'buffers': lambda: team_means(labels),
+        }
+        for name, fn in variants.items():
+            peak, retained = allocations(fn, args.calls)
+            seconds = per_call(fn, args.calls)
+            print(f'{players:>4}x{teams:<3} {name:>10} {peak:>10} {retained:>8.1f} {seconds * 1e6:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,50 @@
+import numpy as np
 import pandas as pd
 import json
+import os
 import pygsheets
 import pygsheets.client
 
-from .players_data import PlayersStorageData
+from .players_data import COLUMNS, PlayersStorageData
+from .google_clients import get_client
+from .tracing import traced
 
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
-from googleapiclient.discovery import build
-from typing import Tuple
+from typing import List, Tuple
+
+TIME_STATS_FORMAT = "%m.%Y"
+
 
 class StorageError(Exception):
     pass     
 
+
+def merge_time_stats(old_df: pd.DataFrame, ratings: pd.Series, dt: datetime) -> pd.DataFrame | None:
+    """
+    Add the monthly rating column for `dt` to a year table (Name + one
+    column per month). Returns None if the month is already there.
+    """
+    new_df = ratings.reset_index()
+    column_name = dt.strftime(TIME_STATS_FORMAT)
+    new_df.columns = ['Name', column_name]
+    if old_df.empty:
+        return new_df
+    old_df = old_df.set_index('Name').astype(int)
+    last_month = datetime.strptime(str(old_df.columns[-1]), TIME_STATS_FORMAT).date()
+    current_month = datetime(dt.year, dt.month, 1).date()
+    if not current_month > last_month:
+        return None
+    new_df.set_index('Name', inplace=True)
+    new_df = pd.concat([old_df, new_df], axis=1)
+    new_df = new_df.fillna(value=0).astype(int)
+    new_df.sort_values(column_name, ascending=False, inplace=True)
+    return new_df.reset_index()
+
 @dataclass
 class Storage(ABC):
-    data: PlayersStorageData = PlayersStorageData()
+    data: PlayersStorageData = field(default_factory=PlayersStorageData)
 
     def __post_init__(self):
         self.open()
@@ -34,9 +62,19 @@ class Storage(ABC):
     def write(self):
         pass
 
-    def update_time_stats(self):
+    def read_time_stats(self, year: str) -> pd.DataFrame:
+        """Monthly ratings table of the year (empty if not stored)."""
+        return pd.DataFrame()
+
+    def write_time_stats(self, year: str, df: pd.DataFrame):
         pass
 
+    def update_time_stats(self, dt: datetime):
+        year = dt.strftime("%Y")
+        new_df = merge_time_stats(self.read_time_stats(year), self.data.get_players_rating(), dt)
+        if new_df is not None:
+            self.write_time_stats(year, new_df)
+
     # def set_date(self, dt: datetime):
     #     self.dt = dt
 
@@ -44,50 +82,168 @@ class Storage(ABC):
 # noinspection PyAbstractClass
 @dataclass
 class FileStorage(Storage):
+    """
+    Local file storage. Monthly snapshots of a year are kept next to the
+    ratings file in `<name>_<year><ext>`.
+    """
     filepath: str | None = None
 
+    def open(self):
+        if not self.filepath:
+            raise ValueError('No file path provided')
+        directory = os.path.dirname(self.filepath)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def year_path(self, year: str) -> str:
+        name, ext = os.path.splitext(self.filepath)
+        return f'{name}_{year}{ext}'
+
 
 @dataclass
 class PlainTextFileStorage(FileStorage):
+    """Comma separated text with aligned columns, for reading by hand."""
+
+    SEPARATOR = ', '
+
     def read(self):
-        raise NotImplementedError('Not tested after pandas rework')
-        # self.data.clear()
-        # try:
-        #     with open(self.filepath, 'r', encoding='utf-8') as file:
-        #         for line in file[1:]:
-        #             parts = line.rstrip().split(',')
-        #             parts = [part.rstrip().lstrip() for part in parts]
-        #             name = parts[0]
-        #             elo = int(parts[1])
-        #             matches = int(parts[2])
-        #             self.data.data[name] = (elo, matches)
-        # except FileNotFoundError:
-        #     pass
+        self.data.clear()
+        try:
+            df = self._read_table(self.filepath)
+        except FileNotFoundError:
+            return
+        try:
+            df = df.set_index('Name').astype(int)
+        except (KeyError, ValueError):
+            raise StorageError('Ошибка: хранилище повреждено')
+        self.data.df = df
 
     def write(self):
-        raise NotImplementedError('Not tested after pandas rework')
-        # with open(self.filepath, 'w', encoding='utf-8') as file:
-        #     for item in self.data:
-        #         file.write(",".join(item))
+        self._write_table(self.filepath, self.data.df.reset_index())
+
+    def read_time_stats(self, year: str) -> pd.DataFrame:
+        try:
+            return self._read_table(self.year_path(year))
+        except FileNotFoundError:
+            return pd.DataFrame()
+
+    def write_time_stats(self, year: str, df: pd.DataFrame):
+        self._write_table(self.year_path(year), df)
+
+    @classmethod
+    def _read_table(cls, filepath: str) -> pd.DataFrame:
+        with open(filepath, 'r', encoding='utf-8') as file:
+            lines = [line.rstrip('\n') for line in file if line.strip()]
+        if not lines:
+            return pd.DataFrame()
+        header, *rows = [[part.strip() for part in line.split(',')] for line in lines]
+        return pd.DataFrame(rows, columns=header)
+
+    @classmethod
+    def _write_table(cls, filepath: str, df: pd.DataFrame):
+        rows = [list(map(str, df.columns))] + df.astype(str).values.tolist()
+        widths = [max(len(row[k]) for row in rows) for k in range(len(rows[0]))]
+        with open(filepath, 'w', encoding='utf-8') as file:
+            for row in rows:
+                cells = [cell.ljust(width) for cell, width in zip(row, widths)]
+                file.write(cls.SEPARATOR.join(cells).rstrip() + '\n')
 
 
 @dataclass
 class CsvTextFileStorage(FileStorage):
     def read(self):
-        raise NotImplementedError('Not tested after pandas rework')
-        # try:
-        #     df = pd.read_csv(self.filepath)
-        #     df.set_index('Name', inplace=True)
-        #     self.data.data = df.T.to_dict('list')
-        # except FileNotFoundError:
-        #     pass
+        self.data.clear()
+        try:
+            df = pd.read_csv(self.filepath, encoding='utf-8')
+        except FileNotFoundError:
+            return
+        except pd.errors.EmptyDataError:
+            return
+        try:
+            df.set_index('Name', inplace=True)
+        except KeyError:
+            raise StorageError('Ошибка: хранилище повреждено')
+        self.data.df = df
 
     def write(self):
-        raise NotImplementedError('Not tested after pandas rework')
-        # df = pd.DataFrame.from_dict(self.data.data, orient='index')
-        # df.index.name = 'Name'
-        # df.columns = ['Rating', 'Matches']
-        # df.to_csv(self.filepath)   
+        self.data.df.to_csv(self.filepath, encoding='utf-8')
+
+    def read_time_stats(self, year: str) -> pd.DataFrame:
+        try:
+            return pd.read_csv(self.year_path(year), encoding='utf-8')
+        except (FileNotFoundError, pd.errors.EmptyDataError):
+            return pd.DataFrame()
+
+    def write_time_stats(self, year: str, df: pd.DataFrame):
+        df.to_csv(self.year_path(year), index=False, encoding='utf-8')
+
+
+@dataclass
+class NpyBundleStorage(FileStorage):
+    """
+    Binary storage: `filepath` is a directory of .npy files.
+
+    * names.npy - player names (unicode array)
+    * columns.npy - int64 matrix, one column per `COLUMNS` entry
+    * <year>_names.npy, <year>_months.npy, <year>.npy - monthly snapshots
+
+    Arrays are memory-mapped copy-on-write on read, so loading doesn't
+    parse anything and only touched pages are copied. Files are written to
+    a temporary file and renamed, open mappings keep the old contents.
+    """
+
+    def open(self):
+        if not self.filepath:
+            raise ValueError('No file path provided')
+        os.makedirs(self.filepath, exist_ok=True)
+
+    def year_path(self, year: str) -> str:
+        return os.path.join(self.filepath, year)
+
+    def read(self):
+        self.data.clear()
+        try:
+            names = self._load('names')
+            values = self._load('columns')
+        except FileNotFoundError:
+            return
+        if values.shape != (len(names), len(COLUMNS)):
+            raise StorageError('Ошибка: хранилище повреждено')
+        self.data.set_columns(names.tolist(), {column: values[:, k] for k, column in enumerate(COLUMNS)})
+
+    def write(self):
+        names = self.data.names
+        values = np.column_stack([self.data.columns[column] for column in COLUMNS]) \
+            if names else np.zeros((0, len(COLUMNS)), dtype=np.int64)
+        self._save('names', np.array(names, dtype=str))
+        self._save('columns', values.astype(np.int64))
+
+    def read_time_stats(self, year: str) -> pd.DataFrame:
+        try:
+            names = self._load(f'{year}_names')
+            months = self._load(f'{year}_months')
+            values = self._load(year)
+        except FileNotFoundError:
+            return pd.DataFrame()
+        df = pd.DataFrame(np.asarray(values), columns=months.tolist())
+        df.insert(0, 'Name', names.tolist())
+        return df
+
+    def write_time_stats(self, year: str, df: pd.DataFrame):
+        self._save(f'{year}_names', df['Name'].to_numpy(dtype=str))
+        self._save(f'{year}_months', np.array(df.columns[1:], dtype=str))
+        self._save(year, df.iloc[:, 1:].to_numpy(dtype=np.int64))
+
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.filepath, f'{name}.npy'), mmap_mode='c')
+
+    def _save(self, name: str, array: np.ndarray):
+        path = os.path.join(self.filepath, f'{name}.npy')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as file:
+            np.save(file, array)
+        os.replace(tmp_path, path)
+
 
 @dataclass
 class GSheetStorage(Storage):
@@ -99,9 +255,15 @@ class GSheetStorage(Storage):
     gc: pygsheets.client.Client | None = None
     wb: pygsheets.Spreadsheet | None = None
     wks: pygsheets.Worksheet | None= None
+    # таблица в том виде, в котором она сейчас лежит на листе
+    sheet_df: pd.DataFrame | None = field(default=None, init=False, repr=False)
+
+    # доля измененных строк, после которой лист переписывается целиком
+    MAX_DIFF_RATIO = 0.5
 
     def __post_init__(self):
-        self.gc = pygsheets.authorize(service_account_json=self.service_json)
+        if self.gc is None:
+            self.gc = get_client(self.service_json)
         return super().__post_init__()
 
     def check_sheet(self, name: str):
@@ -111,6 +273,7 @@ class GSheetStorage(Storage):
             wks = self.wb.add_worksheet(name)
         return wks
     
+    @traced('storage.open')
     def open(self):
         if self.url:
             self.wb = self.gc.open_by_url(self.url)
@@ -127,9 +290,8 @@ class GSheetStorage(Storage):
                         'parents': [self.parent_id],  # ID папки (можно взять из URL)
                         'mimeType': 'application/vnd.google-apps.spreadsheet'
                     }
-                    # 2. Создаём файл через Google Drive API
-                    drive_service = build('drive', 'v3', credentials=self.gc.oauth)  # Получаем объект Drive API
-                    file = drive_service.files().create(
+                    # 2. Создаём файл через Google Drive API (сервис общего клиента)
+                    file = self.gc.drive.service.files().create(
                         body=file_metadata,
                         supportsAllDrives=True  # Важно для Shared Drives
                     ).execute()
@@ -153,6 +315,7 @@ class GSheetStorage(Storage):
         self.wks = self.wb.worksheet_by_title(self.sheet_name)
 
 
+    @traced('storage.read')
     def read(self):
         try:
             df: pd.DataFrame = self.wks.get_as_df()
@@ -161,16 +324,49 @@ class GSheetStorage(Storage):
             self.data.sort()
         except Exception:
             raise StorageError('Ошибка: хранилище повреждено')
+        self.sheet_df = self.data.df.reset_index()
 
     def read_sheet(self, sheet_name) -> pd.DataFrame:
         wks = self.check_sheet(sheet_name)
         return wks.get_as_df()
 
+    @traced('storage.write')
     def write(self):
-        df = self.data.df.copy()
-        self.wks.clear()
-        self.wks.set_dataframe(df.reset_index(), (1, 1))
-        self._update_color(self.wks, ("A1", "E1"), (0.0, 0.8, 0.0))
+        """
+        Write the rating table. Rows which differ from the last known sheet
+        state are sent in one batched values update, the sheet is cleared and
+        rewritten only if the table shape changed or most rows moved.
+        """
+        df = self.data.df.reset_index()
+        ranges = self._diff_ranges(df)
+        if ranges is None:
+            self.wks.clear()
+            self.wks.set_dataframe(df, (1, 1))
+            self._update_color(self.wks, ("A1", "E1"), (0.0, 0.8, 0.0))
+        elif ranges:
+            self.wks.update_values_batch(*zip(*ranges))
+        self.sheet_df = df
+
+    def _diff_ranges(self, df: pd.DataFrame) -> List[Tuple[str, List[List]]] | None:
+        """
+        (range, values) of changed row blocks against `sheet_df`, None if a
+        full rewrite is needed.
+        """
+        old = self.sheet_df
+        if old is None or old.shape != df.shape or list(old.columns) != list(df.columns):
+            return None
+        changed = np.flatnonzero((old.to_numpy() != df.to_numpy()).any(axis=1))
+        if len(changed) > self.MAX_DIFF_RATIO * len(df):
+            return None
+        end_column = chr(ord('A') + df.shape[1] - 1)
+        values = df.astype(object).values.tolist()
+        ranges = []
+        # соседние строки объединяются в один диапазон
+        for block in np.split(changed, np.flatnonzero(np.diff(changed) > 1) + 1):
+            if len(block):
+                first, last = block[0] + 2, block[-1] + 2    # строка 1 - заголовок
+                ranges.append((f'A{first}:{end_column}{last}', values[block[0]:block[-1] + 1]))
+        return ranges
 
     def write_sheet(self, sheet_name, df: pd.DataFrame):
         wks: pygsheets.Worksheet = self.wb.worksheet_by_title(sheet_name)
@@ -178,30 +374,53 @@ class GSheetStorage(Storage):
         end = chr(ord('A') + df.shape[1] - 1) + '1'
         self._update_color(wks, ("A1", end), (0.8, 0.8, 0.8))
 
+    def read_time_stats(self, year: str) -> pd.DataFrame:
+        wks = self.check_sheet(year)
+        return wks.get_as_df(numerize=False)
+
+    def write_time_stats(self, year: str, df: pd.DataFrame):
+        wks = self.check_sheet(year)
+        wks.set_dataframe(df, (1, 1))
+        end = chr(ord('A') + df.shape[1] - 1) + '1'
+        self._update_color(wks, ("A1", end), (0.8, 0.8, 0.8))
+
+    @traced('storage.update_time_stats')
     def update_time_stats(self, dt: datetime):
+        """
+        Append the monthly snapshot column for `dt` to the year sheet.
+
+        Only the header row is read to check the last month (its length also
+        gives the column of the new month). When a new month starts, the names
+        column is read and only the new column (and rows of new players) is
+        written, the existing cells are not touched. Unlike
+        `merge_time_stats`, the rows are not re-sorted: new players are
+        appended at the bottom with zeros for the earlier months. An empty
+        sheet is written in full.
+        """
         year = dt.strftime("%Y")
         wks = self.check_sheet(year)
-        old_df = wks.get_as_df(numerize=False)
-        new_df = self.data.get_players_rating().reset_index()
-        column_format = "%m.%Y"
-        column_name = dt.strftime(column_format)
-        new_df.columns = ['Name', column_name]
-        if not old_df.empty:
-            old_df.set_index('Name', inplace=True)
-            old_df = old_df.astype(int)
-            last_month = datetime.strptime(str(old_df.columns[-1]), column_format).date()
-            current_month = dt.replace(day=1).date()
-            if not current_month > last_month:
-                return
-            new_df.set_index('Name', inplace=True)
-            new_df = pd.concat([old_df, new_df], axis=1)
-            new_df = new_df.fillna(value=0).astype(int)
-            new_df.sort_values(column_name, ascending=False, inplace=True)
-            new_df.reset_index(inplace=True)
-
-        wks.set_dataframe(new_df, (1, 1))
-        end = chr(ord('A') + new_df.shape[1] - 1) + '1'
-        self._update_color(wks, ("A1", end), (0.8, 0.8, 0.8))
+        header = wks.get_row(1, include_tailing_empty=False)
+        ratings = self.data.get_players_rating()
+        if len(header) < 2:
+            self.write_time_stats(year, merge_time_stats(pd.DataFrame(), ratings, dt))
+            return
+        last_month = datetime.strptime(header[-1], TIME_STATS_FORMAT).date()
+        if not datetime(dt.year, dt.month, 1).date() > last_month:
+            return
+
+        names = wks.get_col(1, include_tailing_empty=False)[1:]
+        ratings = ratings.to_dict()
+        column = chr(ord('A') + len(header))
+        values = [[dt.strftime(TIME_STATS_FORMAT)]] + [[int(ratings.get(name, 0))] for name in names]
+        wks.update_values(f'{column}1', values, extend=True)
+        stored = set(names)
+        new_rows = [
+            [name] + [0] * (len(header) - 1) + [int(rating)]
+            for name, rating in ratings.items() if name not in stored
+        ]
+        if new_rows:
+            wks.update_values(f'A{len(names) + 2}', new_rows, extend=True)
+        self._update_color(wks, (f'{column}1', f'{column}1'), (0.8, 0.8, 0.8))
 
     def _update_color(self, wks, grid_range: Tuple[str, ...], rgb: Tuple[float, ...]):
         red, green, blue = rgb
@@ -218,4 +437,22 @@ class GSheetStorage(Storage):
                 }
             }
         ]
-        self.gc.sheet.batch_update(self.wb.id, requests)
\ No newline at end of file
+        self.gc.sheet.batch_update(self.wb.id, requests)
+
+
+FILE_STORAGES = {
+    '.txt': PlainTextFileStorage,
+    '.csv': CsvTextFileStorage,
+    '.npyd': NpyBundleStorage,
+}
+
+
+def open_storage(storage: str, service_json: str | None = None) -> Storage:
+    """
+    Open a storage by name: a path with a known extension (`FILE_STORAGES`)
+    is a local file storage, anything else is a Google Sheets file name.
+    """
+    ext = os.path.splitext(storage.rstrip('/'))[1].lower()
+    if ext in FILE_STORAGES:
+        return FILE_STORAGES[ext](filepath=storage.rstrip('/'))
+    return GSheetStorage(service_json=service_json, file_name=storage)
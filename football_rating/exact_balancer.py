@@ -0,0 +1,225 @@
+import time
+
+import numpy as np
+
+from .log import get_logger
+from .team_scoring import pair_expectation
+
+from dataclasses import dataclass
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class ExactResult:
+    teams: np.ndarray   # метка команды для каждого игрока (по позициям)
+    score: float
+    optimal: bool       # перебор завершен, решение доказано оптимальным
+    nodes: int
+
+
+class ExactBalancer:
+    """
+    Branch-and-bound search for the split with the minimum `calc_score`
+    for small rosters.
+
+    The score of a split is the maximum deviation of a team's mean expected
+    score against the other teams from the overall mean (0.5). With the
+    player expectation matrix P[i, j] the expected score of team a against
+    team b is sum(P[a, b]) / (m_a * m_b).
+
+    Search
+    ------
+    Teams are filled one after another (largest first) with combinations of
+    the remaining players. Players are ordered by their total expectation
+    R_i = sum_j P[i, j], strongest first.
+
+    * Symmetry breaking: among teams of the same size the first member of a
+      team comes after the first member of the previous one, and if all
+      remaining teams have the same size, the first remaining player is put
+      into the current team.
+    * Split constraint: a team holds at most one split player and the
+      remaining split players must fit into the remaining teams.
+    * Lower bound: for a completed team the known part of its deviation is
+      exact, the part against unassigned players is bounded by pairing them
+      with the remaining slot weights (rearrangement inequality). If all
+      teams have the same size the deviation only depends on the sum of R_i
+      of the team, which also bounds partially filled teams.
+
+    The search stops after `time_budget` seconds, the best split found so
+    far is returned with `optimal=False`.
+    """
+
+    CHECK_EVERY = 1000
+
+    def __init__(self, skills, sizes, split_mask=None, time_budget: float = 2.0,
+                 expectation: np.ndarray | None = None):
+        """
+        Parameters
+        ----------
+        skills: array-like
+            Skill rating per player.
+        sizes: array-like
+            Size of each team, must sum up to the number of players.
+        split_mask: array-like | None
+            True for players, which have to be set to different teams.
+        time_budget: float
+            Search time limit in seconds.
+        expectation: np.ndarray | None
+            `pair_expectation` of the skills (read only), computed if None.
+        """
+        skills = np.asarray(skills, dtype=float)
+        self.num_players = len(skills)
+        self.sizes = np.asarray(sizes, dtype=int)
+        if self.sizes.sum() != self.num_players:
+            raise ValueError('Team sizes do not match the number of players')
+        self.num_teams = len(self.sizes)
+        self.split_mask = np.zeros(self.num_players, dtype=bool) if split_mask is None \
+            else np.asarray(split_mask, dtype=bool)
+        self.time_budget = time_budget
+        self.expectation = pair_expectation(skills) if expectation is None else expectation
+        self.strength = self.expectation.sum(axis=1)
+
+    def calc_score(self, teams: np.ndarray) -> float:
+        """Score of a complete split given as a label per player."""
+        onehot = np.zeros((self.num_teams, self.num_players))
+        onehot[teams, np.arange(self.num_players)] = 1.
+        counts = onehot.sum(axis=1)
+        expected = onehot @ self.expectation @ onehot.T / np.outer(counts, counts)
+        off_diagonal = ~np.eye(self.num_teams, dtype=bool)
+        means = expected[off_diagonal].reshape(self.num_teams, -1).mean(axis=1)
+        means -= means.mean()
+        return np.abs(means).max()
+
+    def _check_split(self, teams: np.ndarray) -> bool:
+        split_count = np.bincount(teams[self.split_mask], minlength=self.num_teams)
+        return bool((split_count <= 1).all())
+
+    def solve(self, incumbent=None) -> ExactResult:
+        """
+        Run the search.
+
+        Parameters
+        ----------
+        incumbent: array-like | None
+            Known split (label per player) used as the initial upper bound.
+        """
+        num_teams = self.num_teams
+        order = np.argsort(-self.strength, kind='stable')
+        expectation = self.expectation[np.ix_(order, order)]
+        strength = self.strength[order]
+        split = self.split_mask[order]
+        team_order = np.argsort(-self.sizes, kind='stable')
+        caps = self.sizes[team_order]
+        equal_sizes = bool((caps == caps[0]).all())
+        # все оставшиеся команды (k...) одного размера
+        tail_equal = [bool((caps[k:] == caps[k]).all()) for k in range(num_teams)]
+        # веса вклада игрока команды b в отклонение команды a
+        weights = 1 / (np.outer(caps, caps) * max(num_teams - 1, 1))
+
+        best_teams = None
+        best_score = np.inf
+        if incumbent is not None:
+            incumbent = np.asarray(incumbent, dtype=int)
+            if self._check_split(incumbent):
+                best_teams = incumbent.copy()
+                best_score = self.calc_score(incumbent)
+
+        m = caps[0]
+        target = 0.5 * (num_teams - 1) * m * m + 0.5 * m * m
+        scale = (num_teams - 1) * m * m
+        labels = np.full(self.num_players, -1)
+        members = [[] for _ in range(num_teams)]
+        start = time.perf_counter()
+        nodes = 0
+        timed_out = False
+
+        def out_of_time():
+            nonlocal nodes, timed_out
+            nodes += 1
+            if nodes % self.CHECK_EVERY == 0 and time.perf_counter() - start > self.time_budget:
+                timed_out = True
+            return timed_out
+
+        def completed_bound(k: int) -> float:
+            # нижняя оценка score по уже заполненным командам 0..k
+            unassigned = labels < 0
+            slot_teams = np.repeat(np.arange(k + 1, num_teams), caps[k + 1:])
+            bound = 0.
+            for a in range(k + 1):
+                q = expectation[members[a]].sum(axis=0)
+                known = sum(weights[a, b] * q[members[b]].sum() for b in range(k + 1) if b != a)
+                q_free = np.sort(q[unassigned])[::-1]
+                slot_weights = np.sort(weights[a, slot_teams])
+                low = known + q_free @ slot_weights - 0.5
+                high = known + q_free @ slot_weights[::-1] - 0.5
+                bound = max(bound, low, -high)
+            return bound
+
+        def leaf():
+            nonlocal best_teams, best_score
+            teams = np.empty(self.num_players, dtype=int)
+            teams[order] = team_order[labels]
+            score = self.calc_score(teams)
+            if score < best_score:
+                best_score = score
+                best_teams = teams
+                logger.info(f'exact: new score {score}')
+
+        def fill_team(k: int):
+            if out_of_time():
+                return
+            avail = np.flatnonzero(labels < 0)
+            if k == num_teams - 1:
+                if split[avail].sum() > 1:
+                    return
+                labels[avail] = k
+                members[k] = list(avail)
+                leaf()
+                labels[avail] = -1
+                return
+            first_min = -1
+            if not tail_equal[k] and k > 0 and caps[k] == caps[k - 1]:
+                first_min = members[k - 1][0] + 1
+            prefix = np.concatenate(([0.], np.cumsum(strength[avail])))
+            chosen = []
+
+            def choose(pos: int, partial: float, split_used: int):
+                if timed_out:
+                    return
+                need = caps[k] - len(chosen)
+                if need == 0:
+                    labels[chosen] = k
+                    members[k] = list(chosen)
+                    split_left = split[labels < 0].sum()
+                    if split_left <= num_teams - k - 1 and completed_bound(k) < best_score:
+                        fill_team(k + 1)
+                    labels[chosen] = -1
+                    return
+                if equal_sizes:
+                    # сумма сильнейших / слабейших need игроков среди avail[pos:]
+                    high = partial + prefix[pos + need] - prefix[pos]
+                    low = partial + prefix[-1] - prefix[len(avail) - need]
+                    if high < target - best_score * scale or low > target + best_score * scale:
+                        return
+                last = len(avail) - need
+                if not chosen and tail_equal[k]:
+                    last = 0    # первый свободный игрок идет в текущую команду
+                for p in range(pos, last + 1):
+                    player = avail[p]
+                    if not chosen and player < first_min:
+                        continue
+                    if split[player] and split_used:
+                        continue
+                    if out_of_time():
+                        return
+                    chosen.append(player)
+                    choose(p + 1, partial + strength[player], split_used + split[player])
+                    chosen.pop()
+
+            choose(0, 0., 0)
+
+        fill_team(0)
+        elapsed = time.perf_counter() - start
+        logger.info(f'exact: score {best_score}, nodes {nodes}, {elapsed:.2f}s, timed out {timed_out}')
+        return ExactResult(best_teams, best_score, not timed_out, nodes)
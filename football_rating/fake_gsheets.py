@@ -0,0 +1,261 @@
+import itertools
+import re
+import time
+
+import pandas as pd
+import pygsheets
+
+from collections import Counter
+from typing import Callable, Dict, List
+
+
+def _numerize(value):
+    if isinstance(value, str):
+        for cast in (int, float):
+            try:
+                return cast(value)
+            except ValueError:
+                pass
+    return value
+
+
+class FakeWorksheet:
+    """
+    In-memory stand-in for `pygsheets.Worksheet` with the subset of the API
+    used by `GSheetStorage`. Every API-like call is counted in the client.
+    """
+
+    def __init__(self, client: 'FakeClient', title: str):
+        self.client = client
+        self.title = title
+        self.values: List[List] = []
+
+    def _call(self, name: str):
+        self.client.call(name)
+
+    def get_as_df(self, numerize=True, **kwargs) -> pd.DataFrame:
+        self._call('get_as_df')
+        if not self.values:
+            return pd.DataFrame()
+        header, *rows = self.values
+        if not numerize:
+            rows = [[str(value) for value in row] for row in rows]
+        else:
+            rows = [[_numerize(value) for value in row] for row in rows]
+        return pd.DataFrame(rows, columns=header)
+
+    def get_row(self, row: int, include_tailing_empty=True, **kwargs) -> List[str]:
+        self._call('get_row')
+        values = self.values[row - 1] if row <= len(self.values) else []
+        return self._trim([str(value) for value in values], include_tailing_empty)
+
+    def get_col(self, col: int, include_tailing_empty=True, **kwargs) -> List[str]:
+        self._call('get_col')
+        values = [str(line[col - 1]) if col <= len(line) else '' for line in self.values]
+        return self._trim(values, include_tailing_empty)
+
+    @staticmethod
+    def _trim(values: List[str], include_tailing_empty: bool) -> List[str]:
+        while values and not include_tailing_empty and values[-1] == '':
+            values = values[:-1]
+        return values
+
+    def set_dataframe(self, df: pd.DataFrame, start, copy_head=True, **kwargs):
+        self._call('set_dataframe')
+        rows = [list(df.columns)] if copy_head else []
+        rows += df.astype(object).values.tolist()
+        self._write(start[0] - 1, start[1] - 1, rows)
+
+    def update_values(self, crange: str = None, values: List[List] = None, **kwargs):
+        self._call('update_values')
+        row, col = self.client.parse_addr(crange.split(':')[0])
+        self._write(row, col, values)
+
+    def update_values_batch(self, ranges: List[str], values: List[List[List]], **kwargs):
+        self._call('update_values_batch')
+        for crange, matrix in zip(ranges, values):
+            row, col = self.client.parse_addr(crange.split(':')[0])
+            self._write(row, col, matrix)
+
+    def update_value(self, addr: str, value):
+        self._call('update_value')
+        row, col = self.client.parse_addr(addr)
+        self._write(row, col, [[value]])
+
+    def clear(self):
+        self._call('clear')
+        self.values = []
+
+    def get_gridrange(self, start: str, end: str) -> Dict:
+        return {'sheetTitle': self.title, 'start': start, 'end': end}
+
+    def _write(self, row: int, col: int, rows: List[List]):
+        for i, values in enumerate(rows):
+            while len(self.values) <= row + i:
+                self.values.append([])
+            line = self.values[row + i]
+            while len(line) < col + len(values):
+                line.append('')
+            line[col:col + len(values)] = values
+
+
+class FakeSpreadsheet:
+    def __init__(self, client: 'FakeClient', key: str, title: str):
+        self.client = client
+        self.id = key
+        self.title = title
+        self.url = f'https://docs.google.com/spreadsheets/d/{key}'
+        self.worksheets: Dict[str, FakeWorksheet] = {'Sheet1': FakeWorksheet(client, 'Sheet1')}
+        self.shared: List[Dict] = []
+
+    def worksheet_by_title(self, title: str) -> FakeWorksheet:
+        self.client.call('worksheet_by_title')
+        try:
+            return self.worksheets[title]
+        except KeyError:
+            raise pygsheets.WorksheetNotFound(title)
+
+    def add_worksheet(self, title: str) -> FakeWorksheet:
+        self.client.call('add_worksheet')
+        self.worksheets[title] = FakeWorksheet(self.client, title)
+        return self.worksheets[title]
+
+    def del_worksheet(self, worksheet: FakeWorksheet):
+        self.client.call('del_worksheet')
+        del self.worksheets[worksheet.title]
+
+    def share(self, email: str, role: str = 'reader', type: str = 'user'):
+        self.client.call('share')
+        self.shared.append({'email': email, 'role': role, 'type': type})
+
+
+class FakeSheetAPI:
+    def __init__(self, client: 'FakeClient'):
+        self.client = client
+
+    def batch_update(self, spreadsheet_id: str, requests, **kwargs):
+        self.client.call('batch_update')
+
+
+class FakeRequest:
+    def __init__(self, client: 'FakeClient', name: str, fn: Callable):
+        self.client = client
+        self.name = name
+        self.fn = fn
+
+    def execute(self):
+        self.client.call(self.name)
+        return self.fn()
+
+
+class FakeDriveFiles:
+    """`files()` of the Drive v3 service: create, list by `name contains` and delete."""
+
+    NAME_CONTAINS_RE = re.compile(r"name contains '([^']*)'")
+
+    def __init__(self, client: 'FakeClient'):
+        self.client = client
+
+    def create(self, body: Dict, **kwargs) -> FakeRequest:
+        def create():
+            key = self.client.new_key()
+            self.client.spreadsheets[key] = FakeSpreadsheet(self.client, key, body['name'])
+            return {'id': key}
+        return FakeRequest(self.client, 'drive.create', create)
+
+    def list(self, q: str = '', fields: str = '', pageSize: int = 100, pageToken: str | None = None,
+             **kwargs) -> FakeRequest:
+        match = self.NAME_CONTAINS_RE.search(q)
+        def list_files():
+            files = [
+                {'id': key, 'name': spreadsheet.title}
+                for key, spreadsheet in self.client.spreadsheets.items()
+                if match is None or match.group(1) in spreadsheet.title
+            ]
+            # токен страницы - индекс первого файла
+            start = int(pageToken or 0)
+            result = {'files': files[start:start + pageSize]}
+            if start + pageSize < len(files):
+                result['nextPageToken'] = str(start + pageSize)
+            return result
+        return FakeRequest(self.client, 'drive.list', list_files)
+
+    def delete(self, fileId: str, **kwargs) -> FakeRequest:
+        def delete():
+            del self.client.spreadsheets[fileId]
+        return FakeRequest(self.client, 'drive.delete', delete)
+
+
+class FakeDriveService:
+    def __init__(self, client: 'FakeClient'):
+        self._files = FakeDriveFiles(client)
+
+    def files(self) -> FakeDriveFiles:
+        return self._files
+
+
+class FakeDrive:
+    def __init__(self, client: 'FakeClient'):
+        self.service = FakeDriveService(client)
+
+
+class FakeClient:
+    """
+    Local fake of `pygsheets.client.Client` for running storages without
+    network access. Spreadsheets live in memory and `calls` counts the API
+    requests by name. `latency` seconds are slept on every request to
+    emulate the network in benchmarks, requests named in `failing` raise
+    `ConnectionError`. `drive.service` fakes the Drive v3 file requests over
+    the same spreadsheets.
+    """
+
+    oauth = None
+
+    def __init__(self, latency: float = 0.):
+        self.latency = latency
+        self.calls = Counter()
+        self.failing = set()
+        self.spreadsheets: Dict[str, FakeSpreadsheet] = {}
+        self.sheet = FakeSheetAPI(self)
+        self.drive = FakeDrive(self)
+        self._keys = itertools.count()
+
+    def call(self, name: str):
+        self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if name in self.failing:
+            raise ConnectionError(f'fake {name} failed')
+
+    @staticmethod
+    def parse_addr(addr: str):
+        letters = ''.join(ch for ch in addr if ch.isalpha())
+        digits = ''.join(ch for ch in addr if ch.isdigit())
+        col = 0
+        for ch in letters.upper():
+            col = col * 26 + ord(ch) - ord('A') + 1
+        return int(digits) - 1, col - 1
+
+    def new_key(self) -> str:
+        return f'fake{next(self._keys)}'
+
+    def create(self, title: str) -> FakeSpreadsheet:
+        self.call('create')
+        key = self.new_key()
+        self.spreadsheets[key] = FakeSpreadsheet(self, key, title)
+        return self.spreadsheets[key]
+
+    def open(self, title: str) -> FakeSpreadsheet:
+        self.call('open')
+        for spreadsheet in self.spreadsheets.values():
+            if spreadsheet.title == title:
+                return spreadsheet
+        raise pygsheets.SpreadsheetNotFound(title)
+
+    def open_by_key(self, key: str) -> FakeSpreadsheet:
+        self.call('open_by_key')
+        return self.spreadsheets[key]
+
+    def open_by_url(self, url: str) -> FakeSpreadsheet:
+        self.call('open_by_url')
+        return self.spreadsheets[url.rstrip('/').split('/')[-1]]
@@ -2,7 +2,8 @@ import pandas as pd
 
 from .matchday import Team, MatchDay
 from .text_parser import MatchDayParser, check_new_players
-from .data_storage import GSheetStorage
+from .data_storage import GSheetStorage, open_storage
+from .players_data import PlayersStorageData
 
 import argparse
 import os
@@ -12,8 +13,6 @@ from datetime import datetime
 from dotenv import load_dotenv
 from typing import List
 
-load_dotenv()
-
 
 def parse_argument() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
@@ -21,7 +20,10 @@ def parse_argument() -> argparse.Namespace:
         description='File based football elo rating program'
     )
     parser.add_argument('filepath', help='text file with match results')
-    parser.add_argument('-s', '--storage', default='football-rating')
+    parser.add_argument(
+        '-s', '--storage', default='football-rating',
+        help='Google Sheets file name or local file (.csv, .txt, .npyd)'
+    )
     return parser.parse_args()
 
 
@@ -53,16 +55,11 @@ def save_match_played(
     storage.write_sheet(sheet_name, df.reset_index())
 
 
-def update_rating(filepath: str, storage: str):
-    # storage = data_storage.CsvTextFileStorage('ratings.csv')
-    google_storage = GSheetStorage(
-        service_json=os.getenv("GCP_KEY"),
-        file_name=storage
-    )
-    google_storage.update_time_stats(datetime.today())
-    stored_data = google_storage.data
-    results = MatchDayParser(filepath=filepath).results
-    teams = results.teams
+def load_players(stored_data: PlayersStorageData, match_day: MatchDay):
+    """
+    Set stored rating and matches count to the players of the match day.
+    """
+    teams = match_day.teams
     players = [player.name for player in player_generator(teams)]
     stored_players = stored_data.get_players_match_data_dict(players)
     check_new_players(players, list(stored_players.keys()))
@@ -73,7 +70,22 @@ def update_rating(filepath: str, storage: str):
             player.matches = matches
         except KeyError:
             pass
-    for team in teams:
+
+
+def store_players(stored_data: PlayersStorageData, match_day: MatchDay):
+    new_player_data = {
+        player.name: (player.elo, player.matches) for player in player_generator(match_day.teams)
+    }
+    stored_data.set_players_match_data(new_player_data)
+
+
+def update_rating(filepath: str, storage: str):
+    storage = open_storage(storage, service_json=os.getenv("GCP_KEY"))
+    storage.update_time_stats(datetime.today())
+    stored_data = storage.data
+    results = MatchDayParser(filepath=filepath).results
+    load_players(stored_data, results)
+    for team in results.teams:
         players_elo = [player.elo for player in team.players]
         team_elo = sum(players_elo) / len(players_elo)
         print(f'Команда {team.name} - средний {team_elo}')
@@ -81,16 +93,14 @@ def update_rating(filepath: str, storage: str):
     print(results.get_scores())
 
     results.update_players()
-    new_player_data = {
-        player.name: (player.elo, player.matches) for player in player_generator(teams)
-    }
-    stored_data.set_players_match_data(new_player_data)
-    google_storage.write()
+    store_players(stored_data, results)
+    storage.write()
     # save_match_played(storage, results) # no need anymore
 
 
 # Press the green button in the gutter to run the script.
 if __name__ == '__main__':
+    load_dotenv()
     args = parse_argument()
     if args.storage == 'football-rating':
         key = input('\nUpdate main storage? [y]:')
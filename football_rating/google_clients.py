@@ -0,0 +1,147 @@
+import datetime
+import threading
+
+from .log import get_logger
+from .tracing import span
+
+from typing import Callable, Dict
+
+logger = get_logger(__name__)
+
+
+class ThreadLocalHttp:
+    """
+    `httplib2.Http` stand-in which keeps a separate `Http` per thread.
+
+    `httplib2.Http` is not thread-safe (it keeps its connections in a
+    dict), while the shared client is used from the bot worker threads
+    and the token refresh thread at once. Requests go to the `Http` of the
+    calling thread, created on its first request.
+    """
+
+    def __init__(self, factory: Callable | None = None):
+        if factory is None:
+            import httplib2
+            factory = httplib2.Http
+        self._factory = factory
+        self._local = threading.local()
+
+    @property
+    def http(self):
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = self._local.http = self._factory()
+        return http
+
+    def request(self, *args, **kwargs):
+        return self.http.request(*args, **kwargs)
+
+    def __getattr__(self, name):
+        # timeout, redirect_codes, close() и т.п. - от Http текущего потока
+        return getattr(self.http, name)
+
+
+class GoogleClients:
+    """
+    Process-wide registry of authorized Google clients.
+
+    The service account key is parsed and authorized once per key; every
+    storage gets the same `pygsheets.Client` and the Drive service it
+    already holds (`client.drive.service`, built from the discovery document
+    bundled with pygsheets), so nothing is rebuilt per request. The client
+    sends requests through `ThreadLocalHttp`, so the credentials are shared
+    while each thread has its own HTTP connections.
+
+    A daemon thread refreshes the access tokens `refresh_margin` seconds
+    before they expire, so requests don't wait for a token refresh.
+    `set_client` registers a ready client (e.g. `FakeClient`) for offline runs.
+    """
+
+    def __init__(self, refresh_margin: float = 300., check_interval: float = 60.):
+        """
+        Parameters
+        ----------
+        refresh_margin: float
+            Seconds before the token expiry when it is refreshed.
+        check_interval: float
+            Seconds between checks of the token expiry.
+        """
+        self.refresh_margin = refresh_margin
+        self.check_interval = check_interval
+        self._clients: Dict[str | None, object] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def client(self, service_json: str | None = None):
+        """Authorized `pygsheets.Client` for the service account key."""
+        with self._lock:
+            client = self._clients.get(service_json)
+            if client is None:
+                import pygsheets
+                with span('google.auth'):
+                    client = pygsheets.authorize(service_account_json=service_json, http=ThreadLocalHttp())
+                self._clients[service_json] = client
+                self._start_refresh()
+            return client
+
+    def drive(self, service_json: str | None = None):
+        """Drive v3 service of the shared client."""
+        return self.client(service_json).drive.service
+
+    def set_client(self, client, service_json: str | None = None):
+        with self._lock:
+            self._clients[service_json] = client
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def refresh(self, force: bool = False):
+        """Refresh tokens which expire within `refresh_margin` seconds."""
+        with self._lock:
+            clients = list(self._clients.values())
+        for client in clients:
+            credentials = getattr(client, 'oauth', None)
+            if credentials is None or not hasattr(credentials, 'refresh'):
+                continue
+            expiry = credentials.expiry
+            # expiry в google-auth - наивное время UTC
+            margin = datetime.timedelta(seconds=self.refresh_margin)
+            now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+            if force or expiry is None or expiry - now < margin:
+                from google.auth.transport.requests import Request
+                with span('google.refresh'):
+                    credentials.refresh(Request())
+
+    def _start_refresh(self):
+        if self._thread is not None or self.check_interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, name='google-token-refresh', daemon=True)
+        self._thread.start()
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                # при ошибке токен обновится обычным способом перед запросом
+                logger.error(f'Token refresh failed: {e}')
+
+
+REGISTRY = GoogleClients()
+
+
+def get_client(service_json: str | None = None):
+    return REGISTRY.client(service_json)
+
+
+def get_drive(service_json: str | None = None):
+    return REGISTRY.drive(service_json)
@@ -0,0 +1,279 @@
+import datetime
+import json
+import sqlite3
+
+from .log import get_logger
+from .matchday import DEFAULT_ELO, Match, MatchDay, Player, Team
+from .players_data import PlayersStorageData
+
+from typing import Dict, Iterable, List, Tuple
+
+logger = get_logger(__name__)
+
+# имя игрока -> (рейтинг, количество матчей); имена без учета регистра, как в PlayersStorageData
+RatingState = Dict[str, Tuple[int, int]]
+# позиция дня в истории: (дата, id дня)
+DayKey = Tuple[str, int]
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    day_id INTEGER NOT NULL,
+    date TEXT,
+    payload TEXT,
+    created TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS days (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_days_date ON days (date, id);
+CREATE TABLE IF NOT EXISTS snapshots (
+    date TEXT NOT NULL,
+    day_id INTEGER NOT NULL,
+    ratings TEXT NOT NULL,
+    PRIMARY KEY (date, day_id)
+);
+CREATE TABLE IF NOT EXISTS state (
+    name TEXT PRIMARY KEY,
+    ratings TEXT NOT NULL
+);
+'''
+
+
+def encode_day(match_day: MatchDay) -> str:
+    """Match day as JSON: team rosters and (team1, team2, goals1, goals2)."""
+    return json.dumps({
+        'teams': {team.name: [player.name for player in team.players] for team in match_day.teams},
+        'matches': [
+            [match.team1.name, match.team2.name, match.goals1, match.goals2] for match in match_day.matches
+        ],
+    }, ensure_ascii=False)
+
+
+def decode_day(date: str, payload: str, state: RatingState) -> MatchDay:
+    """
+    Match day with the players rating and matches taken from `state`.
+    Names are matched case-insensitively, a known player gets the name
+    spelling of `state`.
+    """
+    data = json.loads(payload)
+    names = {name.casefold(): name for name in state}
+    players = {}
+    teams = {}
+    for team_name, team_players in data['teams'].items():
+        team = []
+        for player in team_players:
+            key = player.casefold()
+            if key not in players:
+                name = names.get(key, player)
+                players[key] = Player(name, *state.get(name, (DEFAULT_ELO, 0)))
+            team.append(players[key])
+        teams[team_name] = Team(team_name, team)
+    matches = [
+        Match(teams[team1], teams[team2], goals1, goals2) for team1, team2, goals1, goals2 in data['matches']
+    ]
+    return MatchDay(matches, list(teams.values()), datetime.date.fromisoformat(date))
+
+
+class RatingHistory:
+    """
+    Append-only event log of match days with rating snapshots (SQLite).
+
+    Every insert, amend and delete of a match day is appended to `events`;
+    `days` holds the resulting match days ordered by (date, id). Replaying
+    the days from the base ratings gives the current ratings.
+
+    After every `snapshot_every` days the ratings are stored as a snapshot.
+    Changing a day drops the snapshots from its position on and replays only
+    the days after the nearest earlier snapshot; appending a day after the
+    last one applies just this day to the current state.
+    """
+
+    def __init__(self, db_path: str = ':memory:', snapshot_every: int = 10):
+        """
+        Parameters
+        ----------
+        db_path: str
+            SQLite database file.
+        snapshot_every: int
+            Number of days between rating snapshots.
+        """
+        self.snapshot_every = snapshot_every
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def set_base(self, state: RatingState):
+        """Ratings before the first match day, all days are replayed."""
+        with self.connection:
+            self._save_state('base', state)
+            self.connection.execute('DELETE FROM snapshots')
+            self._recompute(None)
+
+    def set_base_from(self, data: PlayersStorageData):
+        self.set_base(data.get_players_match_data_dict(data.names))
+
+    def state(self) -> RatingState:
+        """Current ratings."""
+        return self._load_state('current')
+
+    def apply_to(self, data: PlayersStorageData):
+        """Set the current ratings to the stored players."""
+        data.set_players_match_data(self.state())
+
+    def days(self) -> List[Tuple[int, datetime.date]]:
+        rows = self.connection.execute('SELECT id, date FROM days ORDER BY date, id')
+        return [(day_id, datetime.date.fromisoformat(date)) for day_id, date in rows]
+
+    def events(self) -> List[Tuple]:
+        """Audit log: (id, kind, day id, date, payload, created)."""
+        return self.connection.execute('SELECT * FROM events ORDER BY id').fetchall()
+
+    def insert(self, match_day: MatchDay) -> int:
+        """Add a match day (possibly in the past), returns its id."""
+        date = match_day.date.isoformat()
+        payload = encode_day(match_day)
+        with self.connection:
+            cursor = self.connection.execute('INSERT INTO days (date, payload) VALUES (?, ?)', (date, payload))
+            day_id = cursor.lastrowid
+            self._log('insert', day_id, date, payload)
+            if self._last_key() == (date, day_id):
+                self._append(date, day_id, payload)
+            else:
+                self._recompute((date, day_id))
+        return day_id
+
+    def amend(self, day_id: int, match_day: MatchDay):
+        """Replace a match day (results, rosters or date)."""
+        old_key = self._day_key(day_id)
+        date = match_day.date.isoformat()
+        payload = encode_day(match_day)
+        with self.connection:
+            self.connection.execute('UPDATE days SET date = ?, payload = ? WHERE id = ?', (date, payload, day_id))
+            self._log('amend', day_id, date, payload)
+            self._recompute(min(old_key, (date, day_id)))
+
+    def delete(self, day_id: int):
+        key = self._day_key(day_id)
+        with self.connection:
+            self.connection.execute('DELETE FROM days WHERE id = ?', (day_id,))
+            self._log('delete', day_id, key[0], None)
+            self._recompute(key)
+
+    def import_days(self, match_days: Iterable[MatchDay]):
+        """Append many match days (e.g. `iter_match_days`) with one replay."""
+        with self.connection:
+            first = None
+            for match_day in match_days:
+                date = match_day.date.isoformat()
+                payload = encode_day(match_day)
+                day_id = self.connection.execute(
+                    'INSERT INTO days (date, payload) VALUES (?, ?)', (date, payload)
+                ).lastrowid
+                self._log('insert', day_id, date, payload)
+                first = min(first, (date, day_id)) if first else (date, day_id)
+            if first:
+                self._recompute(first)
+
+    def _day_key(self, day_id: int) -> DayKey:
+        row = self.connection.execute('SELECT date, id FROM days WHERE id = ?', (day_id,)).fetchone()
+        if row is None:
+            raise KeyError(f'Match day {day_id} not found')
+        return row
+
+    def _last_key(self) -> DayKey | None:
+        return self.connection.execute('SELECT date, id FROM days ORDER BY date DESC, id DESC LIMIT 1').fetchone()
+
+    def _count_before(self, key: DayKey | None) -> int:
+        if key is None:
+            return 0
+        return self.connection.execute(
+            'SELECT COUNT(*) FROM days WHERE date < ? OR (date = ? AND id <= ?)', (key[0], key[0], key[1])
+        ).fetchone()[0]
+
+    def _log(self, kind: str, day_id: int, date: str | None, payload: str | None):
+        self.connection.execute(
+            'INSERT INTO events (kind, day_id, date, payload, created) VALUES (?, ?, ?, ?, ?)',
+            (kind, day_id, date, payload, datetime.datetime.now().isoformat(timespec='seconds'))
+        )
+
+    def _append(self, date: str, day_id: int, payload: str):
+        # текущее состояние - все дни до нового (или base, если дней не было)
+        state = self._load_state('current') if self._has_state('current') else self._load_state('base')
+        state = self._apply_day(state, date, payload)
+        self._save_state('current', state)
+        if self._count_before((date, day_id)) % self.snapshot_every == 0:
+            self._save_snapshot((date, day_id), state)
+
+    def _recompute(self, changed: DayKey | None):
+        """Replay the days after the nearest snapshot before `changed`."""
+        if changed is not None:
+            self.connection.execute(
+                'DELETE FROM snapshots WHERE date > ? OR (date = ? AND day_id >= ?)',
+                (changed[0], changed[0], changed[1])
+            )
+        snapshot = self.connection.execute(
+            'SELECT date, day_id, ratings FROM snapshots ORDER BY date DESC, day_id DESC LIMIT 1'
+        ).fetchone()
+        if snapshot is None:
+            start = None
+            state = self._load_state('base')
+            rows = self.connection.execute('SELECT id, date, payload FROM days ORDER BY date, id')
+        else:
+            start = (snapshot[0], snapshot[1])
+            state = self._decode_state(snapshot[2])
+            rows = self.connection.execute(
+                'SELECT id, date, payload FROM days WHERE date > ? OR (date = ? AND id > ?) ORDER BY date, id',
+                (start[0], start[0], start[1])
+            )
+        count = self._count_before(start)
+        replayed = 0
+        for day_id, date, payload in rows.fetchall():
+            state = self._apply_day(state, date, payload)
+            count += 1
+            replayed += 1
+            if count % self.snapshot_every == 0:
+                self._save_snapshot((date, day_id), state)
+        self._save_state('current', state)
+        logger.info(f'history: replayed {replayed} days from {start}')
+
+    @staticmethod
+    def _apply_day(state: RatingState, date: str, payload: str) -> RatingState:
+        match_day = decode_day(date, payload, state)
+        match_day.update_players()
+        state = dict(state)
+        for team in match_day.teams:
+            for player in team.players:
+                state[player.name] = (player.elo, player.matches)
+        return state
+
+    def _save_snapshot(self, key: DayKey, state: RatingState):
+        self.connection.execute(
+            'INSERT OR REPLACE INTO snapshots (date, day_id, ratings) VALUES (?, ?, ?)',
+            (key[0], key[1], self._encode_state(state))
+        )
+
+    def _save_state(self, name: str, state: RatingState):
+        self.connection.execute(
+            'INSERT OR REPLACE INTO state (name, ratings) VALUES (?, ?)', (name, self._encode_state(state))
+        )
+
+    def _has_state(self, name: str) -> bool:
+        return self.connection.execute('SELECT 1 FROM state WHERE name = ?', (name,)).fetchone() is not None
+
+    def _load_state(self, name: str) -> RatingState:
+        row = self.connection.execute('SELECT ratings FROM state WHERE name = ?', (name,)).fetchone()
+        return self._decode_state(row[0]) if row else {}
+
+    @staticmethod
+    def _encode_state(state: RatingState) -> str:
+        return json.dumps(state, ensure_ascii=False)
+
+    @staticmethod
+    def _decode_state(ratings: str) -> RatingState:
+        return {name: tuple(values) for name, values in json.loads(ratings).items()}
@@ -1,25 +1,33 @@
-import football_rating_utility
+from .replay import replay_files, replay_path
 
 import argparse
 import sys
 import os
 
+from dotenv import load_dotenv
+
 def parse_arguments():
     parser = argparse.ArgumentParser(
         prog='many files launcher',
         description='Utility to launch many files in sequence'
     )
-    parser.add_argument('path', help='path template without indices')
-    parser.add_argument('count', type=int, help='')
-    parser.add_argument('-s', '--storage', default='football-rating-test')
+    parser.add_argument('path', help='path template without indices, results archive or directory')
+    parser.add_argument('count', type=int, nargs='?', help='number of files (omit for archive or directory)')
+    parser.add_argument(
+        '-s', '--storage', default='football-rating-test',
+        help='Google Sheets file name or local file (.csv, .txt, .npyd)'
+    )
     return parser.parse_args()
 
-def main(path: str, count: int, storage: str):
+def main(path: str, count: int | None, storage: str):
+    if count is None:
+        replay_path(path, storage)
+        return
     name, ext = os.path.splitext(path)
-    for i in range(count):
-        football_rating_utility.update_rating(f'{name}_{i+1}{ext}', storage)
+    replay_files([f'{name}_{i+1}{ext}' for i in range(count)], storage)
 
 if __name__ == '__main__':
+    load_dotenv()
     args = parse_arguments()
     os.chdir(sys.path[0])
     main(**vars(args))
\ No newline at end of file
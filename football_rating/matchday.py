@@ -3,9 +3,66 @@ import math
 import numpy as np
 from collections import Counter
 from dataclasses import dataclass
-from typing import List
+from typing import List, Sequence, Tuple
+
+from .tracing import traced
 
 DEFAULT_ELO = 1250
+IMPACT = 800
+
+
+def _sum_last(values: np.ndarray) -> np.ndarray:
+    # Последовательное суммирование по последней оси: тот же порядок, что и у
+    # sum() по списку, и результат не зависит от ширины паддинга.
+    if values.shape[-1] == 0:
+        return np.zeros(values.shape[:-1])
+    total = values[..., 0].astype(float)
+    for k in range(1, values.shape[-1]):
+        total += values[..., k]
+    return total
+
+
+def expected_scores(ratings1, mask1, ratings2, mask2) -> np.ndarray:
+    """
+    Batched team expected scores.
+
+    For every player of the second team the mean expectation of the players
+    of the first team is taken, then these values are averaged. Teams are
+    given as padded rating arrays of shape (..., M) with boolean masks of the
+    same shape, leading dimensions are broadcast. An empty team gives 0.5.
+    """
+    ratings1, ratings2 = np.asarray(ratings1, dtype=float), np.asarray(ratings2, dtype=float)
+    mask1, mask2 = np.asarray(mask1, dtype=bool), np.asarray(mask2, dtype=bool)
+    # ep[..., j, i] - ожидание игрока i первой команды против игрока j второй
+    ep = 1 / (1 + np.power(10., (ratings2[..., :, None] - ratings1[..., None, :]) / IMPACT))
+    ep = np.where(mask2[..., :, None] & mask1[..., None, :], ep, 0.)
+    count1 = mask1.sum(axis=-1)
+    count2 = mask2.sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ep_player_team = _sum_last(ep) / count1[..., None]
+        ep_player_team = np.where(mask2, ep_player_team, 0.)
+        ep_team = _sum_last(ep_player_team) / count2
+    return np.where((count1 > 0) & (count2 > 0), ep_team, 0.5)
+
+
+def expected_score_matrix(ratings, mask) -> np.ndarray:
+    """
+    Team-vs-team expected score matrix for teams given as a padded rating
+    matrix (teams x players) and a boolean mask of the same shape.
+    """
+    ratings, mask = np.asarray(ratings, dtype=float), np.asarray(mask, dtype=bool)
+    return expected_scores(ratings[:, None, :], mask[:, None, :], ratings[None, :, :], mask[None, :, :])
+
+
+def pad_ratings(teams_ratings: Sequence[Sequence[float]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Pack ratings of several teams into a padded matrix and a mask."""
+    width = max((len(ratings) for ratings in teams_ratings), default=0)
+    ratings = np.zeros((len(teams_ratings), width))
+    mask = np.zeros((len(teams_ratings), width), dtype=bool)
+    for i, team_ratings in enumerate(teams_ratings):
+        ratings[i, :len(team_ratings)] = team_ratings
+        mask[i, :len(team_ratings)] = True
+    return ratings, mask
 
 
 @dataclass
@@ -24,18 +81,16 @@ class Team:
         # calculate elo here
         pass
 
+    def ratings(self) -> List[float]:
+        return [player.elo for player in self.players]
+
     def expected_score(self, other_team: 'Team'):
-        impact = 800
-        elos = [player.elo for player in other_team.players]
-        ep_individual = [
-            [1/(1 + pow(10, (elo - player.elo) / impact)) for player in self.players]
-            for elo in elos
-        ]
-        ep_player_team = [sum(ep)/len(ep) for ep in ep_individual]
-        ep_team = 0.5
-        if ep_player_team:
-            ep_team = sum(ep_player_team)/len(ep_player_team)
-        return ep_team
+        ratings1 = self.ratings()
+        ratings2 = other_team.ratings()
+        return float(expected_scores(
+            ratings1, np.ones(len(ratings1), dtype=bool),
+            ratings2, np.ones(len(ratings2), dtype=bool)
+        ))
 
     def short_name(self):
         return self.name[0].lower()
@@ -66,8 +121,9 @@ class Match:
     def update_elo(self):
         if self.updated:
             return
-        ep1 = self.team1.expected_score(self.team2)
-        ep2 = self.team2.expected_score(self.team1)
+        expected = expected_score_matrix(*pad_ratings([self.team1.ratings(), self.team2.ratings()]))
+        ep1 = float(expected[0, 1])
+        ep2 = float(expected[1, 0])
         if self.result == 0.5:
             p = 1.
         else:
@@ -96,13 +152,106 @@ class MatchDay:
     def short_teams_names(self):
         return {team.short_name(): team for team in self.teams}
 
+    @traced('rating.update_players')
     def update_players(self):
         self.update_elo()
         self.update_matches()
 
     def update_elo(self):
-        for match in self.matches:
-            match.update_elo()
+        """
+        Batched Elo update of all matches, bit-identical to updating them one
+        by one with `Match.update_elo`.
+
+        Players of the day are numbered and each match is encoded as two rows
+        (team1 against team2 and team2 against team1) of padded index arrays.
+        A match goes one level after the last earlier match sharing a player
+        with it, so matches of one level are independent: their expected
+        scores and rating changes are computed together, levels are applied
+        in order. The expected scores repeat the operations of
+        `expected_scores` in the same order.
+        """
+        matches = [match for match in self.matches if not match.updated]
+        if not matches:
+            return
+        numbers = {}
+        players = []
+        rosters = []
+        level_rows = []
+        last_level = []
+        for match in matches:
+            rows = []
+            for team in (match.team1, match.team2):
+                roster = []
+                for player in team.players:
+                    number = numbers.get(id(player))
+                    if number is None:
+                        number = numbers[id(player)] = len(players)
+                        players.append(player)
+                        last_level.append(-1)
+                    roster.append(number)
+                rosters.append(roster)
+                rows += roster
+            # уровень матча - после всех предыдущих матчей с теми же игроками
+            level = max((last_level[number] for number in rows), default=-1) + 1
+            for number in rows:
+                last_level[number] = level
+            if level == len(level_rows):
+                level_rows.append([])
+            level_rows[level] += [len(rosters) - 2, len(rosters) - 1]
+
+        # строки 2k, 2k + 1 - команды матча k (соперник строки - row ^ 1),
+        # строки упорядочены по уровням, уровень - непрерывный срез
+        order = [row for rows in level_rows for row in rows]
+        bounds = np.cumsum([0] + [len(rows) for rows in level_rows])
+        width = max(len(roster) for roster in rosters)
+        own = np.zeros((len(rosters), width), dtype=int)
+        own_mask = np.zeros((len(rosters), width), dtype=bool)
+        for i, row in enumerate(order):
+            own[i, :len(rosters[row])] = rosters[row]
+            own_mask[i, :len(rosters[row])] = True
+        position = np.empty(len(order), dtype=int)
+        position[order] = np.arange(len(order))
+        swap = position[np.array(order) ^ 1]
+        other, other_mask = own[swap], own_mask[swap]
+        pair_mask = (other_mask[:, :, None] & own_mask[:, None, :]).astype(float)
+        own_count = own_mask.sum(axis=1).astype(float)
+        other_count = other_mask.sum(axis=1).astype(float)
+        # пустая команда - ожидание 0.5, как в expected_scores
+        empty = (own_count == 0) | (other_count == 0)
+        has_empty = bool(empty.any())
+        padded = not own_mask.all()
+        own_count[own_count == 0] = 1.
+        other_count[other_count == 0] = 1.
+
+        actual = np.array([[match.result, 1 - match.result] for match in matches], dtype=float).ravel()[order]
+        point_factor = np.repeat([
+            1. if match.result == 0.5 else 1 + (math.log10(abs(match.goals1 - match.goals2))**3)
+            for match in matches
+        ], 2)[order]
+        elo = np.array([player.elo for player in players], dtype=float)
+        matches_count = np.array([player.matches for player in players], dtype=float)
+        k_factor = (50/(1 + matches_count/300))[own] * point_factor[:, None]
+
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            own_rows, own_rows_mask = own[start:end], own_mask[start:end]
+            own_ratings, other_ratings = elo[own_rows], elo[other[start:end]]
+            ep = 1 / (1 + np.power(10., (other_ratings[:, :, None] - own_ratings[:, None, :]) / IMPACT))
+            if padded:
+                ep = ep * pair_mask[start:end]
+            ep_player_team = _sum_last(ep) / own_count[start:end, None]
+            if padded:
+                ep_player_team = ep_player_team * other_mask[start:end]
+            expected = _sum_last(ep_player_team) / other_count[start:end]
+            if has_empty:
+                expected = np.where(empty[start:end], 0.5, expected)
+            change = k_factor[start:end] * (actual[start:end] - expected)[:, None]
+            new_ratings = np.rint(own_ratings + change)
+            if padded:
+                elo[own_rows[own_rows_mask]] = new_ratings[own_rows_mask]
+            else:
+                elo[own_rows] = new_ratings
+        for player, rating in zip(players, elo):
+            player.elo = int(rating)
 
     def update_matches(self):
         for match in self.matches:
@@ -1,12 +1,19 @@
 import os
 import time
 
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
 import numpy as np
 import pandas as pd
 
 from .log import get_logger
 
-from .matchday import Team, Player
+from .exact_balancer import ExactBalancer
+from .matchday import expected_score_matrix, pad_ratings
+from .strategies import SimulatedAnnealing, TabuSearch
+from .team_scoring import TeamMeans, TeamScoring, pair_expectation
+from .tracing import traced
 
 logger = get_logger(__name__)
 
@@ -38,6 +45,27 @@ def check_input(df):
         return err_msg
 
 
+def _run_start(args):
+    """
+    One independent start of `MatchMaking.optimize_parallel` (runs in a
+    worker process).
+    """
+    df, params, seed, max_iter, max_counter, (shm_name, shape) = args
+    np.random.seed(seed)
+    shm = SharedMemory(name=shm_name)
+    try:
+        pair_expected = np.ndarray(shape, dtype=float, buffer=shm.buf)
+        pair_expected.flags.writeable = False
+        matchmaker = MatchMaking(df, pair_expected=pair_expected, **params)
+        matchmaker.optimize(max_iter, max_counter)
+        teams = matchmaker.df["team"].to_numpy().copy()
+    finally:
+        # ссылки на буфер нужно отпустить до close
+        matchmaker = pair_expected = None
+        shm.close()
+    return teams
+
+
 class MatchMaking:
     """
     Implementation of a matchmaking algorithm to create balanced teams based on
@@ -68,9 +96,48 @@ class MatchMaking:
     overall score - the changes are kept.
     As stopping criteria either the number of iterations is used or the number
     of iterations without a change.
+    Swaps which improve the score by less than `SCORE_TOL` are not kept:
+    many swaps leave the worst team untouched and give the same score up to
+    rounding noise.
+
+    Parallel mode
+    -------------
+    `optimize_parallel` runs many independent seeds (initial seeding, noise
+    and balancing) in a process pool and keeps the best split. The player
+    expectation matrix of this instance is shared with the workers read only
+    through shared memory, so every start optimizes the same objective.
+
+    Strategies
+    ----------
+    `optimize_strategy` runs one of the `STRATEGIES` (simulated annealing,
+    tabu search) on the array scoring state. They swap players between any
+    two teams and may accept worse swaps, which helps with many teams.
+
+    Exact mode
+    ----------
+    For small rosters `optimize_exact` runs a branch-and-bound search
+    (`ExactBalancer`) over all splits with the seeded team sizes and returns
+    the optimal one. The search starts from the result of the balancing
+    algorithm, which is kept if the time budget runs out.
+
+    Scoring engines
+    ---------------
+    With `engine="numpy"` (default) candidate swaps are scored by
+    `TeamScoring`, which keeps team labels and the team expected score matrix
+    as arrays and only recomputes the two swapped teams. `engine="pandas"`
+    keeps the original DataFrame based implementation as a reference.
+    Both engines and the exact search look up player expectations in the
+    N x N `pair_expected` matrix, computed once per instance; a team-vs-team
+    expectation is the mean of its submatrix.
 
     """
 
+    SCORE_TOL = 1e-12
+    STRATEGIES = {
+        "annealing": SimulatedAnnealing,
+        "tabu": TabuSearch,
+    }
+
     def __init__(
         self,
         df,
@@ -79,7 +146,9 @@ class MatchMaking:
         noise_size=10000,
         noise_digits=2,
         to_file=False,
-        split=None
+        split=None,
+        engine="numpy",
+        pair_expected=None
     ):
         """
         Parameters
@@ -98,8 +167,24 @@ class MatchMaking:
             Number of digits, which are used to round off the noised values.
         split:
             players set to different teams
+        engine: str
+            "numpy" for the incremental array engine or "pandas" for the
+            reference implementation.
+        pair_expected: numpy.ndarray | None
+            Player-vs-player expectation matrix in the row order of `df`
+            (read only, e.g. shared by `optimize_parallel`). By default it is
+            computed once from the noised skills.
         """
         logger.info("... starting matchmaking")
+        self._source_df = df.copy()
+        self._params = dict(
+            team_count=team_count,
+            min_max_pairing=min_max_pairing,
+            noise_size=noise_size,
+            noise_digits=noise_digits,
+            split=split,
+            engine=engine,
+        )
         self.num_iterations = 0
         self.df = self._process_df(df)
         self.num_players = df.shape[0]
@@ -107,12 +192,18 @@ class MatchMaking:
         self.num_bins = (self.num_players + team_count - 1) // team_count
         self.to_file = to_file
         self.split = split
+        self.engine = engine
         self._set_outputdir()
         self.min_max_pairing = min_max_pairing
         self._add_noise(noise_size, noise_digits)
+        # ожидания всех пар игроков - один раз на запрос, все оценки разбиений берут их отсюда
+        self.pair_expected = pair_expectation(self.df["skill"].to_numpy()) \
+            if pair_expected is None else pair_expected
+        self._team_means_buffer = None
         self._set_bins()
         self._init_teams()
         self._swap_split()
+        self._init_scoring()
 
     def _process_df(self, df):
         df["skill"] = df["skill"].astype(float)
@@ -198,10 +289,37 @@ class MatchMaking:
         """
         Update the average team deviation and update the overall score.
         """
-        self.team_means = self.calc_team_means(self.df)
+        self.team_means = self._calc_team_means(self.df)
         self.score = self.calc_score(self.team_means)
         self.num_iterations += 1
 
+    def _calc_team_means(self, df):
+        """
+        `calc_team_means` of `self.df` or its copy with other team labels,
+        computed in the preallocated buffers of `TeamMeans` (the skills of the
+        players don't change after the noise is added).
+        """
+        if self._team_means_buffer is None:
+            self._team_means_buffer = TeamMeans(self.df["skill"].to_numpy(), self.num_groups, self.pair_expected)
+        means = self._team_means_buffer(df["team"].to_numpy())
+        return pd.Series(means.copy(), name="skill")
+
+    def _init_scoring(self):
+        """
+        Build the array scoring state for the numpy engine.
+        """
+        self.scoring = None
+        self.split_mask = self.df["player"].isin(self.split).to_numpy()
+        if self.engine == "numpy":
+            self.scoring = self._new_scoring()
+        elif self.engine != "pandas":
+            raise ValueError(f"Unknown engine: {self.engine}")
+
+    def _new_scoring(self):
+        return TeamScoring(
+            self.df["skill"].to_numpy(), self.df["team"].to_numpy(), self.num_groups, self.pair_expected
+        )
+
     def swap_teams(self):
         """
         The main optimization mechanism. Take two random teams (or the minimum
@@ -219,6 +337,9 @@ class MatchMaking:
 
         logger.info(f"try swapping team {team_0} and team {team_1}")
 
+        if self.scoring is not None:
+            return self._swap_teams_numpy(team_0, team_1)
+
         idxs_0 = list(self.df[self.df.team == team_0].index)
         idxs_1 = list(self.df[self.df.team == team_1].index)
         split_idx0 = self._get_split_player(team_0)
@@ -234,11 +355,11 @@ class MatchMaking:
             _df.loc[combo[0], "team"] = team_0
             _df.loc[combo[1], "team"] = team_1
 
-            team_means = self.calc_team_means(_df)
+            team_means = self._calc_team_means(_df)
             score = self.calc_score(team_means)
             self.num_iterations += 1
 
-            if score < self.score:
+            if score < self.score - self.SCORE_TOL:
                 self.score = score
                 self.team_means = team_means
                 self.df = _df
@@ -247,6 +368,36 @@ class MatchMaking:
 
         return swapped
 
+    def _swap_teams_numpy(self, team_0, team_1):
+        """
+        Same as the pandas path of `swap_teams`, but candidates are scored by
+        `TeamScoring` using player positions instead of DataFrame copies.
+        """
+        teams = self.scoring.teams
+        idxs_0 = list(np.flatnonzero(teams == team_0))
+        idxs_1 = list(np.flatnonzero(teams == team_1))
+        split_idx0 = self._get_split_position(team_0)
+        split_idx1 = self._get_split_position(team_1)
+
+        best = None
+        for idx_0, idx_1 in self.get_idx_pairs(idxs_0, idxs_1, (split_idx0, split_idx1)):
+            score, expected = self.scoring.try_swap(idx_0, idx_1)
+            self.num_iterations += 1
+
+            if score < self.score - self.SCORE_TOL:
+                self.score = score
+                best = (idx_0, idx_1, expected)
+                logger.info(f"{idx_0} {idx_1} new score: {score}")
+
+        if best is None:
+            return False
+
+        self.scoring.swap(*best)
+        self.df["team"] = self.scoring.teams
+        self.team_means = pd.Series(self.scoring.team_means, name="skill")
+        return True
+
+    @traced('matchmaking.optimize')
     def optimize(self, max_iter=1000, max_counter=10):
         """
         Run the optimization algorithm.
@@ -274,6 +425,122 @@ class MatchMaking:
         logger.info(f"Best result: {self.score}")
         return self.df
 
+    def optimize_strategy(self, strategy="annealing", max_iter=1000, **kwargs):
+        """
+        Run a balancing strategy from `STRATEGIES`. The per-iteration best
+        scores are stored in `self.trace`.
+
+        Parameters
+        ----------
+        strategy: str
+            Key of `STRATEGIES`.
+        max_iter: int
+            Number of iterations of the strategy.
+        kwargs:
+            Strategy specific parameters.
+        """
+        scoring = self.scoring or self._new_scoring()
+        runner = self.STRATEGIES[strategy](scoring, self.split_mask)
+        self.trace = runner.optimize(max_iter, **kwargs)
+        self._set_teams(scoring.teams)
+        logger.info(f"{strategy} result: {self.score}")
+        return self.df
+
+    def optimize_parallel(self, n_starts=16, workers=None, max_iter=1000, max_counter=10):
+        """
+        Run `n_starts` independent starts in a process pool and keep the best
+        split. Splits of all starts are scored on the skills of this instance,
+        so the scores are comparable.
+
+        Parameters
+        ----------
+        n_starts: int
+            Number of independent starts.
+        workers: int | None
+            Number of worker processes (default: number of CPUs).
+        max_iter, max_counter: int
+            Passed to `optimize` of every start.
+
+        Returns
+        -------
+        df, scores
+            The DataFrame with the best split and the scores of all starts.
+        """
+        seeds = np.random.randint(0, 2**31 - 1, n_starts)
+        # матрица ожиданий передается процессам через общую память, а не копией в каждый старт
+        shm = SharedMemory(create=True, size=self.pair_expected.nbytes)
+        try:
+            shared = np.ndarray(self.pair_expected.shape, dtype=float, buffer=shm.buf)
+            shared[:] = self.pair_expected
+            del shared
+            args = [
+                (self._source_df, self._params, seed, max_iter, max_counter, (shm.name, self.pair_expected.shape))
+                for seed in seeds
+            ]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_run_start, args))
+        finally:
+            shm.close()
+            shm.unlink()
+
+        skills = self.df["skill"].to_numpy()
+        scores = np.array([
+            TeamScoring(skills, teams, self.num_groups, self.pair_expected).score for teams in results
+        ])
+        self._set_teams(results[int(scores.argmin())])
+        self.start_scores = scores
+        logger.info(
+            f"Parallel result: {self.score}, scores over {n_starts} starts: "
+            f"min {scores.min()}, median {np.median(scores)}, max {scores.max()}"
+        )
+        return self.df, scores
+
+    @traced('matchmaking.optimize_exact')
+    def optimize_exact(self, time_budget=2.0, max_players=24, max_iter=1000, max_counter=10):
+        """
+        Find the optimal split with `ExactBalancer`. The result of `optimize`
+        is used as the initial upper bound, so when the time budget runs out
+        (or the roster is larger than `max_players`) the result is never
+        worse than the heuristic one.
+
+        Parameters
+        ----------
+        time_budget: float
+            Time limit of the exact search in seconds.
+        max_players: int
+            Maximum roster size for the exact search.
+        max_iter, max_counter: int
+            Passed to `optimize`.
+        """
+        self.exact = False
+        self.optimize(max_iter, max_counter)
+        if self.num_players > max_players:
+            return self.df
+
+        teams = self.df["team"].to_numpy()
+        balancer = ExactBalancer(
+            self.df["skill"].to_numpy(),
+            np.bincount(teams, minlength=self.num_groups),
+            self.df["player"].isin(self.split).to_numpy(),
+            time_budget,
+            self.pair_expected,
+        )
+        result = balancer.solve(teams)
+        self._set_teams(result.teams)
+        self.exact = result.optimal
+        if not result.optimal:
+            logger.info("Exact search timed out, keeping the best split found")
+        logger.info(f"Exact result: {self.score}")
+        return self.df
+
+    def _set_teams(self, teams):
+        """
+        Replace the team labels and update scores and the scoring state.
+        """
+        self.df["team"] = teams
+        self._update_team_means()
+        self._init_scoring()
+
     def _swap_split(self):
         assert(len(self.split) <= self.num_groups)
         if self.split is None:
@@ -313,32 +580,47 @@ class MatchMaking:
             split_idx = None
         return split_idx
 
+    def _get_split_position(self, team):
+        # Позиция игрока из split в team (для numpy engine)
+        split_idxs = np.flatnonzero((self.scoring.teams == team) & self.split_mask)
+        if len(split_idxs) > 1:
+            raise NotImplementedError('Multiple split players not implemented')
+        return split_idxs[0] if len(split_idxs) else None
+
     @staticmethod
-    def get_idx_combos(idxs_0, idxs_1, idx_split=None):
+    def get_idx_pairs(idxs_0, idxs_1, idx_split=None):
         """
-        Get all combinations of two sets of indices when swapping only one
-        member between the two sets.
+        Get all pairs of indices (one from each set), which are allowed to be
+        swapped.
         """
-        combos = []
         for idx_0 in idxs_0:
             for idx_1 in idxs_1:
                 # split игроков можно менять только со сплит
                 if idx_split:
-                    split_0, split_1 = idx_split                    
+                    split_0, split_1 = idx_split
                     # если только один из индексов из split - нельзя менять
                     # (меняем либо не из split, либо оба из split)
                     if not split_0 or not split_1:
                         pass    # если хотя бы один None - не надо проверять
                     elif (idx_0 == split_0) ^ (idx_1 == split_1):
                         continue
+                yield idx_0, idx_1
 
-                _idxs_0 = idxs_0.copy()
-                _idxs_1 = idxs_1.copy()
-                _idxs_0.remove(idx_0)
-                _idxs_0.append(idx_1)
-                _idxs_1.remove(idx_1)
-                _idxs_1.append(idx_0)
-                combos.append((_idxs_0, _idxs_1))
+    @staticmethod
+    def get_idx_combos(idxs_0, idxs_1, idx_split=None):
+        """
+        Get all combinations of two sets of indices when swapping only one
+        member between the two sets.
+        """
+        combos = []
+        for idx_0, idx_1 in MatchMaking.get_idx_pairs(idxs_0, idxs_1, idx_split):
+            _idxs_0 = idxs_0.copy()
+            _idxs_1 = idxs_1.copy()
+            _idxs_0.remove(idx_0)
+            _idxs_0.append(idx_1)
+            _idxs_1.remove(idx_1)
+            _idxs_1.append(idx_0)
+            combos.append((_idxs_0, _idxs_1))
         return combos
 
     @staticmethod
@@ -346,16 +628,14 @@ class MatchMaking:
         """
         The team means are the differences of the team's player's mean skill to
         the overall mean skill of all players.
+
+        Reference implementation on a DataFrame; `TeamMeans` computes the same
+        values from skill and team label arrays without allocations.
         """
         # means = df.groupby("team")["skill"].mean()
         # return means - means.mean()
-        teams_df = df.groupby("team")[["player", "skill"]]
-        teams = []
-        for i, (_, team_df) in enumerate(teams_df):
-            players = [Player(row['player'], row['skill']) for _, row in team_df.iterrows()]
-            teams.append(Team(f"team {i}", players))
-        
-        expected = np.array([[team1.expected_score(team2) for team2 in teams] for team1 in teams])
+        teams = [team_df.to_numpy() for _, team_df in df.groupby("team")["skill"]]
+        expected = expected_score_matrix(*pad_ratings(teams))
         expected = expected[~np.eye(expected.shape[0],dtype=bool)].reshape(expected.shape[0],-1)
         means = expected.mean(axis=1)
         means -= means.mean()
@@ -1,4 +1,4 @@
-from .data_storage import GSheetStorage
+from .data_storage import open_storage
 from .text_parser import PlayersText, check_new_players
 
 import argparse
@@ -6,14 +6,12 @@ import numpy as np
 import os
 import pandas as pd
 
-from .matchday import DEFAULT_ELO, Team, Player
+from .matchday import DEFAULT_ELO, expected_score_matrix, pad_ratings
 from .matchmaking import MatchMaking
 
 from dotenv import load_dotenv
 from typing import Dict, List, Tuple
 
-load_dotenv()
-
 
 def parse_argument() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
@@ -21,7 +19,10 @@ def parse_argument() -> argparse.Namespace:
         description='File based football matchmaker'
     )
     parser.add_argument('filepath', help='text file with player names')
-    parser.add_argument('-s', '--storage', default='football-rating')
+    parser.add_argument(
+        '-s', '--storage', default='football-rating',
+        help='Google Sheets file name or local file (.csv, .txt, .npyd)'
+    )
     parser.add_argument('--size', default=5, type=int)
     return parser.parse_args()
 
@@ -57,15 +58,8 @@ def get_teams(teams: List[str], html: bool = False) -> List[str]:
     return [f'{bold1}{team_dict[i]}{bold2}: {team}' for i, team in enumerate(teams)]
 
 def test_expected(players_list: list, players_data: dict):
-    teams = []
-    for i, players in enumerate(players_list):
-        teams.append(
-            Team(
-                f'team {i}',
-                [Player(p, players_data[p][0]) for p in players]
-            )
-        )
-    expected = np.array([[team1.expected_score(team2) for team2 in teams] for team1 in teams])
+    teams = [[players_data[p][0] for p in players] for players in players_list]
+    expected = expected_score_matrix(*pad_ratings(teams))
     print(expected)
 
 
@@ -73,10 +67,7 @@ def split_teams(filepath: str, storage: str, size: int = 5):
     parser = PlayersText(filepath)
     players = parser.players
     split_players = parser.to_split
-    storage = GSheetStorage(
-        service_json=os.getenv("GCP_KEY"),
-        file_name=storage
-    )
+    storage = open_storage(storage, service_json=os.getenv("GCP_KEY"))
     all_data = storage.data
     players_data = all_data.get_players_match_data_dict(players)
     stored_players = list(players_data.keys())
@@ -114,6 +105,7 @@ def split_teams(filepath: str, storage: str, size: int = 5):
 
 
 if __name__ == '__main__':
+    load_dotenv()
     args = parse_argument()
     args.filepath = 'football_rating/players/' + args.filepath
     # os.chdir(sys.path[0])
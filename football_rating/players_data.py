@@ -1,44 +1,155 @@
+import numpy as np
 import pandas as pd
 
-from typing import Dict, List
+from typing import Dict, Iterable, List
+
+COLUMNS = ['Rating', 'Matches', 'Prev rating', 'Change']
 
 
 class PlayersStorageData:
+    """
+    Players rating state.
+
+    Columns (rating, matches, previous rating, change) are kept as NumPy
+    arrays in insertion order with a case-folded name -> row index, so
+    lookups and updates of a few players don't touch the whole table. The
+    ranking (sorted by rating) is computed lazily when it is read.
+
+    `df` is a cached DataFrame export in ranking order (index 'Name'), which
+    is rebuilt only after a change. Assigning a DataFrame to `df` replaces
+    the whole state; columns other than `COLUMNS` (added to the sheet by
+    hand) are kept as object arrays in `extra` and exported in their place.
+    Names which differ only in case are one player, so a table with such
+    names is rejected.
+    """
+
     def __init__(self):
-        self.df = pd.DataFrame()
+        self.clear()
 
     def clear(self):
-        self.df = pd.DataFrame()
+        self.names: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.columns = {column: np.zeros(0, dtype=np.int64) for column in COLUMNS}
+        self.extra: Dict[str, np.ndarray] = {}
+        # порядок столбцов таблицы при экспорте
+        self.layout: List[str] = list(COLUMNS)
+        self._changed()
+
+    def _changed(self):
+        self._order = None
+        self._df = None
+
+    @property
+    def df(self) -> pd.DataFrame:
+        if self._df is None:
+            order = self.order()
+            values = {**self.columns, **self.extra}
+            df = pd.DataFrame(
+                {column: values[column][order] for column in self.layout},
+                index=pd.Index(np.array(self.names, dtype=object)[order], name='Name')
+            )
+            self._df = df
+        return self._df
+
+    @df.setter
+    def df(self, df: pd.DataFrame):
+        self.clear()
+        if df.empty:
+            return
+        rating = pd.to_numeric(df['Rating'], errors='coerce').fillna(0)
+        columns = {}
+        for column in COLUMNS:
+            if column in df.columns:
+                values = pd.to_numeric(df[column], errors='coerce')
+                values = values.fillna(rating if column == 'Prev rating' else 0)
+            else:
+                values = rating if column == 'Prev rating' else pd.Series(0, index=df.index)
+            columns[column] = values.to_numpy().astype(np.int64)
+        extra = {
+            str(column): df[column].to_numpy(dtype=object) for column in df.columns if column not in COLUMNS
+        }
+        layout = [str(column) for column in df.columns] + [column for column in COLUMNS if column not in df.columns]
+        self.set_columns([str(name) for name in df.index], columns, extra, layout)
+
+    def set_columns(self, names: List[str], columns: Dict[str, np.ndarray],
+                    extra: Dict[str, np.ndarray] | None = None, layout: List[str] | None = None):
+        """
+        Replace the whole state with int64 `COLUMNS` and `extra` object
+        columns in `names` order, `layout` is the order of exported columns.
+        """
+        index = {}
+        for row, name in enumerate(names):
+            if index.setdefault(name.casefold(), row) != row:
+                raise ValueError(f'Duplicate player name: {names[index[name.casefold()]]} and {name}')
+        self.names = names
+        self.index = index
+        self.columns = {column: columns[column] for column in COLUMNS}
+        self.extra = dict(extra or {})
+        self.layout = layout or list(COLUMNS) + list(self.extra)
+        self._changed()
+
+    def order(self) -> np.ndarray:
+        """Rows in ranking order (rating descending, ties keep row order)."""
+        if self._order is None:
+            self._order = np.argsort(-self.columns['Rating'], kind='stable')
+        return self._order
 
-    def get_players_data(self, players: List[str]) -> pd.Series:
-        players_lower = {p.lower() for p in players}
+    def get_rows(self, players: Iterable[str]) -> np.ndarray:
+        """Rows of the stored players (case-insensitive), unknown names are skipped."""
+        rows = {self.index.get(player.casefold()) for player in players}
+        rows.discard(None)
+        return np.array(sorted(rows), dtype=int)
 
-        return self.df[self.df.index.str.lower().isin(players_lower)]
+    def get_players_data(self, players: List[str]) -> pd.DataFrame:
+        rows = set(self.get_rows(players).tolist())
+        order = [row for row in self.order() if row in rows]
+        return pd.DataFrame(
+            {column: values[order] for column, values in self.columns.items()},
+            index=pd.Index([self.names[row] for row in order], name='Name')
+        )
 
     def get_players_match_data_dict(self, players: List[str]) -> Dict[str, List[int]]:
-        series = self.get_players_data(players)
-        return series[['Rating', 'Matches']].T.to_dict('list')
+        rating = self.columns['Rating']
+        matches = self.columns['Matches']
+        return {
+            self.names[row]: [int(rating[row]), int(matches[row])]
+            for row in self.get_rows(players)
+        }
 
-    def get_players_rating(self):
+    def get_players_rating(self) -> pd.Series:
         return self.df['Rating']
 
     def set_players_match_data(self, players: Dict[str, List[int]]):
+        """
+        Set rating and matches of the given players (case-insensitive, unknown
+        names are ignored). Previous rating and change are updated for them,
+        the change of all other players is reset.
+        """
         if not players:
             return
-        df = pd.DataFrame.from_dict(players, orient='index')
-        df.index.name = 'Name'
-        df.columns = ['Rating', 'Matches']
-        prev_rating = self.df['Rating'][self.df.index.isin(df.index)]
-        diff = (df['Rating'] - self.df['Rating'])
-        df['Prev rating'] = prev_rating
-        df['Change'] = diff
-        self.df['Change'] = 0
-        self.df.update(df)
-        self.sort()
+        rows = []
+        values = []
+        for name, (rating, matches) in players.items():
+            row = self.index.get(name.casefold())
+            if row is not None:
+                rows.append(row)
+                values.append((rating, matches))
+        self.columns['Change'][:] = 0
+        if rows:
+            rows = np.array(rows, dtype=int)
+            values = np.array(values, dtype=np.int64).reshape(-1, 2)
+            rating = self.columns['Rating']
+            self.columns['Prev rating'][rows] = rating[rows]
+            self.columns['Change'][rows] = values[:, 0] - rating[rows]
+            rating[rows] = values[:, 0]
+            self.columns['Matches'][rows] = values[:, 1]
+        self._changed()
 
     def sort(self):
-        self.df.sort_values('Rating', ascending=False, inplace=True)
+        # ранжирование считается лениво при чтении
+        self._order = None
+        self._df = None
 
     def __iter__(self):
-        for index, row in self.df.iterrows():
+        for _, row in self.df.iterrows():
             yield row.tolist()
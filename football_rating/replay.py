@@ -0,0 +1,63 @@
+import pandas as pd
+
+from .data_storage import Storage, merge_time_stats, open_storage
+from .football_rating_utility import load_players, store_players
+from .matchday import MatchDay
+from .text_parser import MatchDayParser, iter_match_days
+
+import os
+
+from typing import Dict, Iterable, List
+
+
+def parse_files(filepaths: Iterable[str]) -> List[MatchDay]:
+    """
+    Parse result files and sort the match days by date (files of the same
+    date keep their order).
+    """
+    match_days = [MatchDayParser(filepath=filepath).results for filepath in filepaths]
+    match_days.sort(key=lambda match_day: match_day.date)
+    return match_days
+
+
+def replay(storage: Storage, match_days: Iterable[MatchDay]):
+    """
+    Apply match days in order against the storage data in memory and flush
+    the ratings and the monthly snapshots once at the end.
+
+    A monthly snapshot is taken before the first match day of a new month,
+    the same way `Storage.update_time_stats` does before each update. The
+    snapshot month is the month of the match day, while the one-file update
+    (`update_rating`) stamps it with the current date.
+    """
+    stored_data = storage.data
+    time_stats: Dict[str, pd.DataFrame] = {}
+    changed_years = set()
+    for match_day in match_days:
+        year = str(match_day.date.year)
+        if year not in time_stats:
+            time_stats[year] = storage.read_time_stats(year)
+        year_df = merge_time_stats(time_stats[year], stored_data.get_players_rating(), match_day.date)
+        if year_df is not None:
+            time_stats[year] = year_df
+            changed_years.add(year)
+
+        load_players(stored_data, match_day)
+        match_day.update_players()
+        store_players(stored_data, match_day)
+
+    storage.write()
+    for year in sorted(changed_years):
+        storage.write_time_stats(year, time_stats[year])
+
+
+def replay_files(filepaths: Iterable[str], storage: str):
+    replay(open_storage(storage, service_json=os.getenv("GCP_KEY")), parse_files(filepaths))
+
+
+def replay_path(path: str, storage: str):
+    """
+    Stream match days of an archive file or a directory into the storage,
+    the days have to be in chronological order.
+    """
+    replay(open_storage(storage, service_json=os.getenv("GCP_KEY")), iter_match_days(path))
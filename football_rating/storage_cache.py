@@ -0,0 +1,207 @@
+import threading
+import time
+
+from .log import get_logger
+from .google_clients import get_client
+from .tracing import traced
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, List
+
+# pandas загружается при первом обращении к таблице, а не при старте бота
+if TYPE_CHECKING:
+    from .data_storage import GSheetStorage
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    storage: 'GSheetStorage | None' = None
+    loaded: float = 0.
+    lock: threading.RLock = field(default_factory=threading.RLock)
+    dirty: bool = False
+    timer: threading.Timer | None = None
+    # выставляется, когда таблица загружена (или загрузка не удалась)
+    ready: threading.Event = field(default_factory=threading.Event)
+    error: Exception | None = None
+
+
+class StorageCache:
+    """
+    Per-spreadsheet cache of opened `GSheetStorage` objects keyed by URL.
+
+    The authorized client comes from the process-wide registry
+    (`google_clients`) and is shared by all storages. An
+    entry holds the opened workbook and the parsed `PlayersStorageData`; it
+    is reloaded after `ttl` seconds and the least recently used entry is
+    evicted when there are more than `max_size` entries. Sheets are
+    downloaded outside of the cache lock, and concurrent requests for a
+    sheet that is being loaded wait for that one download.
+
+    Writes are write-behind: `write(entry)` marks the entry dirty and the
+    sheet is written `write_delay` seconds later, so several updates in
+    this window end up in one `GSheetStorage.write` call. Dirty entries are
+    flushed before they get evicted, an expired dirty entry is reloaded
+    only after its flush. Entries stay cached while the flush fails; a
+    failed flush is retried after `retry_delay` seconds.
+    Get the entry once with `entry(url)` and modify `entry.storage.data`
+    while holding `entry.lock` to not race with a flush.
+    """
+
+    def __init__(self, service_json: str | None = None, ttl: float = 300.,
+                 max_size: int = 32, write_delay: float = 2., retry_delay: float = 30., client=None):
+        """
+        Parameters
+        ----------
+        service_json: str | None
+            Service account key used to authorize the client.
+        ttl: float
+            Seconds after which a cached entry is read from the sheet again.
+        max_size: int
+            Maximum number of cached spreadsheets.
+        write_delay: float
+            Seconds to collect writes before flushing them.
+        retry_delay: float
+            Seconds before a failed flush is retried.
+        client:
+            Already authorized client (e.g. `FakeClient` for offline runs).
+        """
+        self.service_json = service_json
+        self.ttl = ttl
+        self.max_size = max_size
+        self.write_delay = write_delay
+        self.retry_delay = retry_delay
+        self._client = client
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = get_client(self.service_json)
+        return self._client
+
+    def get(self, url: str) -> 'GSheetStorage':
+        return self.entry(url).storage
+
+    @traced('storage.cache_get')
+    def entry(self, url: str) -> CacheEntry:
+        """Cached entry of the spreadsheet, loaded from the sheet if needed."""
+        while True:
+            with self._lock:
+                entry = self._entries.get(url)
+                loader = entry is None
+                if loader:
+                    entry = self._entries[url] = CacheEntry(url)
+                self._entries.move_to_end(url)
+            if loader:
+                self._load(entry)
+                self._evict()
+                return entry
+            entry.ready.wait()
+            if entry.error is not None:
+                raise entry.error
+            if time.monotonic() - entry.loaded <= self.ttl or entry.dirty:
+                # несохраненные изменения новее листа - перечитаем его после записи
+                return entry
+            try:
+                self._drop(entry)
+            except Exception:
+                return entry
+
+    def write(self, entry: CacheEntry):
+        """Schedule a write-behind of the cached storage."""
+        with entry.lock:
+            entry.dirty = True
+            if entry.timer is None:
+                self._schedule(entry, self.write_delay)
+
+    def flush(self, url: str | None = None):
+        """Write pending changes of one or all cached storages now."""
+        with self._lock:
+            urls = [url] if url is not None else list(self._entries)
+            entries = [self._entries[u] for u in urls if u in self._entries]
+        errors = []
+        for entry in entries:
+            try:
+                self._flush_entry(entry)
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
+
+    def invalidate(self, url: str):
+        """Flush and forget the cached storage."""
+        with self._lock:
+            entry = self._entries.get(url)
+        if entry is not None and entry.ready.is_set():
+            self._drop(entry)
+
+    def close(self):
+        self._closed = True
+        self.flush()
+
+    def _load(self, entry: CacheEntry):
+        from .data_storage import GSheetStorage
+        try:
+            entry.storage = GSheetStorage(service_json=self.service_json, url=entry.url, gc=self.client)
+            entry.loaded = time.monotonic()
+        except Exception as e:
+            entry.error = e
+            with self._lock:
+                if self._entries.get(entry.url) is entry:
+                    del self._entries[entry.url]
+            raise
+        finally:
+            entry.ready.set()
+
+    def _evict(self):
+        with self._lock:
+            excess = len(self._entries) - self.max_size
+            victims: List[CacheEntry] = [
+                entry for entry in self._entries.values() if entry.ready.is_set()
+            ][:max(excess, 0)]
+        for entry in victims:
+            try:
+                self._drop(entry)
+            except Exception:
+                pass    # остается в кэше до успешной записи
+
+    def _drop(self, entry: CacheEntry):
+        """Flush the entry and remove it; it is kept if the flush fails."""
+        with entry.lock:
+            self._flush_entry(entry)
+            with self._lock:
+                if self._entries.get(entry.url) is entry:
+                    del self._entries[entry.url]
+
+    def _schedule(self, entry: CacheEntry, delay: float):
+        entry.timer = threading.Timer(delay, self._flush_timer, args=(entry,))
+        entry.timer.start()
+
+    def _flush_timer(self, entry: CacheEntry):
+        try:
+            self._flush_entry(entry)
+        except Exception:
+            pass    # ошибка уже в логе, повтор запланирован
+
+    def _flush_entry(self, entry: CacheEntry):
+        with entry.lock:
+            if entry.timer is not None:
+                entry.timer.cancel()
+                entry.timer = None
+            if not entry.dirty:
+                return
+            entry.dirty = False
+            try:
+                entry.storage.write()
+            except Exception as e:
+                entry.dirty = True
+                logger.error(f'write-behind failed for {entry.url}: {e}')
+                if not self._closed:
+                    self._schedule(entry, self.retry_delay)
+                raise
@@ -0,0 +1,193 @@
+import math
+
+import numpy as np
+
+from .log import get_logger
+from .team_scoring import TeamScoring
+
+from abc import ABC, abstractmethod
+from typing import List, Tuple
+
+logger = get_logger(__name__)
+
+
+class Strategy(ABC):
+    """
+    Base class of team balancing strategies.
+
+    A strategy works on a `TeamScoring` state (shared with `MatchMaking`)
+    and moves players by one-for-one swaps between any two teams, so team
+    sizes are kept. A swap is allowed if no team ends up with more than one
+    split player. After `optimize` the state holds the best split found.
+    """
+
+    # попытки случайного выбора пары перед перебором всех пар
+    RANDOM_TRIES = 100
+
+    def __init__(self, scoring: TeamScoring, split_mask=None):
+        """
+        Parameters
+        ----------
+        scoring: TeamScoring
+            State to optimize.
+        split_mask: array-like | None
+            True for players, which have to be set to different teams.
+        """
+        self.scoring = scoring
+        num_players = len(scoring.teams)
+        self.split_mask = np.zeros(num_players, dtype=bool) if split_mask is None \
+            else np.asarray(split_mask, dtype=bool)
+        self.trace: List[float] = []
+        self.best_score = scoring.score
+        self.best_teams = scoring.teams.copy()
+
+    @abstractmethod
+    def optimize(self, max_iter: int = 1000, **kwargs) -> List[float]:
+        """
+        Run the strategy.
+
+        Returns
+        -------
+        List of the best scores after each iteration.
+        """
+
+    def allowed(self, idx_0: int, idx_1: int) -> bool:
+        teams = self.scoring.teams
+        if teams[idx_0] == teams[idx_1]:
+            return False
+        if self.split_mask[idx_0] == self.split_mask[idx_1]:
+            return True
+        # игрок из split переходит в другую команду - там не должно быть своего
+        other_idx = idx_1 if self.split_mask[idx_0] else idx_0
+        other_team = teams == teams[other_idx]
+        return not (other_team & self.split_mask).any()
+
+    def candidates(self) -> List[Tuple[int, int]]:
+        num_players = len(self.scoring.teams)
+        return [
+            (i, j)
+            for i in range(num_players)
+            for j in range(i + 1, num_players)
+            if self.allowed(i, j)
+        ]
+
+    def random_swap(self) -> Tuple[int, int] | None:
+        """Random allowed swap, None if no swap is allowed (e.g. one team)."""
+        num_players = len(self.scoring.teams)
+        if num_players < 2:
+            return None
+        for _ in range(self.RANDOM_TRIES):
+            idx_0, idx_1 = np.random.choice(num_players, 2, replace=False)
+            if self.allowed(idx_0, idx_1):
+                return idx_0, idx_1
+        # случайные пары не подошли - выбор из всех разрешенных
+        candidates = self.candidates()
+        if not candidates:
+            return None
+        return candidates[np.random.randint(len(candidates))]
+
+    def record(self):
+        if self.scoring.score < self.best_score:
+            self.best_score = self.scoring.score
+            self.best_teams = self.scoring.teams.copy()
+        self.trace.append(self.best_score)
+
+    def restore_best(self):
+        if not np.array_equal(self.best_teams, self.scoring.teams):
+            self.scoring.set_teams(self.best_teams)
+
+
+class SimulatedAnnealing(Strategy):
+    """
+    Random swaps are accepted if they improve the score, worse swaps are
+    accepted with probability exp(-delta / temperature). The temperature
+    decreases geometrically from `t_start` to `t_end`. The search stops
+    early if no swap is allowed.
+    """
+
+    def optimize(self, max_iter: int = 1000, t_start: float | None = None,
+                 t_end: float | None = None) -> List[float]:
+        """
+        Parameters
+        ----------
+        max_iter: int
+            Number of tried swaps.
+        t_start: float | None
+            Initial temperature (default: initial score).
+        t_end: float | None
+            Final temperature (default: t_start / 1000).
+        """
+        t_start = t_start or max(self.scoring.score, 1e-9)
+        t_end = t_end or t_start / 1000
+        cooling = (t_end / t_start) ** (1 / max(max_iter - 1, 1))
+        temperature = t_start
+        for _ in range(max_iter):
+            swap = self.random_swap()
+            if swap is None:
+                break
+            idx_0, idx_1 = swap
+            score, expected = self.scoring.try_swap(idx_0, idx_1)
+            delta = score - self.scoring.score
+            if delta < 0 or np.random.random() < math.exp(-delta / temperature):
+                self.scoring.swap(idx_0, idx_1, expected)
+            self.record()
+            temperature *= cooling
+        self.restore_best()
+        logger.info(f"Annealing result: {self.best_score}")
+        return self.trace
+
+
+class TabuSearch(Strategy):
+    """
+    In each iteration the best allowed swap is made even if it worsens the
+    score. Swapped players are tabu for `tenure` iterations unless the swap
+    gives a new best score (aspiration). When every swap is tabu (small
+    rosters with a long tenure) the swap whose tabu expires first is made,
+    so the search runs for all `max_iter` iterations.
+    """
+
+    def optimize(self, max_iter: int = 100, tenure: int = 7,
+                 sample: int | None = None) -> List[float]:
+        """
+        Parameters
+        ----------
+        max_iter: int
+            Number of iterations.
+        tenure: int
+            Number of iterations a swapped player stays tabu.
+        sample: int | None
+            Evaluate only a random sample of this many swaps per iteration
+            (default: all swaps).
+        """
+        tabu_until = np.zeros(len(self.scoring.teams), dtype=int)
+        for iter_num in range(max_iter):
+            candidates = self.candidates()
+            if sample and len(candidates) > sample:
+                picked = np.random.choice(len(candidates), sample, replace=False)
+                candidates = [candidates[i] for i in picked]
+
+            best = None
+            # если все ходы под запретом - ход, запрет которого истекает раньше всех
+            oldest = None
+            for idx_0, idx_1 in candidates:
+                tabu = tabu_until[idx_0] > iter_num or tabu_until[idx_1] > iter_num
+                score, expected = self.scoring.try_swap(idx_0, idx_1)
+                if tabu and score >= self.best_score:
+                    released = max(tabu_until[idx_0], tabu_until[idx_1])
+                    if oldest is None or (released, score) < oldest[:2]:
+                        oldest = (released, score, idx_0, idx_1, expected)
+                    continue
+                if best is None or score < best[0]:
+                    best = (score, idx_0, idx_1, expected)
+            if best is None:
+                if oldest is None:
+                    break
+                best = oldest[1:]
+
+            _, idx_0, idx_1, expected = best
+            self.scoring.swap(idx_0, idx_1, expected)
+            tabu_until[[idx_0, idx_1]] = iter_num + 1 + tenure
+            self.record()
+        self.restore_best()
+        logger.info(f"Tabu search result: {self.best_score}")
+        return self.trace
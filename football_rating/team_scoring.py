@@ -0,0 +1,197 @@
+import numpy as np
+
+from .matchday import IMPACT
+
+from typing import Tuple
+
+
+def pair_expectation(skills, out: np.ndarray | None = None) -> np.ndarray:
+    """
+    Player-vs-player matrix: [i, j] is the expected score of player i
+    against player j (the same formula as in `Team.expected_score`). The
+    expectation of team `a` against team `b` is the mean of its submatrix
+    [players of a, players of b].
+    """
+    skills = np.asarray(skills, dtype=float)
+    ep = np.subtract(skills[None, :], skills[:, None], out=out)
+    ep /= IMPACT
+    np.power(10., ep, out=ep)
+    ep += 1
+    np.reciprocal(ep, out=ep)
+    return ep
+
+
+class TeamScoring:
+    """
+    Array-backed scoring state used by `MatchMaking`.
+
+    Team membership is kept as an int array (one label per player) and the
+    team-vs-team expected score matrix is cached. Trying a one-for-one swap
+    only recomputes the rows and columns of the two affected teams, so no
+    DataFrame copies or `Player`/`Team` objects are built per candidate.
+
+    The expected score of team `a` against team `b` is the same as in
+    `Team.expected_score`: for every player of `b` the mean expectation of
+    the players of `a` is taken, then these values are averaged. The player
+    expectations are looked up in the `pair_expectation` matrix, which is
+    computed once for the roster (or passed in to share it).
+    Columns are filled as complements of rows (E[b, a] = 1 - E[a, b]).
+    """
+
+    def __init__(self, skills, teams, num_teams: int, pair_expected: np.ndarray | None = None):
+        """
+        Parameters
+        ----------
+        skills: array-like
+            Skill rating per player.
+        teams: array-like
+            Team label (0 ... num_teams - 1) per player.
+        num_teams: int
+            Number of teams.
+        pair_expected: np.ndarray | None
+            `pair_expectation` of the skills (read only), computed if None.
+        """
+        self.skills = np.asarray(skills, dtype=float)
+        self.pair_expected = pair_expectation(self.skills) if pair_expected is None else pair_expected
+        self.num_teams = num_teams
+        self._off_diagonal = ~np.eye(num_teams, dtype=bool)
+        self.set_teams(teams)
+
+    def set_teams(self, teams):
+        """Replace the team labels and recompute the whole state."""
+        self.teams = np.array(teams, dtype=int)
+        num_teams = self.num_teams
+        self.counts = np.bincount(self.teams, minlength=num_teams)
+        self.expected = np.full((num_teams, num_teams), 0.5)
+        for team in range(num_teams):
+            self._set_team(self.expected, self.teams, team)
+        self.team_means = self.calc_means(self.expected)
+        self.score = self.calc_score(self.team_means)
+
+    def _expected_row(self, teams: np.ndarray, team: int) -> np.ndarray:
+        """Expected score of `team` against every team for the labels `teams`."""
+        ep_player_team = self.pair_expected[teams == team].mean(axis=0)
+        return np.bincount(teams, weights=ep_player_team, minlength=self.num_teams) / self.counts
+
+    def _set_team(self, expected: np.ndarray, teams: np.ndarray, team: int):
+        row = self._expected_row(teams, team)
+        expected[team, :] = row
+        expected[:, team] = 1 - row
+        expected[team, team] = 0.5
+
+    def calc_means(self, expected: np.ndarray) -> np.ndarray:
+        """Deviation of each team's mean expected score from the overall mean."""
+        means = expected[self._off_diagonal].reshape(self.num_teams, -1).mean(axis=1)
+        means -= means.mean()
+        return means
+
+    @staticmethod
+    def calc_score(means: np.ndarray) -> float:
+        return np.abs(means).max()
+
+    def _swapped(self, idx_0: int, idx_1: int) -> np.ndarray:
+        teams = self.teams.copy()
+        teams[idx_0], teams[idx_1] = teams[idx_1], teams[idx_0]
+        return teams
+
+    def try_swap(self, idx_0: int, idx_1: int) -> Tuple[float, np.ndarray]:
+        """
+        Score the partition obtained by swapping players `idx_0` and `idx_1`
+        (positions) without changing the state.
+
+        Returns
+        -------
+        score, expected
+            The new score and the expected score matrix, which can be passed
+            to `swap` to commit the change without recomputing it.
+        """
+        team_0, team_1 = self.teams[idx_0], self.teams[idx_1]
+        teams = self._swapped(idx_0, idx_1)
+        expected = self.expected.copy()
+        self._set_team(expected, teams, team_0)
+        self._set_team(expected, teams, team_1)
+        return self.calc_score(self.calc_means(expected)), expected
+
+    def swap(self, idx_0: int, idx_1: int, expected: np.ndarray | None = None):
+        """Commit the swap of players `idx_0` and `idx_1` (positions)."""
+        if expected is None:
+            _, expected = self.try_swap(idx_0, idx_1)
+        self.teams = self._swapped(idx_0, idx_1)
+        self.expected = expected
+        self.team_means = self.calc_means(expected)
+        self.score = self.calc_score(self.team_means)
+
+
+class TeamMeans:
+    """
+    Team means (`MatchMaking.calc_team_means`) of a skill vector and a team
+    label vector, computed in preallocated buffers.
+
+    The player-vs-player expectations (`pair_expectation`) are computed once
+    per skill vector or passed in.
+    A call builds the one-hot team matrix H and takes the team sums of the
+    expectations as H^T P H, so the expected score of team `a` against `b`
+    is the mean over their player pairs - the same value as in
+    `Team.expected_score`. Every label 0 ... num_teams - 1 must be present.
+
+    Calls don't allocate arrays: the returned means are a buffer that is
+    overwritten by the next call (copy it to keep it).
+    """
+
+    def __init__(self, skills, num_teams: int, pair_expected: np.ndarray | None = None):
+        """
+        Parameters
+        ----------
+        skills: array-like
+            Skill rating per player.
+        num_teams: int
+            Number of teams.
+        pair_expected: np.ndarray | None
+            `pair_expectation` of the skills (read only), computed if None.
+        """
+        num_players = len(skills)
+        self.num_teams = num_teams
+        # позиция ячейки (игрок, команда 0) в плоском one-hot
+        self._row_offsets = np.arange(num_players) * num_teams
+        self._flat_index = np.empty(num_players, dtype=np.intp)
+        self._onehot = np.zeros((num_players, num_teams))
+        self._onehot_flat = self._onehot.reshape(-1)
+        self._player_team = np.empty((num_players, num_teams))
+        self._player_ones = np.ones((num_players, 1))
+        self._team_ones = np.ones(num_teams)
+        self._counts = np.empty((num_teams, 1))
+        self._sizes = np.empty((num_teams, num_teams))
+        self.expected = np.empty((num_teams, num_teams))
+        self.means = np.empty(num_teams)
+        self._pair_expected = pair_expected
+        self._owns_pairs = False
+        if pair_expected is None:
+            self.set_skills(skills)
+
+    def set_skills(self, skills):
+        """Recompute the player expectations for new skills (same number of players)."""
+        # чужую (общую) матрицу не перезаписываем
+        out = self._pair_expected if self._owns_pairs else None
+        self._pair_expected = pair_expectation(skills, out=out)
+        self._owns_pairs = True
+
+    def __call__(self, teams: np.ndarray) -> np.ndarray:
+        """Deviation of each team's mean expected score from the overall mean."""
+        # только операции с out= над массивами одной формы: ufunc с broadcasting и
+        # редукции по оси выделяют временные буферы размером с массив
+        np.add(self._row_offsets, teams, out=self._flat_index)
+        self._onehot.fill(0.)
+        self._onehot_flat[self._flat_index] = 1.
+        onehot_t = self._onehot.T
+        np.matmul(self._pair_expected, self._onehot, out=self._player_team)
+        np.matmul(onehot_t, self._player_team, out=self.expected)
+        np.matmul(onehot_t, self._player_ones, out=self._counts)
+        np.matmul(self._counts, self._counts.T, out=self._sizes)
+        np.divide(self.expected, self._sizes, out=self.expected)
+
+        means = self.means
+        np.matmul(self.expected, self._team_ones, out=means)
+        means -= self.expected.diagonal()
+        means /= self.num_teams - 1
+        means -= means.mean()
+        return means
@@ -1,20 +1,32 @@
 import datetime
+import os
 import re
 import sys
 
 from .matchday import Match, MatchDay, Player, Team
+from .tracing import traced
 
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List
+from typing import Dict, Iterator, List, Tuple
 
 
 class TeamNotFound(KeyError):
     pass
 
-def read_match(match_line: str, teams: List[Team]) -> Match | None:
-    team_dict = {team.short_name(): team for team in teams}
-    m = re.match(r"\s*([А-Яа-я]+)\s*(\d+)\s*[:-]\s*(\d+)\s*([А-Яа-я]+)\s*", match_line)
+class ArchiveFormatError(ValueError):
+    pass
+
+MATCH_RE = re.compile(r"\s*([А-Яа-я]+)\s*(\d+)\s*[:-]\s*(\d+)\s*([А-Яа-я]+)\s*")
+# заголовок дня в архиве результатов
+DATE_HEADER_RE = re.compile(r'\s*(\d{4}-\d{2}-\d{2})\s*')
+DATE_FORMAT = "%Y-%m-%d"
+
+
+def read_match(match_line: str, teams: List[Team], team_dict: Dict[str, Team] | None = None) -> Match | None:
+    if team_dict is None:
+        team_dict = {team.short_name(): team for team in teams}
+    m = MATCH_RE.match(match_line)
     if m is None:
         return None
     try:
@@ -60,7 +72,7 @@ def check_new_players(players: List[str], stored: List[str]):
 class MatchDayParser:
     text: str = ''
     filepath: str = ''
-    results: MatchDay = MatchDay([], [])
+    results: MatchDay = field(default_factory=MatchDay)
 
     def __post_init__(self):
         #if not (self.text or self.filepath):
@@ -82,26 +94,150 @@ class MatchDayParser:
         self.parse_teams(team_lines)
         self.parse_results(result_lines)
     
+    @traced('parse.teams')
     def parse_teams(self, team_lines: str):
         self.results.teams = [read_team(line) for line in team_lines]
 
-    def parse_results(self, result_lines: str):
+    @traced('parse.results')
+    def parse_results(self, result_lines: str, date: datetime.date | None = None):
+        team_dict = self.results.short_teams_names()
         self.results.matches = [
-            read_match(line, self.results.teams) for line in result_lines
+            read_match(line, self.results.teams, team_dict) for line in result_lines
         ]
         self.results.matches = [match for match in self.results.matches if match is not None]
-        self.results.date = datetime.datetime.now().date()
-        if self.filepath:
-            basename = Path(self.filepath).stem
-            underscore = basename.find('_')
-            if underscore != -1:
-                basename = basename[:underscore]
-            self.results.date = datetime.datetime.strptime(basename, "%Y-%m-%d").date()
+        self.results.date = date or datetime.datetime.now().date()
+        if self.filepath and date is None:
+            self.results.date = date_from_filename(self.filepath)
+
+
+def date_from_filename(filepath: str) -> datetime.date:
+    basename = Path(filepath).stem
+    underscore = basename.find('_')
+    if underscore != -1:
+        basename = basename[:underscore]
+    return datetime.datetime.strptime(basename, DATE_FORMAT).date()
+
+
+def parse_day(date: datetime.date, lines: List[str]) -> MatchDay:
+    """Match day from team lines, an empty line and result lines."""
+    while lines and not lines[0].strip():
+        lines.pop(0)
+    try:
+        index = next(i for i, line in enumerate(lines) if not line.strip())
+    except StopIteration:
+        index = len(lines)
+    parser = MatchDayParser()
+    parser.parse_teams(lines[:index])
+    parser.parse_results(lines[index + 1:], date)
+    return parser.results
+
+
+def iter_archive(filepath: str) -> Iterator[MatchDay]:
+    """
+    Stream match days of a results file line by line.
+
+    An archive holds many days, each starting with a date header line
+    (YYYY-MM-DD) followed by team lines, an empty line and result lines. A
+    file without date headers is a single day dated by its file name.
+    Non-blank lines before the first header of an archive raise
+    `ArchiveFormatError` (they would be a day without a date).
+    """
+    date = None
+    lines = []
+    with open(filepath, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.rstrip()
+            m = DATE_HEADER_RE.fullmatch(line)
+            if m:
+                if date is not None:
+                    yield parse_day(date, lines)
+                elif any(lines):
+                    first = next(line for line in lines if line)
+                    raise ArchiveFormatError(f'{filepath}: строка "{first}" до первой даты')
+                date = datetime.datetime.strptime(m.group(1), DATE_FORMAT).date()
+                lines = []
+            else:
+                lines.append(line)
+    if date is None:
+        date = date_from_filename(filepath)
+    yield parse_day(date, lines)
+
+
+def iter_match_days(path: str) -> Iterator[MatchDay]:
+    """
+    Stream match days of an archive file or of all files of a directory
+    (in file name order, so dated names go chronologically).
+    """
+    if not os.path.isdir(path):
+        yield from iter_archive(path)
+        return
+    for name in sorted(os.listdir(path)):
+        filepath = os.path.join(path, name)
+        if os.path.isfile(filepath):
+            yield from iter_archive(filepath)
 
 class PlayersFormatError(ValueError):
     pass
 
 
+# слова, после которых в строке игрока идет лабуда (по приоритету)
+SPLIT_WORDS = (' б/а', ' ба', ' вместо', ' без абика', ' абик', ' аб', ' в раме', ' рама')
+SPLIT_WORD_PRIORITY = {word: i for i, word in enumerate(SPLIT_WORDS)}
+# строка игрока начинается с вида *3.
+PLAYER_LINE_RE = re.compile(r'\s*(\*)?\d+\.')
+# все после первого не_ascii (включая его) отбрасывается
+NOISE_RE = re.compile(r'[^\w\sа-яА-ЯёЁ\-\.\\\/]', flags=re.UNICODE)
+# слово в конце строки или перед пробелом, lookahead - чтобы найти все вхождения
+SPLIT_WORD_RE = re.compile(r'(?=(' + '|'.join(map(re.escape, SPLIT_WORDS)) + r')(?: |\Z))')
+# * (опционально) - в разные команды
+# число - номер игрока
+# . (опционально) - разделитель
+# имя
+# текст - лабуда какая-то по-моему
+PLAYER_RE = re.compile(r'\*?(\d+\s*\.?)?\s*([а-яёa-z]+(\s+[а-яёa-z]+\.?)?)\s*')
+
+
+def cut_split_word(line: str, lower: str) -> str:
+    """
+    Cut the line at a split word: the first word of `SPLIT_WORDS` found,
+    at the end of the line if it is there, otherwise at its first occurrence.
+    """
+    best = None
+    for m in SPLIT_WORD_RE.finditer(lower):
+        word = m.group(1)
+        at_end = m.start() + len(word) == len(lower)
+        key = (SPLIT_WORD_PRIORITY[word], not at_end, m.start())
+        if best is None or key < best:
+            best = key
+    if best is None:
+        return line
+    return line[:best[2]]
+
+
+def parse_player_line(line: str) -> Tuple[str | None, bool]:
+    """
+    Player name and split flag of a sign-up line, (None, False) if the line
+    is not a numbered player line.
+    """
+    m = PLAYER_LINE_RE.match(line)
+    if m is None:
+        return None, False
+    split_player = m.start(1) != -1
+    if split_player:
+        line = line[:m.start(1)] + line[m.end(1):]
+    noise = NOISE_RE.search(line)
+    if noise:
+        line = line[:noise.start()]
+    line = cut_split_word(line, line.lower())
+    m = PLAYER_RE.fullmatch(line.lower())
+    if not m:
+        raise PlayersFormatError(f'Строка {line} не соответствует шаблону.')
+    name = line[m.start(2):m.end(2)]
+    if name.endswith('.'):
+        name = name[:-1]
+    return name, split_player
+
+
 @dataclass
 class PlayersText:
     filepath: str = None,
@@ -116,60 +252,14 @@ class PlayersText:
             self.text = self.text.split('\n')
         self.read(self.text)
 
-    def read(self, lines: str):
+    @traced('parse.players')
+    def read(self, lines: List[str]):
         self.players.clear()
         self.to_split.clear()
-        while re.match(r'^\s*$', lines[0]):
-            lines.pop(0)
-        split_words = [
-            ' б/а',
-            ' ба',
-            ' вместо',
-            ' без абика',
-            ' абик',
-            ' аб',
-            ' в раме',
-            ' рама'
-        ]
-        '''
-        * (опционально) - в разные команды
-        число - номер игрока
-        . (опционально) - разделитель
-        имя
-        текст - лабуда какая-то по-моему
-        '''
-        reg = re.compile(r'\*?(\d+\s*\.?)?\s*([а-яёa-z]+(\s+[а-яёa-z]+\.?)?)\s*')
         for line in lines:
-            # проверяем строка начинается с вида *3.
-            if not re.match(r'^\s*\*?\d+\.', line):
+            name, split_player = parse_player_line(line)
+            if name is None:
                 continue
-            split_player = line.lstrip().startswith('*')
-            if split_player:
-                line = line.replace('*', '', 1)
-            line.replace(',', ' ')
-            line.replace('.', ' ')
-            # 1. Удалить \s*не_ascii\s* в начале строки
-            line = re.sub(r'^\s*[^\w\sа-яА-ЯёЁ\-\.\\\/]+\s*', '', line, flags=re.UNICODE)
-            # 2. Удалить все после первого не_ascii (включая его)
-            line = re.sub(r'[^\w\sа-яА-ЯёЁ\-\.\\\/].*$', '', line, flags=re.UNICODE)
-
-            for word in split_words:
-                if line.lower().endswith(word):
-                    line = line[:-len(word)]
-                    break
-                word += ' '
-                try:
-                    index = line.lower().index(word)
-                    line = line[:index]
-                    break
-                except ValueError:
-                    pass
-            m = re.fullmatch(reg, line.lower())
-            if not m:
-                raise PlayersFormatError(f'Строка {line} не соответствует шаблону.')
-            name = line[m.start(2):m.end(2)]
-            if name.endswith('.'):
-                name = name[:-1]
             self.players.append(name)
             if split_player:
                 self.to_split.append(name)
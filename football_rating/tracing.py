@@ -0,0 +1,250 @@
+import bisect
+import contextvars
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+
+from .log import get_logger
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Dict, List, Tuple
+
+logger = get_logger(__name__)
+
+# верхние границы корзин гистограммы, мс
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, float('inf'))
+
+
+@dataclass
+class Histogram:
+    counts: List[int] = field(default_factory=lambda: [0] * len(BUCKETS_MS))
+    count: int = 0
+    total: float = 0.
+    max: float = 0.
+
+    def add(self, ms: float):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the quantile (capped by max)."""
+        rank = q * self.count
+        for bound, cumulative in zip(BUCKETS_MS, itertools.accumulate(self.counts)):
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+@dataclass
+class Trace:
+    name: str
+    id: int
+    fields: Dict
+    start: float = field(default_factory=time.perf_counter)
+    # (этап, длительность мс, вложенность)
+    spans: List[Tuple[str, float, int]] = field(default_factory=list)
+    depth: int = 0
+
+
+class Tracer:
+    """
+    Lightweight timing spans.
+
+    `span(stage)` measures a block with `perf_counter` and adds it to the
+    per-stage histogram and to the trace of the current request (if any).
+    `request(name)` opens a trace; when it ends, the timing breakdown is
+    logged as one JSON line. The current trace is a context variable, so
+    spans in worker threads are attributed to the request if the thread runs
+    in a copy of the request context (`contextvars.copy_context`). Spans of
+    a worker process are gathered there with `collect` and added to the
+    caller's histograms and trace with `merge`.
+
+    When disabled `span` returns a shared no-op context manager.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._current: contextvars.ContextVar[Trace | None] = contextvars.ContextVar('trace', default=None)
+
+    def enable(self, enabled: bool = True):
+        self.enabled = enabled
+        if enabled and logger.level > logging.INFO:
+            logger.setLevel(logging.INFO)
+
+    def span(self, stage: str):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, stage)
+
+    @contextmanager
+    def request(self, name: str, **fields):
+        if not self.enabled:
+            yield None
+            return
+        trace = Trace(name, next(self._ids), fields)
+        token = self._current.set(trace)
+        try:
+            yield trace
+        finally:
+            self._current.reset(token)
+            total = (time.perf_counter() - trace.start) * 1000
+            self.record(f'request.{name}', total)
+            logger.info(json.dumps({
+                'request': name,
+                'id': trace.id,
+                **trace.fields,
+                'total_ms': round(total, 2),
+                'spans': [
+                    {'stage': stage, 'ms': round(ms, 2), 'depth': depth} for stage, ms, depth in trace.spans
+                ],
+            }, ensure_ascii=False, default=str))
+
+    @contextmanager
+    def collect(self, enabled: bool = True):
+        """
+        Gather the spans of the block into a list of (stage, ms, depth), e.g.
+        in a worker process; the caller adds them with `merge`.
+        """
+        if not enabled:
+            yield []
+            return
+        was_enabled = self.enabled
+        self.enabled = True
+        trace = Trace('collect', 0, {})
+        token = self._current.set(trace)
+        try:
+            yield trace.spans
+        finally:
+            self._current.reset(token)
+            self.enabled = was_enabled
+
+    def merge(self, spans: List[Tuple[str, float, int]]):
+        """Add spans gathered by `collect` to the histograms and the current trace."""
+        if not self.enabled:
+            return
+        trace = self._current.get()
+        for stage, ms, depth in spans:
+            self.record(stage, ms)
+            if trace is not None:
+                trace.spans.append((stage, ms, trace.depth + depth))
+
+    def record(self, stage: str, ms: float):
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.add(ms)
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+
+    def format_stats(self) -> str:
+        """Per-stage table: count, mean, p50, p90, p99 (bucket bounds) and max in ms."""
+        with self._lock:
+            items = sorted(self.histograms.items())
+        if not items:
+            return 'Нет данных (трассировка выключена или запросов не было)'
+        width = max(len(stage) for stage, _ in items)
+        lines = [f'{"stage":<{width}} {"n":>6} {"mean":>8} {"p50":>7} {"p90":>7} {"p99":>7} {"max":>8}']
+        for stage, histogram in items:
+            lines.append(
+                f'{stage:<{width}} {histogram.count:>6} {histogram.total / histogram.count:>8.1f} '
+                f'{histogram.quantile(.5):>7.0f} {histogram.quantile(.9):>7.0f} '
+                f'{histogram.quantile(.99):>7.0f} {histogram.max:>8.1f}'
+            )
+        return '\n'.join(lines)
+
+
+class Span:
+    __slots__ = ('tracer', 'stage', 'trace', 'start')
+
+    def __init__(self, tracer: Tracer, stage: str):
+        self.tracer = tracer
+        self.stage = stage
+
+    def __enter__(self):
+        self.trace = self.tracer._current.get()
+        if self.trace is not None:
+            self.trace.depth += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        ms = (time.perf_counter() - self.start) * 1000
+        self.tracer.record(self.stage, ms)
+        if self.trace is not None:
+            self.trace.depth -= 1
+            self.trace.spans.append((self.stage, ms, self.trace.depth))
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+TRACER = Tracer()
+
+
+def configure():
+    """
+    Enable tracing if FOOTBALL_RATING_TRACE is set; called again after the
+    environment is loaded from .env (`load_dotenv`).
+    """
+    TRACER.enable(os.getenv('FOOTBALL_RATING_TRACE', '') not in ('', '0'))
+
+
+configure()
+
+
+def span(stage: str):
+    if not TRACER.enabled:
+        return NULL_SPAN
+    return Span(TRACER, stage)
+
+
+def traced(stage: str):
+    """Decorator: run the function in a `span(stage)`."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not TRACER.enabled:
+                return fn(*args, **kwargs)
+            with TRACER.span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def request(name: str, **fields):
+    return TRACER.request(name, **fields)
+
+
+def collect(enabled: bool = True):
+    return TRACER.collect(enabled)
+
+
+def merge(spans: List[Tuple[str, float, int]]):
+    TRACER.merge(spans)
+
+
+def format_stats() -> str:
+    return TRACER.format_stats()
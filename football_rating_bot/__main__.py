@@ -2,6 +2,10 @@ from .football_rating_bot import FootballRatingBot
 
 import os
 
+from dotenv import load_dotenv
+
+load_dotenv()
+
 db_url = os.getenv('DATABASE_URL')
 
 if not db_url:
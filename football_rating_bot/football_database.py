@@ -1,14 +1,20 @@
 import logging
-import pandas as pd
+import threading
 
 from enum import IntEnum, unique
 from functools import wraps
 
-from sqlalchemy import create_engine, Column, String, Integer
+from sqlalchemy import create_engine, and_, update, Column, String, Integer
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import StaticPool
 
-from typing import Callable
+from typing import Callable, Dict, Tuple
+
+from football_rating.tracing import span
+
+from .migrations import migrate
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -26,14 +32,22 @@ class Owner(Base):
 class User(Base):
     __tablename__ = 'users'
     id = Column(Integer, primary_key=True)
-    name = Column(String)
+    name = Column(String, index=True)
     url = Column(String)    # active url
     
 class Admin(Base)    :
     __tablename__ = 'admins'
     # Foreign Key чет сбоил в SqliteProfessional - убрал
     id = Column(Integer, primary_key=True)      # обязательно должен быть primary_key
-    url = Column(String, primary_key=True)      # в данном случае - составной на пары
+    url = Column(String, primary_key=True, index=True)      # в данном случае - составной на пары
+
+class Counter(Base):
+    __tablename__ = 'counters'
+    name = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False)
+
+# число таблиц владельцев, меняется в одной транзакции с owners
+TABLES_COUNTER = 'tables'
 
 def model_to_dict(model):
     if model is None:
@@ -43,7 +57,7 @@ def model_to_dict(model):
 def with_session(func: Callable):
     @wraps(func)
     def wrapper(self, *args, **kwargs):
-        with self.session() as session:
+        with span(f'db.{func.__name__}'), self.session() as session:
             try:
                 return func(self, *args, session=session, **kwargs)
             except Exception as e:
@@ -56,7 +70,7 @@ def with_session(func: Callable):
 def with_commit(func: Callable):
     @wraps(func)
     def wrapper(self, *args, **kwargs):
-        with self.session() as session:
+        with span(f'db.{func.__name__}'), self.session() as session:
             try:
                 result = func(self, *args, session=session, **kwargs)
                 session.commit()
@@ -81,13 +95,46 @@ class UserRole(IntEnum):
     ADMIN = 1,
     USER = 2
 
+def engine_options(db_path: str) -> Dict:
+    """
+    Pool settings per backend: SQLite allows one writer and connections are
+    cheap, so a small pool shared between threads (a single static
+    connection for in-memory databases). Server databases get a bigger pool
+    with pre-ping and recycling of stale connections.
+    """
+    url = make_url(db_path)
+    if url.get_backend_name() == 'sqlite':
+        options = {'connect_args': {'check_same_thread': False}}
+        if url.database in (None, '', ':memory:'):
+            options['poolclass'] = StaticPool
+        else:
+            options |= {'pool_size': 4, 'max_overflow': 4}
+        return options
+    return {'pool_size': 10, 'max_overflow': 10, 'pool_pre_ping': True, 'pool_recycle': 1800}
+
+
 class FootballDatabase:  
+    """
+    Users, admins and owners of the bot.
+
+    Lookups of users and admin rights are cached in memory (read-through),
+    the cache entries are dropped after the records are updated through
+    this object. Every invalidation bumps `cache_generation`; a value read
+    while the generation changed is not stored, so a read that started
+    before an update can't put the old record back into the cache.
+    Returned records are detached from the session.
+    """
     NOT_FOUND = 'Пользователь {} не найден'
     
-    def __init__(self, db_path: str):
-        self.engine = create_engine(db_path)
+    def __init__(self, db_path: str, cache: bool = True):
+        self.engine = create_engine(db_path, **engine_options(db_path))
         Base.metadata.create_all(self.engine)
-        self.session = sessionmaker(bind=self.engine)
+        migrate(self.engine)
+        self.session = sessionmaker(bind=self.engine, expire_on_commit=False)
+        self.use_cache = cache
+        self.cache: Dict[Tuple, object] = {}
+        self.cache_lock = threading.Lock()
+        self.cache_generation = 0
     
     def __enter__(self):
         return self
@@ -102,28 +149,75 @@ class FootballDatabase:
         return owner
     
     def get_user(self, id: int) -> User:
-        user = self._get_user(id)
+        user = self._cached(('user', id), self._get_user, id)
         if not user:
             raise RecordNotFound(self.NOT_FOUND.format(id))
         return user
     
     def get_user_by_name(self, name: str) -> User:
-        user = self._get_user_by_name(name)
+        user = self._cached(('name', name), self._get_user_by_name, name)
         if not user:
             raise RecordNotFound(self.NOT_FOUND.format(name))
         return user    
     
+    def get_user_with_admin(self, id: int) -> Tuple[User, bool]:
+        """User and whether they are an admin of their active url (one query)."""
+        result = self._cached(('user_admin', id), self._get_user_with_admin, id)
+        if not result:
+            raise RecordNotFound(self.NOT_FOUND.format(id))
+        return result
+
     def is_admin(self, id: int, url: str) -> bool:
-        return self._is_admin(id, url)
+        return self._cached(('admin', id, url), self._is_admin, id, url)
     
     def update_admin(self, admin_id: int, url: str, state: bool):
         self._update_admin(admin_id, url, state)
+        # кэш сбрасывается после commit, чтобы не закэшировать старое значение
+        self._invalidate(lambda key: key[0] in ('admin', 'user_admin') and key[1] == admin_id)
 
     def update_owner(self, id: int, url: str):
         self._update_owner(id, url)        
+        self._invalidate(lambda key: key == ('counter', TABLES_COUNTER))
+
+    def get_tables_count(self) -> int:
+        """Number of owner tables (O(1) counter, no Drive request)."""
+        return self._cached(('counter', TABLES_COUNTER), self._get_counter, TABLES_COUNTER)
+
+    def set_tables_count(self, count: int, expected: int | None = None) -> bool:
+        """
+        Correct the counter, e.g. after reconciliation with Drive. With
+        `expected` the counter is set only if it still has this value, so an
+        owner added since it was read is not overwritten. Returns whether
+        the counter was set.
+        """
+        updated = self._set_counter(TABLES_COUNTER, count, expected)
+        self._invalidate(lambda key: key == ('counter', TABLES_COUNTER))
+        return updated
 
     def update_user(self, id: int, name: str, url: str):
         self._update_user(id, name, url)
+        # имя могло смениться - записи по имени сбрасываются целиком
+        self._invalidate(lambda key: key[0] == 'name' or key[1] == id)
+
+    def _cached(self, key: Tuple, fn: Callable, *args):
+        if not self.use_cache:
+            return fn(*args)
+        with self.cache_lock:
+            if key in self.cache:
+                return self.cache[key]
+            generation = self.cache_generation
+        value = fn(*args)
+        with self.cache_lock:
+            # пока читали, записи обновились - значение могло устареть
+            if generation == self.cache_generation:
+                self.cache[key] = value
+        return value
+
+    def _invalidate(self, match: Callable[[Tuple], bool]):
+        with self.cache_lock:
+            self.cache_generation += 1
+            for key in [key for key in self.cache if match(key)]:
+                del self.cache[key]
 
     @with_session
     def _get_owner(self, id: int, session: Session):
@@ -137,9 +231,20 @@ class FootballDatabase:
     def _get_user_by_name(self, name: str, session: Session):
         return session.query(User).filter_by(name=name).first()
     
+    @with_session
+    def _get_user_with_admin(self, id: int, session: Session):
+        row = session.query(User, Admin.id) \
+            .outerjoin(Admin, and_(Admin.id == User.id, Admin.url == User.url)) \
+            .filter(User.id == id) \
+            .first()
+        if row is None:
+            return None
+        user, admin_id = row
+        return user, admin_id is not None
+
     @with_session
     def _is_admin(self, id: int, url: str, session: Session) -> bool:
-        return session.query(User).filter_by(id=id, url=url).first() is not None
+        return session.get(Admin, (id, url)) is not None
     
     @with_commit
     def _update_admin(self, admin_id: int, url: str, state: bool, session: Session):
@@ -158,6 +263,25 @@ class FootballDatabase:
         else:
             owner = Owner(id=id, url=url)
             session.add(owner)            
+            session.execute(
+                update(Counter).where(Counter.name == TABLES_COUNTER).values(value=Counter.value + 1)
+            )
+
+    @with_session
+    def _get_counter(self, name: str, session: Session) -> int:
+        counter = session.get(Counter, name)
+        return counter.value if counter else 0
+
+    @with_commit
+    def _set_counter(self, name: str, value: int, expected: int | None, session: Session) -> bool:
+        if expected is None:
+            session.merge(Counter(name=name, value=value))
+            return True
+        # сравнение и запись одним UPDATE - инкремент из _update_owner не потеряется
+        result = session.execute(
+            update(Counter).where(Counter.name == name, Counter.value == expected).values(value=value)
+        )
+        return result.rowcount == 1
 
     @with_commit
     def _update_user(self, id: int, name: str, url: str, session: Session):
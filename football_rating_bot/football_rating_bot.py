@@ -1,25 +1,30 @@
 from .football_database import FootballDatabase, RecordNotFound
-from football_rating.data_storage import GSheetStorage, StorageError
-from football_rating.matchmaking import MatchMaking
-from football_rating.text_parser import MatchDayParser, PlayersText, PlayersFormatError, TeamNotFound
-from football_rating.football_rating_utility import player_generator
-from football_rating.matchmaking_utility import get_teams
-
-import json
+from football_rating.google_clients import REGISTRY as google_clients, get_drive
+from football_rating.storage_cache import StorageCache
+from football_rating import tracing
+
+import asyncio
+import contextvars
+import html
+import importlib
 import logging
+import multiprocessing
 import os
-import pandas as pd
 import re
+import threading
+import weakref
 
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
-from dotenv import load_dotenv
 from enum import IntEnum, unique
-from functools import wraps
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
+from functools import partial, wraps
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
-from telegram.ext import Application, ContextTypes, CommandHandler, MessageHandler, filters, CallbackQueryHandler
-from typing import Dict, Tuple
+from telegram.ext import Application, BaseUpdateProcessor, ContextTypes, CommandHandler, MessageHandler, filters, CallbackQueryHandler
+from telegram.request import BaseRequest
+from typing import TYPE_CHECKING, Awaitable, Dict, List, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(lineno)d - %(message)s',
@@ -30,7 +35,50 @@ logging.getLogger('httpcore').setLevel(logging.WARNING)
 logging.getLogger('httpx').setLevel(logging.WARNING)
 logging.getLogger('telegram.ext').setLevel(logging.WARNING)
 
-load_dotenv()
+# numpy, pandas, pygsheets, googleapiclient и оптимизатор загружаются не при старте, а при
+# первом запросе, которому они нужны; после запуска бота они прогреваются в фоновом потоке
+LAZY_MODULES = (
+    'football_rating.text_parser',
+    'football_rating.data_storage',
+    'football_rating.football_rating_utility',
+    'football_rating.matchmaking',
+    'football_rating.matchmaking_utility',
+)
+
+
+def preload_modules():
+    for name in LAZY_MODULES:
+        importlib.import_module(name)
+
+
+class ChatUpdateProcessor(BaseUpdateProcessor):
+    """
+    Updates of different chats are processed concurrently, updates of one
+    chat one by one in the order they came (the dialog state in `user_data`
+    depends on it). A chat lock lives while its updates are processed or
+    wait, so idle chats take no memory.
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self._chat_locks: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+
+    async def do_process_update(self, update: object, coroutine: Awaitable):
+        chat = getattr(update, 'effective_chat', None)
+        user = getattr(update, 'effective_user', None)
+        key = chat.id if chat else user.id if user else None
+        lock = self._chat_locks.get(key)
+        if lock is None:
+            lock = self._chat_locks[key] = asyncio.Lock()
+        async with lock:
+            await coroutine
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
 
 class ArgumentLengthException(Exception):
     pass
@@ -56,20 +104,49 @@ class BotInteraction(IntEnum):
     RESULTS=7,
     TEAMS=8
 
-# только для синхронного кода без async
+# для синхронного кода: выполняется в пуле потоков, не блокируя event loop
 def bot_command(fn):
     @wraps(fn)
     async def wrapper(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         answer = self.INTERNAL_ERROR
-        try:
-            self._clear_context(context)
-            answer = fn(self, update, context)
-        except Exception as e:
-            self._clear_context(context)
-            logger.debug(str(e))
-        await update.message.reply_text(answer, parse_mode='HTML')
+        with tracing.request(fn.__name__, user=update.effective_user.id):
+            try:
+                self._clear_context(context)
+                answer = await self._run_blocking(fn, self, update, context, executor=self.command_executor)
+            except Exception as e:
+                self._clear_context(context)
+                logger.debug(str(e))
+            with tracing.span('telegram.reply'):
+                await update.message.reply_text(answer, parse_mode='HTML')
     return wrapper
 
+
+def split_teams(players_data: Dict[str, List[int]], count: int, split_players: List[str],
+                trace: bool = False) -> Tuple[List[str], List[Tuple[str, float, int]]]:
+    """
+    Split players into teams and format them (runs in a worker process).
+    With `trace` the tracing spans of the worker are returned for
+    `tracing.merge` in the bot process.
+    """
+    import pandas as pd
+    from football_rating.matchmaking import MatchMaking
+    from football_rating.matchmaking_utility import get_teams
+
+    df = pd.DataFrame.from_dict(players_data, orient='index').reset_index()
+    df.columns = ['player', 'skill', 'matches']
+    with tracing.collect(trace) as spans:
+        matchmaker = MatchMaking(df, count, split=split_players)
+        df = matchmaker.optimize_exact()
+    teams = df.groupby(['team'])[['player', 'skill']]
+    team_list = []
+    for key, _ in teams:
+        team = teams.get_group(key)
+        players = team['player'].tolist()
+        score = team['skill'].mean()
+        players_str = ', '.join(players)
+        team_list.append(f'{players_str} - средний {score:.2f}')
+    return get_teams(team_list, html=True), spans
+
 class FootballRatingBot:
     INTERNAL_ERROR = 'Произошла внутренняя ошибка'
     MESSAGE_ERROR = 'Сообщение не распознано (посмотрите /help)'
@@ -82,27 +159,38 @@ class FootballRatingBot:
     TEAMS_KEY = 'teams'
     MAX_LEN = 64
     MAX_TABLES = 50
+    RECONCILE_INTERVAL = 3600   # секунд между сверками числа таблиц с Drive
+    BLOCKING_WORKERS = 8        # потоки для хранилища и разбиения
+    COMMAND_WORKERS = 4         # потоки для команд и быстрых запросов к базе
+    SPLIT_WORKERS = 2           # процессы для разбиения на команды
+    CONCURRENT_UPDATES = 64     # одновременно обрабатываемых обновлений всех чатов
     GMAIL_REGEX = r'^[a-zA-Z0-9._%+-]+@gmail\.com$'
 
 
     def __init__(self, db_url):
+        tracing.configure()     # переменные окружения уже загружены из .env
         self.token = os.getenv("BOT_TOKEN")
         self.gcp_key = os.getenv("GCP_KEY")
         self.folder_id = os.getenv("BOT_FOLDER_ID")
         self.admin_gmail = os.getenv("ADMIN_GMAIL")
         self.db = FootballDatabase(db_url)
-        self.application = Application \
-            .builder() \
-            .token(self.token) \
-            .build()
+        self.storages = StorageCache(self.gcp_key)
+        self.executor = ThreadPoolExecutor(max_workers=self.BLOCKING_WORKERS)
+        self.command_executor = ThreadPoolExecutor(max_workers=self.COMMAND_WORKERS)
+        # fork из многопоточного процесса может унаследовать захваченные блокировки
+        mp_context = multiprocessing.get_context('forkserver')
+        mp_context.set_forkserver_preload(['football_rating.matchmaking', 'football_rating.matchmaking_utility'])
+        self.split_executor = ProcessPoolExecutor(max_workers=self.SPLIT_WORKERS, mp_context=mp_context)
+        self.reconcile_stop = threading.Event()
+        self.application = self._build_application()
         # TODO: garbage collector
         
     @bot_command
     def admin(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user = update.effective_user
         try:
-            current_user = self.db.get_user(user.id)
-            if self.db.is_admin(user.id, current_user.url):
+            _, is_admin = self.db.get_user_with_admin(user.id)
+            if is_admin:
                 answer = (
                     'Введите пользователя:\n'
                     '@username\n'
@@ -116,6 +204,10 @@ class FootballRatingBot:
         return answer
 
     async def button(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        with tracing.request('button', user=update.effective_user.id):
+            await self._button(update, context)
+
+    async def _button(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:            
             query = update.callback_query
             await query.answer()
@@ -123,7 +215,7 @@ class FootballRatingBot:
             if context.user_data[self.INTERACTION_KEY] == BotInteraction.ADMIN:
                 username = context.user_data[self.USER_KEY]
                 gmail = context.user_data[self.GMAIL_KEY]
-                self._set_admin(username, gmail, data == 'on')
+                await self._run_blocking(self._set_admin, username, gmail, data == 'on')
                 await query.message.reply_text('Права доступа успешно обновлены')
             elif context.user_data[self.INTERACTION_KEY] == BotInteraction.START:
                 callbacks = {
@@ -144,6 +236,7 @@ class FootballRatingBot:
             '/results - загрузить результаты\n'
             '/split - разбить на команды\n'
             '/start - запуск или переключение между группами таблицами\n'
+            '/stats - время обработки запросов по этапам (для администраторов)\n'
         )
         
         text += (
@@ -186,7 +279,9 @@ class FootballRatingBot:
                 BotInteraction.RESULTS: self._message_results,
                 BotInteraction.URL: self._message_url
             }
-            await callbacks[context.user_data[self.INTERACTION_KEY]](update, context)
+            interaction = context.user_data[self.INTERACTION_KEY]
+            with tracing.request(f'message.{interaction.name.lower()}', user=update.effective_user.id):
+                await callbacks[interaction](update, context)
         except Exception as e:
             logger.debug(str(e))
             await update.message.reply_text(self.MESSAGE_ERROR)
@@ -195,19 +290,71 @@ class FootballRatingBot:
     def results(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         context.user_data[self.INTERACTION_KEY] = BotInteraction.TEAMS
         return 'Введите команды'
+
+    @bot_command
+    def stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        try:
+            _, is_admin = self.db.get_user_with_admin(update.effective_user.id)
+        except LookupError:
+            return self.NO_USER_ERROR
+        if not is_admin:
+            return 'У вас нет прав администратора'
+        if not tracing.TRACER.enabled:
+            return 'Трассировка выключена (FOOTBALL_RATING_TRACE=1)'
+        return f'<pre>{html.escape(tracing.format_stats())}</pre>'
     
     def run(self):
+        self._add_handlers()
+        allowed_updates=['message', 'callback_query']
+        self.executor.submit(preload_modules)
+        threading.Thread(target=self._reconcile_loop, name='tables-reconcile', daemon=True).start()
+        try:
+            self.application.run_polling(poll_interval=2, allowed_updates=allowed_updates)
+        finally:
+            self.close()
+
+    def _build_application(self, request: BaseRequest | None = None) -> Application:
+        """
+        Application processing updates of different chats concurrently;
+        `request` replaces the HTTP transport of the Bot API (benchmarks).
+        """
+        builder = Application \
+            .builder() \
+            .token(self.token) \
+            .concurrent_updates(ChatUpdateProcessor(self.CONCURRENT_UPDATES))
+        if request is not None:
+            builder = builder.request(request).get_updates_request(request)
+        return builder.build()
+
+    def _add_handlers(self):
         self.application.add_handler(CommandHandler("admin", self.admin))
         self.application.add_handler(CommandHandler("help", self.help))
         self.application.add_handler(CommandHandler("results", self.results))
         self.application.add_handler(CommandHandler("start", self.start))
         self.application.add_handler(CommandHandler("split", self.split))
+        self.application.add_handler(CommandHandler("stats", self.stats))
         self.application.add_handler(CallbackQueryHandler(self.button))
         self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND & filters.ChatType.PRIVATE, self.message))
 
-
-        allowed_updates=['message', 'callback_query']
-        self.application.run_polling(poll_interval=2, allowed_updates=allowed_updates)
+    def close(self):
+        self.reconcile_stop.set()
+        self.storages.close()
+        self.executor.shutdown()
+        self.command_executor.shutdown()
+        self.split_executor.shutdown()
+        google_clients.close()
+
+    async def _run_blocking(self, fn, *args, executor=None):
+        """
+        Run blocking code (storage, database, matchmaking) in a thread pool
+        (by default the one for heavy requests, so they don't delay commands).
+        Requests of one chat don't overlap: `ChatUpdateProcessor` handles
+        them one by one. The call runs in a copy of the current context, so
+        its tracing spans belong to the request.
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(executor or self.executor, context.run, partial(fn, *args))
 
     @bot_command
     def split(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -251,23 +398,46 @@ class FootballRatingBot:
         context.user_data[self.GMAIL_KEY] = ''
 
     def _get_tables_count(self):
-        SCOPES = [
-            'https://www.googleapis.com/auth/spreadsheets',
-            'https://www.googleapis.com/auth/drive'
-        ]
-
-        credentials = Credentials.from_service_account_info(
-            json.loads(self.gcp_key),
-            scopes=SCOPES
-        )
-        drive_service = build('drive', 'v3', credentials=credentials)
-
+        """Number of bot tables on Drive (all result pages)."""
+        drive_service = get_drive(self.gcp_key)
         query = "name contains 'football-rating' and mimeType='application/vnd.google-apps.spreadsheet'"
-        results = drive_service.files().list(q=query, fields="files(id, name)").execute()
-        files = results.get('files', [])
-        # contains сравнивает не совсем точно, не учитывая _ - нужно дополнительно отфильтровать        
-        filtered_files = [f for f in files if f['name'].startswith('football-rating_')]
-        return len(filtered_files)
+        count = 0
+        page_token = None
+        while True:
+            results = drive_service.files().list(
+                q=query, fields="nextPageToken, files(id, name)", pageSize=1000, pageToken=page_token
+            ).execute()
+            # contains сравнивает не совсем точно, не учитывая _ - нужно дополнительно отфильтровать
+            count += sum(f['name'].startswith('football-rating_') for f in results.get('files', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return count
+
+    def _reconcile_tables_count(self):
+        """
+        Correct the table counter of the database by the Drive listing. The
+        counter is read before the listing and replaced only if it didn't
+        change meanwhile; otherwise the next reconciliation corrects it.
+        """
+        stored = self.db.get_tables_count()
+        with tracing.span('drive.reconcile'):
+            count = self._get_tables_count()
+        if count == stored:
+            return
+        if self.db.set_tables_count(count, expected=stored):
+            logger.warning(f'Число таблиц: в базе {stored}, на Drive {count} - исправлено')
+        else:
+            logger.debug('Число таблиц изменилось во время сверки - исправление отложено')
+
+    def _reconcile_loop(self):
+        # первая сверка сразу после старта, дальше раз в RECONCILE_INTERVAL
+        while True:
+            try:
+                self._reconcile_tables_count()
+            except Exception as e:
+                logger.debug(f'Сверка числа таблиц не удалась: {e}')
+            if self.reconcile_stop.wait(self.RECONCILE_INTERVAL):
+                return
     
     # def _get_argument(self, text: str, max_len: int | None = None):
     #     index = text.find(' ')
@@ -278,7 +448,7 @@ class FootballRatingBot:
     #         raise ArgumentLengthException()
     #     return arg
 
-    def _get_players_dict(self, df: pd.DataFrame) -> Dict[str, Tuple[int, int]]:
+    def _get_players_dict(self, df: 'pd.DataFrame') -> Dict[str, Tuple[int, int]]:
         return {
             row["name"]: (row["elo"], row["matches"])
             for _, row in df.iterrows()
@@ -299,7 +469,9 @@ class FootballRatingBot:
             except IndexError:
                 context.user_data[self.GMAIL_KEY] = ''
             context.user_data[self.USER_KEY] = username
-            self.db.get_user_by_name(username)
+            await self._run_blocking(
+                self.db.get_user_by_name, username, executor=self.command_executor
+            )
             buttons = [('Админ', 'on'), ('Пользователь', 'off')]
             await update.message.reply_text(
                 text= 'Какие права дать пользователю?',
@@ -313,16 +485,21 @@ class FootballRatingBot:
             await update.message.reply_text(self.NO_USER_ERROR)
     
     async def _message_gmail(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        answer = self.INTERNAL_ERROR
-        gmail = update.message.text
+        self._clear_context(context)
+        answer = await self._run_blocking(
+            self._gmail_answer, update.effective_user, update.message.text
+        )
+        await update.message.reply_text(answer)
+
+    def _gmail_answer(self, user, gmail: str) -> str:
+        from football_rating.data_storage import GSheetStorage
         try:
-            self._clear_context(context)
-            count = self._get_tables_count()
+            # счетчик в базе; с Drive он сверяется в фоне (_reconcile_loop)
+            count = self.db.get_tables_count()
             if count >= self.MAX_TABLES:
                 raise ValueError(f'Достигнут лимит таблиц.')
             if not re.fullmatch(self.GMAIL_REGEX, gmail):
                 raise ValueError(f'Неверный формат почты {gmail}')
-            user = update.effective_user
             storage = GSheetStorage(
                 service_json=self.gcp_key,
                 file_name=f'football-rating_{user.id}',
@@ -338,7 +515,7 @@ class FootballRatingBot:
             answer = f'Рейтинговая таблица успешно создана: {url}'
         except Exception as e:
             answer = str(e)
-        await update.message.reply_text(answer)
+        return answer
     
     async def _message_team_count(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
@@ -350,47 +527,41 @@ class FootballRatingBot:
         await update.message.reply_text(answer)
         
     async def _message_players(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        count = context.user_data[self.TEAM_COUNT_KEY]
+        self._clear_context(context)
+        answer = await self._run_blocking(
+            self._players_answer, update.effective_user, count, update.message.text
+        )
+        await update.message.reply_text(answer, parse_mode='HTML')
+
+    def _players_answer(self, user, count: int, text: str) -> str:
+        from football_rating.text_parser import PlayersText, PlayersFormatError
         answer = self.INTERNAL_ERROR
-        user = update.effective_user
         try:
-            count = context.user_data[self.TEAM_COUNT_KEY]
-            self._clear_context(context)
-            parser = PlayersText(text=update.message.text)
+            parser = PlayersText(text=text)
             players = parser.players
             split_players = parser.to_split
             db_user = self.db.get_user(user.id)
-            storage = GSheetStorage(
-                service_json=self.gcp_key,
-                url=db_user.url
-            )
-            all_data = storage.data
-            storage = None
-            players_data = all_data.get_players_match_data_dict(players)
+            entry = self.storages.entry(db_user.url)
+            with entry.lock:
+                all_data = entry.storage.data
+                players_data = all_data.get_players_match_data_dict(players)
             stored_players = list(players_data.keys())
             self._check_players(players, stored_players)
-            df = pd.DataFrame.from_dict(players_data, orient='index').reset_index()
-            df.columns = ['player', 'skill', 'matches']
-            matchmaker = MatchMaking(df, count, split=split_players)
-            df = matchmaker.optimize()
-            teams = df.groupby(['team'])[['player', 'skill']]
-            team_list = []
-            players_list = []
-            for key, _ in teams:
-                team = teams.get_group(key)
-                players = team['player'].tolist()
-                players_list.append(players)
-                score = team['skill'].mean()
-                # team_str = key[0]
-                players_str = ', '.join(players)
-                team_list.append(f'{players_str} - средний {score:.2f}')
-            answer = '\n'.join(get_teams(team_list, html=True))
+            # оптимизация в отдельном процессе - не держит GIL для других чатов
+            with tracing.span('matchmaking.split'):
+                teams, spans = self.split_executor.submit(
+                    split_teams, players_data, count, split_players, tracing.TRACER.enabled
+                ).result()
+                tracing.merge(spans)
+            answer = '\n'.join(teams)
         except PlayersNotDivisable:
             answer = 'Количество участников должно делиться на число команд'
         except (RecordNotFound, PlayersNotFound, PlayersFormatError) as e:
             answer = str(e)            
         except (ValueError, AssertionError):
             answer = 'Не удалось получить число команд'
-        await update.message.reply_text(answer, parse_mode='HTML')        
+        return answer
 
     async def _message_teams(self, update: Update, context: ContextTypes.DEFAULT_TYPE)        :
         context.user_data[self.TEAMS_KEY] = update.message.text
@@ -399,54 +570,69 @@ class FootballRatingBot:
         await update.message.reply_text(answer)
 
     async def _message_results(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        user = update.effective_user
+        from football_rating.text_parser import MatchDayParser, TeamNotFound
         try:
             parser = MatchDayParser()
             parser.parse_teams(context.user_data[self.TEAMS_KEY].split('\n'))
             parser.parse_results(update.message.text.split('\n'))
-            results = parser.results
-            self._clear_context(context)
-            user = self.db.get_user(user.id)
-            if not self.db.is_admin(user.id, user.url):
+        except TeamNotFound as e:
+            await update.message.reply_text(str(e), parse_mode='HTML')
+            return
+        self._clear_context(context)
+        answer = await self._run_blocking(
+            self._results_answer, update.effective_user, parser.results
+        )
+        await update.message.reply_text(answer, parse_mode='HTML')
+
+    def _results_answer(self, user, results) -> str:
+        from football_rating.data_storage import StorageError
+        from football_rating.football_rating_utility import player_generator
+        from football_rating.text_parser import TeamNotFound
+        try:
+            user, is_admin = self.db.get_user_with_admin(user.id)
+            if not is_admin:
                 raise AdminRequired('Необходимы права администратора')
-            storage = GSheetStorage(
-                service_json=self.gcp_key,
-                url=user.url
-            )
-            storage.update_time_stats(datetime.today())
-            stored_data = storage.data            
-            teams = results.teams
-            players = [player.name for player in player_generator(teams)]
-            stored_players = stored_data.get_players_match_data_dict(players)
-            self._check_players(players, stored_players)
-            for player in player_generator(results.teams):
-                elo, matches = stored_players[player.name]
-                player.elo = elo
-                player.matches = matches
-            scores = list(results.get_scores().items())
-            scores.sort(key=lambda x: x[1][0], reverse=True)
-            answer = ''
-            for name, (points, scored, conceded) in scores:
-                answer += f'<b>{name}</b>:\nОчки - {points}\nЗабито - {scored}\nПропущено - {-conceded}\n'
-
-            results.update_players()
-
-            new_player_data = {
-                player.name: (player.elo, player.matches) for player in player_generator(teams)
-            }            
-            if new_player_data:
-                stored_data.set_players_match_data(new_player_data)
-                storage.write()
+            # запись и блокировка из одного вызова - между ними запись может устареть
+            entry = self.storages.entry(user.url)
+            storage = entry.storage
+            with entry.lock:
+                storage.update_time_stats(datetime.today())
+                stored_data = storage.data
+                teams = results.teams
+                players = [player.name for player in player_generator(teams)]
+                stored_players = stored_data.get_players_match_data_dict(players)
+                self._check_players(players, stored_players)
+                for player in player_generator(results.teams):
+                    elo, matches = stored_players[player.name]
+                    player.elo = elo
+                    player.matches = matches
+                scores = list(results.get_scores().items())
+                scores.sort(key=lambda x: x[1][0], reverse=True)
+                answer = ''
+                for name, (points, scored, conceded) in scores:
+                    answer += f'<b>{name}</b>:\nОчки - {points}\nЗабито - {scored}\nПропущено - {-conceded}\n'
+
+                results.update_players()
+
+                new_player_data = {
+                    player.name: (player.elo, player.matches) for player in player_generator(teams)
+                }
+                if new_player_data:
+                    stored_data.set_players_match_data(new_player_data)
+                    self.storages.write(entry)
 
         except (AdminRequired, RecordNotFound, TeamNotFound, PlayersNotFound, StorageError) as e:
             answer = str(e)   
-        await update.message.reply_text(answer, parse_mode='HTML')            
+        return answer
 
     async def _message_url(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user = update.effective_user        
         MAX_SIZE = 1024
         self._clear_context(context)
-        self.db.update_user(user.id, user.username, update.message.text[:MAX_SIZE])
+        await self._run_blocking(
+            self.db.update_user, user.id, user.username, update.message.text[:MAX_SIZE],
+            executor=self.command_executor
+        )
         await update.message.reply_text("Вы успешно переключились на таблицу")
 
     def _set_admin(self, username: str, gmail: str, state: bool):
@@ -454,10 +640,7 @@ class FootballRatingBot:
         self.db.update_admin(user.id, user.url, state)
         if gmail:
             user = self.db.get_user(user.id)
-            storage = GSheetStorage(
-                service_json=self.gcp_key,
-                url=user.url
-            )
+            storage = self.storages.get(user.url)
             role = 'writer' if state else 'reader'
             storage.wb.share(gmail, role=role, type='user')       
 
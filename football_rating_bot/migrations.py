@@ -0,0 +1,56 @@
+"""
+Built-in schema migrations of the bot database.
+
+The applied version is kept in the `schema_version` table. Each migration
+is a list of SQL statements applied in one transaction; statements have to
+be idempotent (IF NOT EXISTS), since tables created by `create_all` on a new
+database already have the current schema.
+"""
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (version, description, statements)
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, 'indexes for user name and admin url lookups', [
+        'CREATE INDEX IF NOT EXISTS ix_users_name ON users (name)',
+        'CREATE INDEX IF NOT EXISTS ix_admins_url ON admins (url)',
+    ]),
+    (2, 'counter of owner tables', [
+        'CREATE TABLE IF NOT EXISTS counters (name VARCHAR NOT NULL PRIMARY KEY, value INTEGER NOT NULL)',
+        "INSERT INTO counters (name, value) SELECT 'tables', COUNT(*) FROM owners "
+        "WHERE NOT EXISTS (SELECT 1 FROM counters WHERE name = 'tables')",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_version(connection: Connection) -> int:
+    connection.execute(text('CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)'))
+    version = connection.execute(text('SELECT MAX(version) FROM schema_version')).scalar()
+    return version or 0
+
+
+def migrate(engine: Engine, target: int = LATEST_VERSION) -> int:
+    """Apply migrations up to `target`, returns the resulting version."""
+    with engine.begin() as connection:
+        version = get_version(connection)
+    for migration_version, description, statements in MIGRATIONS:
+        if not version < migration_version <= target:
+            continue
+        with engine.begin() as connection:
+            for statement in statements:
+                connection.execute(text(statement))
+            connection.execute(
+                text('INSERT INTO schema_version (version) VALUES (:version)'),
+                {'version': migration_version}
+            )
+        logger.info(f'Migrated database to version {migration_version}: {description}')
+        version = migration_version
+    return version
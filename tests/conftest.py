@@ -0,0 +1,34 @@
+import pandas as pd
+import pytest
+
+from football_rating.data_storage import GSheetStorage
+from football_rating.fake_gsheets import FakeClient
+
+PLAYERS = {
+    'Пирло': (1500, 10),
+    'Буффон': (1400, 8),
+    'Тотти': (1300, 12),
+    'Неймар': (1200, 3),
+}
+
+
+def rating_table(players=PLAYERS) -> pd.DataFrame:
+    return pd.DataFrame(
+        [(name, elo, matches) for name, (elo, matches) in players.items()],
+        columns=['Name', 'Rating', 'Matches'],
+    ).set_index('Name')
+
+
+@pytest.fixture
+def client() -> FakeClient:
+    return FakeClient()
+
+
+@pytest.fixture
+def sheet_url(client) -> str:
+    """URL of a fake spreadsheet with the rating table of `PLAYERS`."""
+    storage = GSheetStorage(file_name='football-rating_test', gc=client)
+    storage.data.df = rating_table()
+    storage.write()
+    client.calls.clear()
+    return storage.url
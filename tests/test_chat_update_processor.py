@@ -0,0 +1,41 @@
+import asyncio
+import gc
+
+from types import SimpleNamespace
+
+from football_rating_bot.football_rating_bot import ChatUpdateProcessor
+
+
+def chat_update(chat_id: int):
+    return SimpleNamespace(effective_chat=SimpleNamespace(id=chat_id), effective_user=None)
+
+
+async def process(processor, updates, delay: float = 0.01):
+    log = []
+
+    async def handle(chat_id: int, k: int):
+        log.append(('start', chat_id, k))
+        await asyncio.sleep(delay)
+        log.append(('end', chat_id, k))
+
+    await asyncio.gather(*[
+        processor.process_update(chat_update(chat_id), handle(chat_id, k)) for k, chat_id in enumerate(updates)
+    ])
+    return log
+
+
+def test_updates_of_one_chat_are_sequential():
+    log = asyncio.run(process(ChatUpdateProcessor(8), [1, 1, 1]))
+    assert log == [(event, 1, k) for k in range(3) for event in ('start', 'end')]
+
+
+def test_updates_of_different_chats_overlap():
+    log = asyncio.run(process(ChatUpdateProcessor(8), [1, 2, 3]))
+    assert [event for event, _, _ in log[:3]] == ['start'] * 3
+
+
+def test_idle_chats_are_forgotten():
+    processor = ChatUpdateProcessor(8)
+    asyncio.run(process(processor, [1, 2, 1, 3, 2], delay=0.))
+    gc.collect()
+    assert len(processor._chat_locks) == 0
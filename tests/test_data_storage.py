@@ -0,0 +1,127 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from football_rating.data_storage import GSheetStorage, StorageError
+
+from conftest import PLAYERS, rating_table
+
+WRITE_CALLS = ('clear', 'set_dataframe', 'update_values_batch', 'update_values', 'batch_update')
+
+
+def write_calls(client):
+    return {name: client.calls[name] for name in WRITE_CALLS if client.calls[name]}
+
+
+def sheet_table(client, url: str) -> pd.DataFrame:
+    return GSheetStorage(url=url, gc=client).data.df
+
+
+def test_write_sends_changed_rows_in_one_batch(client, sheet_url):
+    storage = GSheetStorage(url=sheet_url, gc=client)
+    client.calls.clear()
+    storage.data.set_players_match_data({'Тотти': (1310, 13), 'Неймар': (1190, 4)})
+    storage.write()
+    assert write_calls(client) == {'update_values_batch': 1}
+    pd.testing.assert_frame_equal(sheet_table(client, sheet_url), storage.data.df)
+
+
+def test_write_rewrites_sheet_when_order_changes(client, sheet_url):
+    storage = GSheetStorage(url=sheet_url, gc=client)
+    client.calls.clear()
+    # последний становится первым - сдвигаются все строки
+    storage.data.set_players_match_data({'Неймар': (1600, 4)})
+    storage.write()
+    assert write_calls(client) == {'clear': 1, 'set_dataframe': 1, 'batch_update': 1}
+    table = sheet_table(client, sheet_url)
+    assert list(table.index) == ['Неймар', 'Пирло', 'Буффон', 'Тотти']
+    pd.testing.assert_frame_equal(table, storage.data.df)
+
+
+def test_write_rewrites_sheet_when_players_are_added(client, sheet_url):
+    storage = GSheetStorage(url=sheet_url, gc=client)
+    client.calls.clear()
+    storage.data.df = rating_table({**PLAYERS, 'Зидан': (1250, 1)})
+    storage.write()
+    assert write_calls(client) == {'clear': 1, 'set_dataframe': 1, 'batch_update': 1}
+    assert len(sheet_table(client, sheet_url)) == len(PLAYERS) + 1
+
+
+def test_write_without_changes_sends_nothing(client, sheet_url):
+    storage = GSheetStorage(url=sheet_url, gc=client)
+    client.calls.clear()
+    storage.write()
+    storage.data.set_players_match_data({'Пирло': (1500, 10)})
+    storage.write()
+    assert write_calls(client) == {}
+
+
+def test_extra_columns_survive_round_trip(client, sheet_url):
+    storage = GSheetStorage(url=sheet_url, gc=client)
+    df = storage.data.df.copy()
+    df.insert(2, 'Позиция', ['ЦП', 'ВРТ', 'НАП', 'НАП'])
+    storage.data.df = df
+    storage.write()
+    storage = GSheetStorage(url=sheet_url, gc=client)
+    storage.data.set_players_match_data({'Неймар': (1600, 4)})
+    storage.write()
+    table = sheet_table(client, sheet_url)
+    assert list(table.columns) == ['Rating', 'Matches', 'Позиция', 'Prev rating', 'Change']
+    assert table['Позиция'].to_dict() == {'Неймар': 'НАП', 'Пирло': 'ЦП', 'Буффон': 'ВРТ', 'Тотти': 'НАП'}
+
+
+def test_names_differing_in_case_are_rejected(client, sheet_url):
+    storage = GSheetStorage(url=sheet_url, gc=client)
+    with pytest.raises(ValueError, match='тотти'):
+        storage.data.df = rating_table({**PLAYERS, 'тотти': (1250, 1)})
+    storage.wks.update_values('A6', [['тотти', 1250, 1, 1250, 0]])
+    with pytest.raises(StorageError):
+        GSheetStorage(url=sheet_url, gc=client)
+
+
+def time_stats(client, url: str) -> pd.DataFrame:
+    return GSheetStorage(url=url, gc=client).read_time_stats('2024').set_index('Name')
+
+
+def test_time_stats_of_empty_sheet_are_written_in_full(client, sheet_url):
+    storage = GSheetStorage(url=sheet_url, gc=client)
+    client.calls.clear()
+    storage.update_time_stats(datetime(2024, 1, 5))
+    assert write_calls(client) == {'set_dataframe': 1, 'batch_update': 1}
+    assert time_stats(client, sheet_url)['01.2024'].to_dict() == {
+        name: str(elo) for name, (elo, _) in PLAYERS.items()
+    }
+
+
+def test_time_stats_of_same_month_are_not_written(client, sheet_url):
+    storage = GSheetStorage(url=sheet_url, gc=client)
+    storage.update_time_stats(datetime(2024, 1, 5))
+    client.calls.clear()
+    storage.update_time_stats(datetime(2024, 1, 20))
+    assert write_calls(client) == {}
+    assert client.calls['get_col'] == 0
+
+
+def test_new_month_appends_one_column(client, sheet_url):
+    storage = GSheetStorage(url=sheet_url, gc=client)
+    storage.update_time_stats(datetime(2024, 1, 5))
+    storage.data.set_players_match_data({'Тотти': (1310, 13)})
+    client.calls.clear()
+    storage.update_time_stats(datetime(2024, 2, 3))
+    assert write_calls(client) == {'update_values': 1, 'batch_update': 1}
+    table = time_stats(client, sheet_url)
+    assert list(table.columns) == ['01.2024', '02.2024']
+    assert table.loc['Тотти'].tolist() == ['1300', '1310']
+
+
+def test_new_players_are_appended_as_rows(client, sheet_url):
+    storage = GSheetStorage(url=sheet_url, gc=client)
+    storage.update_time_stats(datetime(2024, 1, 5))
+    storage.data.df = rating_table({**PLAYERS, 'Зидан': (1250, 1)})
+    client.calls.clear()
+    storage.update_time_stats(datetime(2024, 2, 3))
+    assert write_calls(client) == {'update_values': 2, 'batch_update': 1}
+    table = time_stats(client, sheet_url)
+    assert list(table.index) == list(PLAYERS) + ['Зидан']
+    assert table.loc['Зидан'].tolist() == ['0', '1250']
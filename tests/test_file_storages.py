@@ -0,0 +1,86 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from football_rating.data_storage import (
+    CsvTextFileStorage, NpyBundleStorage, PlainTextFileStorage, open_storage
+)
+
+from conftest import PLAYERS, rating_table
+
+FORMATS = {
+    '.txt': PlainTextFileStorage,
+    '.csv': CsvTextFileStorage,
+    '.npyd': NpyBundleStorage,
+}
+
+
+@pytest.fixture(params=list(FORMATS))
+def path(request, tmp_path) -> str:
+    return str(tmp_path / f'rating{request.param}')
+
+
+def stored(path: str, players=PLAYERS):
+    storage = open_storage(path)
+    storage.data.df = rating_table(players)
+    storage.write()
+    return storage
+
+
+def time_stats(path: str, year: str) -> pd.DataFrame:
+    return open_storage(path).read_time_stats(year).set_index('Name').astype(int)
+
+
+def test_open_storage_picks_format(path):
+    ext = path[path.rindex('.'):]
+    assert type(open_storage(path)) is FORMATS[ext]
+
+
+def test_missing_file_is_empty(path):
+    assert open_storage(path).data.df.empty
+
+
+def test_write_read_round_trip(path):
+    storage = stored(path)
+    storage.data.set_players_match_data({'Тотти': (1350, 13), 'Неймар': (1190, 4)})
+    storage.write()
+    pd.testing.assert_frame_equal(open_storage(path).data.df, storage.data.df)
+    assert list(open_storage(path).data.df.index) == ['Пирло', 'Буффон', 'Тотти', 'Неймар']
+
+
+def test_update_time_stats_round_trip(path):
+    storage = stored(path)
+    storage.update_time_stats(datetime(2024, 1, 5))
+    storage.update_time_stats(datetime(2024, 1, 25))
+    storage.data.set_players_match_data({'Неймар': (1450, 4)})
+    storage.write()
+    storage = open_storage(path)
+    storage.update_time_stats(datetime(2024, 2, 3))
+    table = time_stats(path, '2024')
+    assert list(table.columns) == ['01.2024', '02.2024']
+    assert table.loc['Неймар'].tolist() == [1200, 1450]
+    assert table.loc['Пирло'].tolist() == [1500, 1500]
+
+
+def test_npy_bundle_reloads_through_mmap(tmp_path):
+    path = str(tmp_path / 'rating.npyd')
+    storage = stored(path)
+    storage.update_time_stats(datetime(2023, 12, 1))
+    storage.data.set_players_match_data({'Тотти': (1350, 13)})
+    storage.write()
+    storage.update_time_stats(datetime(2024, 1, 5))
+
+    reloaded = open_storage(path)
+    assert all(isinstance(values, np.memmap) for values in reloaded.data.columns.values())
+    pd.testing.assert_frame_equal(reloaded.data.df, storage.data.df)
+    # снимки каждого года лежат отдельно
+    assert time_stats(path, '2023')['12.2023'].to_dict() == {name: elo for name, (elo, _) in PLAYERS.items()}
+    assert time_stats(path, '2024').loc['Тотти', '01.2024'] == 1350
+
+    # отображенные файлы не мешают записи, изменения не попадают в файл до write
+    reloaded.data.set_players_match_data({'Пирло': (1510, 11)})
+    assert open_storage(path).data.df.loc['Пирло', 'Rating'] == 1500
+    reloaded.write()
+    assert open_storage(path).data.df.loc['Пирло', 'Rating'] == 1510
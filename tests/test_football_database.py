@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+
+from football_rating_bot.football_database import FootballDatabase
+from football_rating_bot.football_rating_bot import FootballRatingBot
+
+URL = 'https://docs.google.com/spreadsheets/d/fake0'
+
+
+def make_db() -> FootballDatabase:
+    db = FootballDatabase('sqlite://')
+    db.update_user(1, 'pirlo', URL)
+    db.update_admin(1, URL, True)
+    return db
+
+
+def test_lookups_are_cached_and_invalidated():
+    db = make_db()
+    assert db.get_user_with_admin(1)[1] is True
+    assert ('user_admin', 1) in db.cache
+    db.update_admin(1, URL, False)
+    assert ('user_admin', 1) not in db.cache
+    assert db.get_user_with_admin(1)[1] is False
+
+
+def test_read_racing_update_is_not_cached(monkeypatch):
+    db = make_db()
+
+    def stale_read(id):
+        # запрос прочитал старую запись, а права отозвали до того, как он вернулся
+        result = FootballDatabase._get_user_with_admin(db, id)
+        db.update_admin(1, URL, False)
+        return result
+
+    monkeypatch.setattr(db, '_get_user_with_admin', stale_read)
+    assert db.get_user_with_admin(1)[1] is True
+    monkeypatch.undo()
+    assert ('user_admin', 1) not in db.cache
+    assert db.get_user_with_admin(1)[1] is False
+
+
+def test_new_owner_increments_tables_count():
+    db = make_db()
+    assert db.get_tables_count() == 0
+    db.update_owner(1, URL)
+    db.update_owner(2, URL + '2')
+    assert db.get_tables_count() == 2
+    # смена таблицы владельца - не новая таблица
+    db.update_owner(1, URL + '3')
+    assert db.get_tables_count() == 2
+
+
+def test_reconcile_sets_count():
+    db = make_db()
+    db.update_owner(1, URL)
+    assert db.set_tables_count(5, expected=1)
+    assert db.get_tables_count() == 5
+    assert db.set_tables_count(3)
+    assert db.get_tables_count() == 3
+
+
+def test_reconcile_keeps_increment_made_during_listing():
+    db = make_db()
+    db.update_owner(1, URL)
+
+    def list_tables():
+        # пока идет листинг Drive, появляется новый владелец
+        db.update_owner(2, URL + '2')
+        return 1
+
+    bot = SimpleNamespace(db=db, _get_tables_count=list_tables)
+    FootballRatingBot._reconcile_tables_count(bot)
+    assert db.get_tables_count() == 2
+    assert not db.set_tables_count(7, expected=1)
+    assert db.get_tables_count() == 2
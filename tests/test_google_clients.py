@@ -0,0 +1,52 @@
+import threading
+
+import httplib2
+import pygsheets
+
+from google.auth.credentials import AnonymousCredentials
+
+from football_rating.google_clients import ThreadLocalHttp
+
+
+class RecordingHttp:
+    """`httplib2.Http` fake which answers every request with an empty JSON."""
+
+    instances = []
+
+    def __init__(self):
+        self.threads = []
+        self.timeout = None
+        RecordingHttp.instances.append(self)
+
+    def request(self, uri, method='GET', **kwargs):
+        self.threads.append(threading.get_ident())
+        return httplib2.Response({'status': 200}), b'{}'
+
+
+def request_in_threads(client, count: int):
+    def get():
+        client.sheet.service.spreadsheets().get(spreadsheetId='key').execute()
+    threads = [threading.Thread(target=get) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_each_thread_gets_own_http():
+    RecordingHttp.instances = []
+    client = pygsheets.client.Client(AnonymousCredentials(), http=ThreadLocalHttp(RecordingHttp))
+    request_in_threads(client, 4)
+    assert len(RecordingHttp.instances) == 4
+    assert all(len(set(http.threads)) == 1 for http in RecordingHttp.instances)
+
+
+def test_same_thread_reuses_http():
+    RecordingHttp.instances = []
+    http = ThreadLocalHttp(RecordingHttp)
+    client = pygsheets.client.Client(AnonymousCredentials(), http=http)
+    for _ in range(3):
+        client.sheet.service.spreadsheets().get(spreadsheetId='key').execute()
+    assert len(RecordingHttp.instances) == 1
+    assert len(RecordingHttp.instances[0].threads) == 3
+    assert http.timeout is None
@@ -0,0 +1,98 @@
+import datetime
+
+import pytest
+
+from football_rating.history import RatingHistory
+from football_rating.matchday import Match, MatchDay, Player, Team
+
+NAMES = ['Ivan', 'Petr', 'Oleg', 'Anton', 'Boris', 'Gleb', 'Denis', 'Egor']
+
+
+def make_day(day: int, shift: int = 0, goals=(2, 1)) -> MatchDay:
+    names = NAMES[shift % len(NAMES):] + NAMES[:shift % len(NAMES)]
+    team1 = Team('Red', [Player(name) for name in names[:4]])
+    team2 = Team('Blue', [Player(name) for name in names[4:]])
+    return MatchDay([Match(team1, team2, *goals)], [team1, team2], datetime.date(2024, 1, day))
+
+
+def days(count: int):
+    return [make_day(day + 1, day, (day % 3, 1)) for day in range(count)]
+
+
+def full_replay(match_days) -> dict:
+    history = RatingHistory()
+    history.import_days(match_days)
+    return history.state()
+
+
+@pytest.fixture
+def history():
+    history = RatingHistory(snapshot_every=3)
+    history.import_days(days(10))
+    yield history
+    history.close()
+
+
+@pytest.fixture
+def replayed(monkeypatch):
+    calls = []
+    apply_day = RatingHistory._apply_day
+
+    def counting(state, date, payload):
+        calls.append(date)
+        return apply_day(state, date, payload)
+    monkeypatch.setattr(RatingHistory, '_apply_day', staticmethod(counting))
+    return calls
+
+
+def test_import_equals_sequential_insert(history):
+    sequential = RatingHistory(snapshot_every=3)
+    for match_day in days(10):
+        sequential.insert(match_day)
+    assert sequential.state() == history.state()
+
+
+def test_amend_equals_full_replay(history):
+    day_id = history.days()[7][0]
+    history.amend(day_id, make_day(8, 7, (0, 5)))
+    expected = days(10)
+    expected[7] = make_day(8, 7, (0, 5))
+    assert history.state() == full_replay(expected)
+
+
+def test_delete_equals_full_replay(history):
+    history.delete(history.days()[4][0])
+    expected = days(10)
+    del expected[4]
+    assert history.state() == full_replay(expected)
+
+
+def test_insert_in_past_equals_full_replay(history):
+    history.insert(make_day(3, 5, (4, 4)))
+    expected = days(10)
+    expected.insert(3, make_day(3, 5, (4, 4)))
+    assert history.state() == full_replay(expected)
+
+
+def test_only_days_after_snapshot_are_replayed(history, replayed):
+    # снимки после 3, 6 и 9 дня: изменение 8 дня переигрывает дни 7-10
+    day_id = history.days()[7][0]
+    history.amend(day_id, make_day(8, 7, (0, 5)))
+    assert replayed == [f'2024-01-{day:02}' for day in range(7, 11)]
+
+
+def test_append_applies_only_new_day(history, replayed):
+    history.insert(make_day(20))
+    assert replayed == ['2024-01-20']
+
+
+def test_names_are_case_insensitive():
+    history = RatingHistory()
+    history.insert(make_day(1))
+    day = make_day(2)
+    day.teams[0].players[0].name = 'ivan'
+    history.insert(day)
+    state = history.state()
+    assert 'ivan' not in state
+    assert state['Ivan'][1] == 2
+    assert len(state) == len(NAMES)
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from football_rating.matchmaking import MatchMaking
+
+
+def roster(seed: int, players: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'player': [f'p{i}' for i in range(players)],
+        'skill': rng.integers(900, 1700, players).astype(float),
+    })
+
+
+def optimized(df: pd.DataFrame, team_count: int, seed: int, engine: str) -> MatchMaking:
+    np.random.seed(seed)
+    matchmaker = MatchMaking(df.copy(), team_count, split=[], engine=engine)
+    matchmaker.optimize()
+    return matchmaker
+
+
+@pytest.mark.parametrize('players, team_count', [(10, 2), (12, 3), (16, 4), (24, 4), (30, 5), (48, 8)])
+@pytest.mark.parametrize('seed', range(6))
+def test_engines_reach_same_score(players, team_count, seed):
+    df = roster(seed, players)
+    numpy_engine = optimized(df, team_count, seed, 'numpy')
+    pandas_engine = optimized(df, team_count, seed, 'pandas')
+    assert numpy_engine.score == pytest.approx(pandas_engine.score, abs=1e-9)
+
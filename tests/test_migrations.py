@@ -0,0 +1,49 @@
+from sqlalchemy import create_engine, text
+
+from football_rating_bot.football_database import FootballDatabase
+from football_rating_bot.migrations import LATEST_VERSION, get_version, migrate
+
+# схема бота до счетчика таблиц
+V1_SCHEMA = [
+    'CREATE TABLE owners (id INTEGER PRIMARY KEY, url VARCHAR)',
+    'CREATE TABLE users (id INTEGER PRIMARY KEY, name VARCHAR, url VARCHAR)',
+    'CREATE TABLE admins (id INTEGER NOT NULL, url VARCHAR NOT NULL, PRIMARY KEY (id, url))',
+]
+
+
+def v1_database(path) -> str:
+    url = f'sqlite:///{path / "bot.db"}'
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        for statement in V1_SCHEMA:
+            connection.execute(text(statement))
+    assert migrate(engine, target=1) == 1
+    with engine.begin() as connection:
+        for id in range(3):
+            connection.execute(text('INSERT INTO owners (id, url) VALUES (:id, :url)'), {'id': id, 'url': f'u{id}'})
+    engine.dispose()
+    return url
+
+
+def counters(engine):
+    with engine.connect() as connection:
+        return connection.execute(text('SELECT name, value FROM counters')).all()
+
+
+def test_v2_seeds_counter_from_owners(tmp_path):
+    engine = create_engine(v1_database(tmp_path))
+    assert migrate(engine) == LATEST_VERSION == 2
+    assert counters(engine) == [('tables', 3)]
+    # повторный запуск ничего не меняет
+    assert migrate(engine) == 2
+    assert counters(engine) == [('tables', 3)]
+    with engine.connect() as connection:
+        assert get_version(connection) == 2
+
+
+def test_database_opened_on_v1_gets_counter(tmp_path):
+    # create_all создает пустую таблицу counters раньше миграции
+    db = FootballDatabase(v1_database(tmp_path))
+    assert db.get_tables_count() == 3
+    db.update_owner(10, 'u10')
+    assert db.get_tables_count() == 4
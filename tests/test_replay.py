@@ -0,0 +1,72 @@
+import datetime
+
+import pandas as pd
+
+from dataclasses import dataclass, field
+from typing import Dict
+
+from football_rating.data_storage import Storage
+from football_rating.football_rating_utility import load_players, store_players
+from football_rating.matchday import Match, MatchDay, Player, Team
+from football_rating.replay import replay
+
+NAMES = ['Пирло', 'Буффон', 'Тотти', 'Неймар', 'Зидан', 'Фигу', 'Роналдо', 'Кака']
+
+
+@dataclass
+class MemoryStorage(Storage):
+    """Storage in memory, counts the writes."""
+    time_stats: Dict[str, pd.DataFrame] = field(default_factory=dict)
+    writes: int = 0
+
+    def open(self):
+        pass
+
+    def read(self):
+        self.data.df = pd.DataFrame({
+            'Name': NAMES, 'Rating': [1500 - 30 * k for k in range(len(NAMES))], 'Matches': [5] * len(NAMES),
+        }).set_index('Name')
+
+    def write(self):
+        self.writes += 1
+
+    def read_time_stats(self, year: str) -> pd.DataFrame:
+        return self.time_stats.get(year, pd.DataFrame())
+
+    def write_time_stats(self, year: str, df: pd.DataFrame):
+        self.time_stats[year] = df
+
+
+def match_days():
+    days = []
+    for k, date in enumerate([(2023, 12, 20), (2024, 1, 5), (2024, 1, 19), (2024, 2, 2), (2024, 3, 1)]):
+        names = NAMES[k:] + NAMES[:k]
+        red = Team('Red', [Player(name) for name in names[:4]])
+        blue = Team('Blue', [Player(name) for name in names[4:]])
+        days.append(MatchDay([Match(red, blue, k % 3, 1), Match(blue, red, 2, k % 2)], [red, blue],
+                             datetime.date(*date)))
+    return days
+
+
+def sequential(storage: Storage, days):
+    """Previous path: every match day is applied and written on its own."""
+    for match_day in days:
+        storage.update_time_stats(match_day.date)
+        load_players(storage.data, match_day)
+        match_day.update_players()
+        store_players(storage.data, match_day)
+        storage.write()
+
+
+def test_replay_equals_sequential_updates():
+    expected = MemoryStorage()
+    sequential(expected, match_days())
+    storage = MemoryStorage()
+    replay(storage, match_days())
+
+    pd.testing.assert_frame_equal(storage.data.df, expected.data.df)
+    assert storage.time_stats.keys() == expected.time_stats.keys() == {'2023', '2024'}
+    for year, df in expected.time_stats.items():
+        pd.testing.assert_frame_equal(storage.time_stats[year], df)
+    assert list(storage.time_stats['2024'].columns) == ['Name', '01.2024', '02.2024', '03.2024']
+    assert storage.writes == 1
@@ -0,0 +1,153 @@
+import threading
+import time
+
+import pytest
+
+from football_rating.data_storage import GSheetStorage
+from football_rating.storage_cache import StorageCache
+
+WRITE_CALLS = ('update_values_batch', 'set_dataframe')
+
+
+def sheet_rating(client, url: str, player: str):
+    return GSheetStorage(url=url, gc=client).data.get_players_match_data_dict([player])[player]
+
+
+def update(cache: StorageCache, url: str, player: str, elo: int, matches: int):
+    """Rating update the way the bot makes it: under the entry lock, then write-behind."""
+    entry = cache.entry(url)
+    with entry.lock:
+        entry.storage.data.set_players_match_data({player: (elo, matches)})
+        cache.write(entry)
+    return entry
+
+
+def writes(client) -> int:
+    return sum(client.calls[name] for name in WRITE_CALLS)
+
+
+def wait_flushed(entry, timeout: float = 2.) -> bool:
+    # dirty сбрасывается до записи - ждем под блокировкой записи
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with entry.lock:
+            if not entry.dirty:
+                return True
+        time.sleep(0.01)
+    return False
+
+
+def test_entry_is_cached(client, sheet_url):
+    cache = StorageCache(client=client)
+    assert cache.entry(sheet_url) is cache.entry(sheet_url)
+    assert client.calls['open_by_url'] == 1
+    assert client.calls['get_as_df'] == 1
+
+
+def test_concurrent_misses_load_once(client, sheet_url):
+    client.latency = 0.02
+    cache = StorageCache(client=client)
+    entries = []
+    threads = [threading.Thread(target=lambda: entries.append(cache.entry(sheet_url))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(entries) == 8 and all(entry is entries[0] for entry in entries)
+    assert client.calls['open_by_url'] == 1
+
+
+def test_writes_coalesce(client, sheet_url):
+    cache = StorageCache(client=client, write_delay=60)
+    for k in range(5):
+        update(cache, sheet_url, 'Пирло', 1510 + k, 11 + k)
+    assert writes(client) == 0
+    cache.flush()
+    assert writes(client) == 1
+    assert sheet_rating(client, sheet_url, 'Пирло') == [1514, 15]
+
+
+def test_write_behind_timer(client, sheet_url):
+    cache = StorageCache(client=client, write_delay=0.05)
+    entry = update(cache, sheet_url, 'Пирло', 1520, 11)
+    assert wait_flushed(entry)
+    assert sheet_rating(client, sheet_url, 'Пирло') == [1520, 11]
+
+
+def test_ttl_reload(client, sheet_url):
+    cache = StorageCache(client=client, ttl=0)
+    first = cache.entry(sheet_url)
+    # изменение таблицы в обход кэша
+    other = GSheetStorage(url=sheet_url, gc=client)
+    other.data.set_players_match_data({'Тотти': (1350, 13)})
+    other.write()
+    time.sleep(0.001)
+    second = cache.entry(sheet_url)
+    assert second is not first
+    assert second.storage.data.get_players_match_data_dict(['Тотти'])['Тотти'] == [1350, 13]
+
+
+def test_expired_dirty_entry_is_flushed_before_reload(client, sheet_url):
+    cache = StorageCache(client=client, ttl=0, write_delay=60)
+    entry = update(cache, sheet_url, 'Пирло', 1530, 11)
+    time.sleep(0.001)
+    # не записанные изменения новее листа - запись не перечитывается
+    assert cache.entry(sheet_url) is entry
+    cache.flush()
+    reloaded = cache.entry(sheet_url)
+    assert reloaded is not entry
+    assert reloaded.storage.data.get_players_match_data_dict(['Пирло'])['Пирло'] == [1530, 11]
+
+
+def test_eviction_flushes(client, sheet_url):
+    other_url = GSheetStorage(file_name='football-rating_other', gc=client).url
+    cache = StorageCache(client=client, max_size=1, write_delay=60)
+    update(cache, sheet_url, 'Буффон', 1410, 9)
+    cache.entry(other_url)
+    assert writes(client) == 1
+    assert sheet_rating(client, sheet_url, 'Буффон') == [1410, 9]
+    assert list(cache._entries) == [other_url]
+
+
+def test_failed_flush_keeps_update(client, sheet_url):
+    cache = StorageCache(client=client, ttl=0, write_delay=0.01, retry_delay=0.05)
+    client.failing.add('update_values_batch')
+    entry = update(cache, sheet_url, 'Неймар', 1250, 4)
+    time.sleep(0.05)
+    # таймер не смог записать, а TTL истек - кэш отдает несохраненную запись
+    assert cache.entry(sheet_url) is entry
+    assert entry.dirty
+    assert entry.storage.data.get_players_match_data_dict(['Неймар'])['Неймар'] == [1250, 4]
+    assert sheet_rating(client, sheet_url, 'Неймар') == [1200, 3]
+
+    # повтор по таймеру после восстановления
+    client.failing.clear()
+    assert wait_flushed(entry)
+    assert sheet_rating(client, sheet_url, 'Неймар') == [1250, 4]
+    assert cache.entry(sheet_url).storage.data.get_players_match_data_dict(['Неймар'])['Неймар'] == [1250, 4]
+
+
+def test_failed_eviction_keeps_entry(client, sheet_url):
+    other_url = GSheetStorage(file_name='football-rating_other', gc=client).url
+    cache = StorageCache(client=client, max_size=1, write_delay=60, retry_delay=60)
+    entry = update(cache, sheet_url, 'Буффон', 1410, 9)
+    client.failing.add('update_values_batch')
+    cache.entry(other_url)
+    assert cache._entries[sheet_url] is entry and entry.dirty
+    client.failing.clear()
+    cache.entry(other_url)
+    cache.close()
+    assert sheet_rating(client, sheet_url, 'Буффон') == [1410, 9]
+
+
+def test_invalidate_raises_on_failed_flush(client, sheet_url):
+    cache = StorageCache(client=client, write_delay=60, retry_delay=60)
+    entry = update(cache, sheet_url, 'Тотти', 1310, 13)
+    client.failing.add('update_values_batch')
+    with pytest.raises(ConnectionError):
+        cache.invalidate(sheet_url)
+    assert cache.entry(sheet_url) is entry
+    client.failing.clear()
+    cache.invalidate(sheet_url)
+    assert sheet_rating(client, sheet_url, 'Тотти') == [1310, 13]
+    cache.close()
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from football_rating.matchmaking import MatchMaking
+
+
+def matchmaker(players: int, team_count: int, seed: int) -> MatchMaking:
+    np.random.seed(seed)
+    df = pd.DataFrame({
+        'player': [f'p{i}' for i in range(players)],
+        'skill': np.random.randint(900, 1700, players).astype(float),
+    })
+    return MatchMaking(df, team_count, split=[])
+
+
+@pytest.mark.parametrize('players, team_count', [(10, 2), (12, 2), (12, 3), (14, 2)])
+def test_tabu_search_runs_all_iterations(players, team_count):
+    mm = matchmaker(players, team_count, seed=1)
+    initial = mm.score
+    mm.optimize_strategy('tabu', max_iter=100, tenure=7)
+    assert len(mm.trace) == 100
+    assert mm.score <= initial
+    assert list(mm.trace) == sorted(mm.trace, reverse=True)
+
+
+@pytest.mark.parametrize('strategy', ['annealing', 'tabu'])
+def test_strategy_keeps_team_sizes(strategy):
+    mm = matchmaker(12, 3, seed=2)
+    mm.optimize_strategy(strategy, max_iter=50)
+    assert sorted(mm.df['team'].value_counts().tolist()) == [4, 4, 4]
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+@pytest.mark.parametrize('strategy', ['annealing', 'tabu'])
+def test_strategy_stops_without_allowed_swaps(strategy):
+    # одна команда: разрешенных обменов нет, поиск не должен зависнуть
+    mm = matchmaker(6, 1, seed=3)
+    teams = mm.df['team'].tolist()
+    mm.optimize_strategy(strategy, max_iter=50)
+    assert len(mm.trace) == 0
+    assert mm.df['team'].tolist() == teams
@@ -0,0 +1,62 @@
+import json
+
+from pathlib import Path
+
+import pytest
+
+from football_rating.text_parser import ArchiveFormatError, PlayersFormatError, PlayersText, iter_archive
+
+# сообщения записи на игру и результат разбора (players/to_split или error),
+# ожидаемые значения получены исходной версией парсера
+GOLDEN = Path(__file__).parent / 'golden' / 'signup'
+CASES = sorted(GOLDEN.glob('*.txt'))
+
+
+@pytest.mark.parametrize('path', CASES, ids=[path.stem for path in CASES])
+def test_signup_golden(path: Path):
+    text = path.read_text(encoding='utf-8')
+    expected = json.loads(path.with_suffix('.json').read_text(encoding='utf-8'))
+    if 'error' in expected:
+        with pytest.raises(PlayersFormatError):
+            PlayersText(text=text)
+        return
+    parser = PlayersText(text=text)
+    assert parser.players == expected['players']
+    assert parser.to_split == expected['to_split']
+
+
+def test_read_resets_previous_result():
+    parser = PlayersText(text=(GOLDEN / '01_basic.txt').read_text(encoding='utf-8'))
+    parser.read(['1. Андрей', '*2. Богдан'])
+    assert parser.players == ['Андрей', 'Богдан']
+    assert parser.to_split == ['Богдан']
+
+
+ARCHIVE = """
+2024-03-01
+Красные: Андрей, Богдан
+Синие: Виктор, Глеб
+
+К 2:1 С
+
+2024-03-08
+Красные: Андрей, Виктор
+Синие: Богдан, Глеб
+
+К 0:0 С
+"""
+
+
+def test_archive_days(tmp_path):
+    path = tmp_path / 'archive.txt'
+    path.write_text(ARCHIVE, encoding='utf-8')
+    days = list(iter_archive(str(path)))
+    assert [str(day.date) for day in days] == ['2024-03-01', '2024-03-08']
+    assert [(match.goals1, match.goals2) for day in days for match in day.matches] == [(2, 1), (0, 0)]
+
+
+def test_archive_text_before_first_date_is_an_error(tmp_path):
+    path = tmp_path / 'archive.txt'
+    path.write_text('Красные: Андрей, Богдан\n' + ARCHIVE, encoding='utf-8')
+    with pytest.raises(ArchiveFormatError, match='Красные'):
+        list(iter_archive(str(path)))
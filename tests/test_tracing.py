@@ -0,0 +1,59 @@
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from football_rating import tracing
+from football_rating_bot.football_rating_bot import split_teams
+
+
+@pytest.fixture
+def tracer(monkeypatch):
+    tracer = tracing.Tracer(enabled=True)
+    monkeypatch.setattr(tracing, 'TRACER', tracer)
+    return tracer
+
+
+def test_configure_reads_environment(monkeypatch, tracer):
+    monkeypatch.setenv('FOOTBALL_RATING_TRACE', '1')
+    tracing.configure()
+    assert tracer.enabled
+    monkeypatch.setenv('FOOTBALL_RATING_TRACE', '0')
+    tracing.configure()
+    assert not tracer.enabled
+
+
+def test_collected_spans_are_merged_into_request(tracer):
+    worker = tracing.Tracer()
+    with worker.collect() as spans:
+        with worker.span('outer'):
+            with worker.span('inner'):
+                pass
+    assert [(stage, depth) for stage, _, depth in spans] == [('inner', 1), ('outer', 0)]
+
+    with tracer.request('split') as trace:
+        with tracer.span('matchmaking.split'):
+            tracer.merge(spans)
+    assert [(stage, depth) for stage, _, depth in trace.spans] == [
+        ('inner', 2), ('outer', 1), ('matchmaking.split', 0)
+    ]
+    assert {'inner', 'outer', 'matchmaking.split', 'request.split'} <= tracer.histograms.keys()
+
+
+def test_collect_disabled_records_nothing():
+    worker = tracing.Tracer()
+    with worker.collect(False) as spans:
+        with worker.span('stage'):
+            pass
+    assert spans == [] and not worker.histograms
+
+
+def test_split_worker_spans_reach_caller(tracer):
+    players = {f'p{i}': [1000 + 37 * i, 10] for i in range(10)}
+    context = multiprocessing.get_context('forkserver')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        teams, spans = executor.submit(split_teams, players, 2, [], True).result()
+    assert len(teams) == 2
+    tracer.merge(spans)
+    assert 'matchmaking.optimize_exact' in tracer.histograms